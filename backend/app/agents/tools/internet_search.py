@@ -5,8 +5,6 @@ from app.agents.tools.agent_tool import AgentTool
 from app.repositories.models.custom_bot import BotModel, InternetToolModel
 from app.routes.schemas.conversation import type_model_name
 from app.utils import get_bedrock_runtime_client
-from duckduckgo_search import DDGS
-from firecrawl import FirecrawlApp
 from pydantic import BaseModel, Field, root_validator
 
 logger = logging.getLogger(__name__)
@@ -94,6 +92,8 @@ def _search_with_duckduckgo(query: str, time_limit: str, locale: str) -> list:
     logger.info(
         f"Executing DuckDuckGo search with query: {query}, region: {REGION}, time_limit: {time_limit}"
     )
+    from duckduckgo_search import DDGS
+
     with DDGS() as ddgs:
         results = list(
             ddgs.text(
@@ -136,11 +136,12 @@ def _search_with_firecrawl(
     )
 
     try:
+        from firecrawl import FirecrawlApp, ScrapeOptions
+
         app = FirecrawlApp(api_key=api_key)
 
         # Search using Firecrawl
         # SearchParams: https://github.com/mendableai/firecrawl/blob/main/apps/python-sdk/firecrawl/firecrawl.py#L24
-        from firecrawl import ScrapeOptions
 
         # Incoming locale is language-country (e.g. 'en-us').
         language, country = locale.split("-", 1)
@@ -1,30 +1,136 @@
+import hashlib
+import logging
 import os
+import threading
+import time
 
 import requests
+from app.cache import TTLCache
 from jose import jwt
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
 REGION = os.environ.get("REGION", "ap-northeast-1")
 USER_POOL_ID = os.environ.get("USER_POOL_ID", "")
 CLIENT_ID = os.environ.get("CLIENT_ID", "")
 
+JWKS_URL = (
+    f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
+)
+# Cognito rotates signing keys rarely, so refresh the key set in the background
+# once an hour and refetch eagerly only for an unknown `kid`.
+JWKS_REFRESH_INTERVAL = 60 * 60
+# Minimum interval between fetches triggered by unknown `kid`s, so that forged
+# tokens cannot make us hammer the JWKS endpoint.
+JWKS_MIN_REFETCH_INTERVAL = 30
+JWKS_REQUEST_TIMEOUT = 5
+DECODED_TOKEN_CACHE_SIZE = 1024
 
-def verify_token(token: str) -> dict:
-    # Verify JWT token
-    url = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-    response = requests.get(url)
-    keys = response.json()["keys"]
+
+class JwksCache:
+    """Process-wide cache of the user pool's JSON Web Key Set indexed by `kid`."""
+
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL,
+        min_refetch_interval: float = JWKS_MIN_REFETCH_INTERVAL,
+    ) -> None:
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self._keys: dict[str, dict] | None = None
+        self._fetched_at = 0.0
+        self._fetch_lock = threading.Lock()
+        self._refreshing = threading.Event()
+
+    def _fetch(self, fetched_before: float) -> None:
+        # Single flight: callers waiting on the lock reuse the result of the
+        # fetch that completed while they were waiting.
+        with self._fetch_lock:
+            if self._fetched_at > fetched_before:
+                return
+
+            response = requests.get(self.url, timeout=JWKS_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            self._keys = {key["kid"]: key for key in response.json()["keys"]}
+            self._fetched_at = time.monotonic()
+            logger.info(f"Fetched JWKS: {list(self._keys)}")
+
+    def _refresh_in_background(self) -> None:
+        if self._refreshing.is_set():
+            return
+
+        self._refreshing.set()
+
+        def refresh():
+            try:
+                self._fetch(fetched_before=self._fetched_at)
+            except Exception as e:
+                # Keep serving the current keys until the next attempt.
+                logger.warning(f"Failed to refresh JWKS: {e}")
+            finally:
+                self._refreshing.clear()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_key(self, kid: str) -> dict | None:
+        fetched_at = self._fetched_at
+        if self._keys is None:
+            self._fetch(fetched_before=fetched_at)
+
+        elif time.monotonic() - fetched_at > self.refresh_interval:
+            self._refresh_in_background()
+
+        keys = self._keys or {}
+        if kid not in keys and (
+            time.monotonic() - fetched_at > self.min_refetch_interval
+        ):
+            # The pool may have rotated its signing key.
+            self._fetch(fetched_before=fetched_at)
+            keys = self._keys or {}
+
+        return keys.get(kid)
+
+    def clear(self) -> None:
+        with self._fetch_lock:
+            self._keys = None
+            self._fetched_at = 0.0
+
+
+jwks_cache = JwksCache(JWKS_URL)
+# Decoded claims keyed by token hash, kept until the token expires.
+decoded_token_cache: TTLCache[str, dict] = TTLCache(max_size=DECODED_TOKEN_CACHE_SIZE)
+
+
+def _decode_token(token: str) -> dict:
     header = jwt.get_unverified_header(token)
-    key = [k for k in keys if k["kid"] == header["kid"]][0]
+    key = jwks_cache.get_key(header["kid"])
+    if key is None:
+        # Kept as IndexError for backward compatibility with callers
+        raise IndexError(f"Unknown signing key: {header['kid']}")
+
     # The JWT returned from the Identity Provider may contain an at_hash
     # jose jwt.decode verifies id_token with access_token by default if it contains at_hash
     # See : https://github.com/mpdavis/python-jose/blob/4b0701b46a8d00988afcc5168c2b3a1fd60d15d8/jose/jwt.py#L59
     # Since we are not using an access token in the app, skipping the verification of the at_hash.
     # so we will disable the verify_at_hash check.
-    decoded = jwt.decode(
+    return jwt.decode(
         token,
         key,
         algorithms=["RS256"],
         options={"verify_at_hash": False},
         audience=CLIENT_ID,
     )
-    return decoded
+
+
+def verify_token(token: str) -> dict:
+    # Verify JWT token
+    decoded = decoded_token_cache.get_or_load(
+        hashlib.sha256(token.encode("utf-8")).hexdigest(),
+        lambda: _decode_token(token),
+        # Never serve a cached result past the token's own expiry
+        ttl=lambda claims: claims["exp"] - time.time() if "exp" in claims else 0,
+    )
+    return dict(decoded)
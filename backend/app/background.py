@@ -0,0 +1,107 @@
+"""Work deferred until after the response, within the same invocation.
+
+Lambda freezes the execution environment once the handler returns, so work
+left running in a thread may be delayed until the next invocation or lost with
+the environment. Handlers call `drain_background_tasks` before returning.
+
+Modules that buffer writes across invocations register an `on_drain` hook,
+which runs with every drain so that buffered writes do not wait for a later
+invocation of the same kind.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BACKGROUND_MAX_WORKERS = int(os.environ.get("BACKGROUND_MAX_WORKERS", "4"))
+# Tasks submitted while this many are pending run in the caller instead.
+BACKGROUND_MAX_PENDING = int(os.environ.get("BACKGROUND_MAX_PENDING", "64"))
+BACKGROUND_DRAIN_TIMEOUT = 10
+
+
+class BackgroundTasks:
+    """Bounded executor for tasks whose failure must not fail the request.
+
+    Exceptions are logged, never raised to the submitter.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = BACKGROUND_MAX_WORKERS,
+        max_pending: int = BACKGROUND_MAX_PENDING,
+    ) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="background"
+        )
+        self._slots = threading.Semaphore(max_pending)
+        self._pending: set[Future] = set()
+        self._lock = threading.Lock()
+        self._drain_hooks: list[tuple[str, Callable[[], object]]] = []
+
+    def _run(self, name: str, fn: Callable[[], object]) -> None:
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.exception(f"Background task {name} failed: {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Background task {name} took {elapsed_ms:.1f}ms")
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def submit(self, name: str, fn: Callable[[], object]) -> None:
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"Too many background tasks pending. Running {name} now.")
+            self._run(name, fn)
+            return
+
+        future = self._executor.submit(self._run, name, fn)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+
+    def on_drain(self, name: str, fn: Callable[[], object]) -> None:
+        """Submit `fn` as a task whenever the tasks are drained."""
+        self._drain_hooks.append((name, fn))
+
+    def drain(self, timeout: float = BACKGROUND_DRAIN_TIMEOUT) -> bool:
+        """Wait for the pending tasks. Returns False if some did not finish."""
+        for name, fn in self._drain_hooks:
+            self.submit(name, fn)
+
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return True
+
+        _, not_done = wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning(
+                f"{len(not_done)} background tasks did not finish in {timeout}s"
+            )
+        return not not_done
+
+
+background_tasks = BackgroundTasks()
+
+
+def submit_background_task(name: str, fn: Callable[[], object]) -> None:
+    background_tasks.submit(name, fn)
+
+
+def on_drain_background_tasks(name: str, fn: Callable[[], object]) -> None:
+    background_tasks.on_drain(name, fn)
+
+
+def drain_background_tasks(timeout: float = BACKGROUND_DRAIN_TIMEOUT) -> bool:
+    return background_tasks.drain(timeout=timeout)
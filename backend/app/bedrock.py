@@ -6,6 +6,8 @@ from typing import (
     TYPE_CHECKING,
     Any,
     Literal,
+    Mapping,
+    NamedTuple,
     NotRequired,
     Optional,
     TypedDict,
@@ -22,7 +24,7 @@ from app.config import (
 from app.repositories.models.custom_bot import GenerationParamsModel
 from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
 from app.routes.schemas.conversation import type_model_name
-from app.utils import get_bedrock_runtime_client
+from app.utils import LazyClient, get_bedrock_runtime_client
 from app.vector_search import SearchResult
 
 from botocore.exceptions import ClientError
@@ -55,6 +57,52 @@ ENABLE_BEDROCK_CROSS_REGION_INFERENCE = (
     os.environ.get("ENABLE_BEDROCK_CROSS_REGION_INFERENCE", "false") == "true"
 )
 
+# Bedrock accepts up to 4 cache points per request
+PROMPT_CACHE_MAX_POINTS = 4
+# Prefixes shorter than this are not cached, so cache points ending them are
+# wasted. See https://docs.aws.amazon.com/bedrock/latest/userguide/prompt-caching.html
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_MODEL_MIN_TOKENS: dict[str, int] = {
+    "claude-v3.5-haiku": 2048,
+    "claude-v4.5-haiku": 4096,
+    "claude-v4.5-opus": 4096,
+}
+# Used to estimate tokens where counting them with the model would be too slow
+ESTIMATED_CHARS_PER_TOKEN = 4
+ESTIMATED_IMAGE_TOKENS = 1600
+
+# Context window of the models, in tokens
+DEFAULT_CONTEXT_WINDOW_TOKENS = 128000
+CONTEXT_WINDOW_TOKENS: dict[str, int] = {
+    "claude-v4-opus": 200000,
+    "claude-v4.1-opus": 200000,
+    "claude-v4.5-opus": 200000,
+    "claude-v4-sonnet": 200000,
+    "claude-v4.5-sonnet": 200000,
+    "claude-v4.5-haiku": 200000,
+    "claude-v3.5-sonnet": 200000,
+    "claude-v3.5-sonnet-v2": 200000,
+    "claude-v3.7-sonnet": 200000,
+    "claude-v3.5-haiku": 200000,
+    "claude-v3-haiku": 200000,
+    "claude-v3-opus": 200000,
+    "mistral-7b-instruct": 32000,
+    "mixtral-8x7b-instruct": 32000,
+    "mistral-large": 32000,
+    "mistral-large-2": 128000,
+    "amazon-nova-pro": 300000,
+    "amazon-nova-lite": 300000,
+    "amazon-nova-micro": 128000,
+    "deepseek-r1": 128000,
+    "llama3-3-70b-instruct": 128000,
+    "llama3-2-1b-instruct": 128000,
+    "llama3-2-3b-instruct": 128000,
+    "llama3-2-11b-instruct": 128000,
+    "llama3-2-90b-instruct": 128000,
+    "gpt-oss-20b": 128000,
+    "gpt-oss-120b": 128000,
+}
+
 # Base model IDs mapping
 BASE_MODEL_IDS = {
     "claude-v4-opus": "anthropic.claude-opus-4-20250514-v1:0",
@@ -374,7 +422,7 @@ REGIONAL_INFERENCE_PROFILES = {
     },
 }
 
-client = get_bedrock_runtime_client()
+client = LazyClient(get_bedrock_runtime_client)
 
 
 class BedrockThrottlingException(Exception): ...
@@ -461,6 +509,120 @@ def is_prompt_caching_supported(
         ]
 
 
+def get_context_window_tokens(model: type_model_name) -> int:
+    return CONTEXT_WINDOW_TOKENS.get(model, DEFAULT_CONTEXT_WINDOW_TOKENS)
+
+
+def get_prompt_cache_min_tokens(model: type_model_name) -> int:
+    return PROMPT_CACHE_MODEL_MIN_TOKENS.get(model, PROMPT_CACHE_MIN_TOKENS)
+
+
+def _count_chars(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+
+    elif isinstance(value, Mapping):
+        if "image" in value:
+            return ESTIMATED_IMAGE_TOKENS * ESTIMATED_CHARS_PER_TOKEN
+
+        return sum(len(key) + _count_chars(item) for key, item in value.items())
+
+    elif isinstance(value, (list, tuple)):
+        return sum(_count_chars(item) for item in value)
+
+    return len(str(value))
+
+
+def estimate_tokens(value: Any) -> int:
+    """Roughly estimate the tokens of content blocks, system prompts or tool
+    specs in the Converse API format, without calling the model.
+    """
+    return _count_chars(value) // ESTIMATED_CHARS_PER_TOKEN
+
+
+class PromptCachePrefix(NamedTuple):
+    """Cache points placed before the messages."""
+
+    tools: bool
+    system: bool
+    # Estimated tokens of the tool specs and the system prompt
+    tokens: int
+
+    @property
+    def points(self) -> int:
+        return int(self.tools) + int(self.system)
+
+
+def plan_prefix_cache_points(
+    model: type_model_name,
+    system: list[Any],
+    tools: list[Any],
+    has_tools: bool = False,
+) -> PromptCachePrefix:
+    """Choose whether the tool specs and the system prompt end with a cache point.
+
+    Bedrock caches the tool specs, the system prompt and the messages in this
+    order, so each cache point covers everything before it. A cache point is
+    only placed if that prefix is long enough to be cached.
+    """
+    tool_tokens = estimate_tokens(tools)
+    tokens = tool_tokens + estimate_tokens(system)
+    if (tools or has_tools) and not is_prompt_caching_supported(model, target="tool"):
+        return PromptCachePrefix(tools=False, system=False, tokens=tokens)
+
+    min_tokens = get_prompt_cache_min_tokens(model)
+    return PromptCachePrefix(
+        tools=len(tools) > 0 and tool_tokens >= min_tokens,
+        system=len(system) > 0
+        and is_prompt_caching_supported(model, target="system")
+        and tokens >= min_tokens,
+        tokens=tokens,
+    )
+
+
+def _is_turn_start(message: Mapping[str, Any]) -> bool:
+    # Tool results are sent as user messages within a turn
+    return message["role"] == "user" and not all(
+        "toolResult" in block for block in message["content"]
+    )
+
+
+def plan_message_cache_points(
+    model: type_model_name,
+    messages: list[Any],
+    prefix: PromptCachePrefix | None = None,
+) -> list[int]:
+    """Choose the messages to end with a cache point, by index.
+
+    The history up to the latest user message is written to the cache, and
+    read back in the next turn from the cache point on the same message. So
+    the latest user message gets a cache point, then the user message of the
+    previous turn, then those of earlier turns, e.g. to reuse the history
+    when an earlier message is edited or regenerated. Points that would cache
+    less than the minimum of the model, and those beyond the limit of cache
+    points per request, are left out.
+    """
+    if not is_prompt_caching_supported(model, target="message"):
+        return []
+
+    if prefix is None:
+        prefix = PromptCachePrefix(tools=False, system=False, tokens=0)
+
+    min_tokens = get_prompt_cache_min_tokens(model)
+    prefix_tokens: list[int] = []
+    tokens = prefix.tokens
+    for message in messages:
+        tokens += estimate_tokens(message["content"])
+        prefix_tokens.append(tokens)
+
+    indices = [
+        index
+        for index in reversed(range(len(messages)))
+        if _is_turn_start(messages[index]) and prefix_tokens[index] >= min_tokens
+    ]
+    return sorted(indices[: PROMPT_CACHE_MAX_POINTS - prefix.points])
+
+
 def is_multiple_system_prompt_content_supported(model: type_model_name):
     return not (
         is_nova_model(model)
@@ -738,7 +900,16 @@ def simple_message_models_to_bedrock_messages(
     guardrail: BedrockGuardrailsModel | None = None,
     search_results: list[SearchResult] | None = None,
     prompt_caching_enabled: bool = True,
+    cache_prefix: PromptCachePrefix | None = None,
 ) -> list[MessageTypeDef]:
+    """Convert messages to the Converse API format.
+
+    If prompt caching is enabled, cache points are placed on the messages as
+    planned by `plan_message_cache_points`, leaving room for the cache points
+    in `cache_prefix`.
+    """
+    from app.message_cache import convert_messages
+
     grounding_source = None
     if search_results and guardrail and guardrail.is_guardrail_enabled:
         grounding_source = _to_guardrails_grounding_source(search_results)
@@ -770,28 +941,39 @@ def simple_message_models_to_bedrock_messages(
 
         return c.to_contents_for_converse()
 
+    def convert(message: SimpleMessageModel) -> list[ContentBlockTypeDef]:
+        return [
+            block for c in message.content for block in process_content(c, message.role)
+        ]
+
+    conversation_messages = [
+        message for message in simple_messages if _is_conversation_role(message.role)
+    ]
     messages: list[MessageTypeDef] = [
         {
             "role": message.role,
-            "content": [
-                block
-                for c in message.content
-                for block in process_content(c, message.role)
-            ],
+            "content": content,
         }
-        for message in simple_messages
+        for message, content in zip(
+            conversation_messages,
+            convert_messages(
+                conversation_messages,
+                convert,
+                variant=("converse", is_unsigned_reasoning_content_supported(model)),
+                # Texts of user messages are wrapped with the grounding source of
+                # the turn
+                cacheable=lambda message: grounding_source is None
+                or message.role != "user",
+            ),
+        )
+        # Narrows the role for the type checker, all messages pass
         if _is_conversation_role(message.role)
     ]
 
-    if prompt_caching_enabled and is_prompt_caching_supported(model, target="message"):
-        for order, message in enumerate(
-            filter(lambda m: m["role"] == "user", reversed(messages))
-        ):
-            if order >= 2:
-                break
-
-            message["content"] = [
-                *(message["content"]),
+    if prompt_caching_enabled:
+        for index in plan_message_cache_points(model, messages, cache_prefix):
+            messages[index]["content"] = [
+                *(messages[index]["content"]),
                 {
                     "cachePoint": {"type": "default"},
                 },
@@ -957,13 +1139,6 @@ def compose_args_for_converse_api(
     enable_reasoning: bool = False,
     prompt_caching_enabled: bool = False,
 ) -> ConverseStreamRequestTypeDef:
-    arg_messages = simple_message_models_to_bedrock_messages(
-        simple_messages=messages,
-        model=model,
-        guardrail=guardrail,
-        search_results=search_results,
-        prompt_caching_enabled=prompt_caching_enabled,
-    )
     tool_specs: list[ToolTypeDef] | None = (
         [
             {
@@ -1006,10 +1181,22 @@ def compose_args_for_converse_api(
             else []
         )
 
-    if prompt_caching_enabled and not (
-        tool_specs and not is_prompt_caching_supported(model, target="tool")
-    ):
-        if is_prompt_caching_supported(model, "system") and len(system_prompts) > 0:
+    cache_prefix = (
+        plan_prefix_cache_points(model, system=system_prompts, tools=tool_specs or [])
+        if prompt_caching_enabled
+        else None
+    )
+    arg_messages = simple_message_models_to_bedrock_messages(
+        simple_messages=messages,
+        model=model,
+        guardrail=guardrail,
+        search_results=search_results,
+        prompt_caching_enabled=prompt_caching_enabled,
+        cache_prefix=cache_prefix,
+    )
+
+    if cache_prefix is not None:
+        if cache_prefix.system:
             system_prompts.append(
                 {
                     "cachePoint": {
@@ -1018,7 +1205,7 @@ def compose_args_for_converse_api(
                 }
             )
 
-        if is_prompt_caching_supported(model, target="tool") and tool_specs:
+        if cache_prefix.tools and tool_specs:
             tool_specs.append(
                 {
                     "cachePoint": {
@@ -9,12 +9,16 @@ from app.repositories.api_publication import (
     find_usage_plan_by_id,
 )
 from app.repositories.common import RecordNotFoundError, decompose_sk
-from app.utils import delete_api_key_from_secret_manager
+from app.utils import (
+    LazyClient,
+    delete_api_key_from_secret_manager,
+    get_aws_client,
+)
 
 DOCUMENT_BUCKET = os.environ.get("DOCUMENT_BUCKET", "documents")
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
 
-s3_client = boto3.client("s3", BEDROCK_REGION)
+s3_client = LazyClient(lambda: get_aws_client("s3", region_name=BEDROCK_REGION))
 
 
 def delete_custom_bot_stack_by_bot_id(bot_id: str):
@@ -0,0 +1,185 @@
+"""In-process caches shared by the repositories and use cases.
+
+Lambda containers are reused across invocations, so anything kept at module
+level survives between requests. These helpers keep such state bounded and
+thread-safe.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    # Monotonic time after which the entry is discarded. `None` never expires.
+    expires_at: float | None
+
+
+class TTLCache(Generic[K, V]):
+    """Thread-safe LRU cache with optional per-entry expiry.
+
+    Args:
+        max_size: Maximum number of entries. The least recently used entry is
+            evicted when the cache is full.
+        ttl: Default time-to-live in seconds. `None` keeps entries until evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict[K, _Entry[V]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-key locks used to deduplicate concurrent loads.
+        self._loading: dict[K, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return self.peek(key) is not None
+
+    def _lookup(self, key: K, now: float) -> _Entry[V] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires_at is not None and entry.expires_at <= now:
+            del self._entries[key]
+            return None
+
+        return entry
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value, counting the lookup in `stats`."""
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry.value
+
+    def peek(self, key: K) -> V | None:
+        """Return the cached value without touching LRU order or `stats`."""
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            return entry.value if entry is not None else None
+
+    def expires_in(self, key: K) -> float | None:
+        """Seconds until the entry expires, or `None` if absent or non-expiring."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._lookup(key, now)
+            if entry is None or entry.expires_at is None:
+                return None
+
+            return entry.expires_at - now
+
+    def put(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Store `value`. `ttl` overrides the cache default for this entry."""
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = _Entry(value=value, expires_at=expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_load(
+        self,
+        key: K,
+        loader: Callable[[], V],
+        ttl: float | Callable[[V], float | None] | None = None,
+    ) -> V:
+        """Return the cached value, calling `loader` on a miss.
+
+        Concurrent misses for the same key share a single `loader` call.
+        `ttl` may be a function of the loaded value, e.g. to follow a token's
+        own expiry. A non-positive TTL returns the value without caching it.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        return self.load(key, loader, ttl=ttl)
+
+    def load(
+        self,
+        key: K,
+        loader: Callable[[], V],
+        ttl: float | Callable[[V], float | None] | None = None,
+    ) -> V:
+        """Call `loader` and cache its result, deduplicating concurrent calls.
+
+        Callers that already missed via `get` use this directly so that the
+        miss is only counted once.
+        """
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                # Another thread may have loaded the value while we waited.
+                value = self.peek(key)
+                if value is not None:
+                    return value
+
+                value = loader()
+                entry_ttl = ttl(value) if callable(ttl) else ttl
+                if entry_ttl is None or entry_ttl > 0:
+                    self.put(key, value, ttl=entry_ttl)
+                return value
+
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is key_lock:
+                        del self._loading[key]
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> int:
+        """Drop all entries whose key matches `predicate`. Returns the count."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -3,20 +3,13 @@ import os
 import traceback
 from typing import Callable
 
+from app.background import drain_background_tasks
 from app.dependencies import get_current_user
 from app.repositories.common import (
     RecordAccessNotAllowedError,
     RecordNotFoundError,
     ResourceConflictError,
 )
-from app.routes.admin import router as admin_router
-from app.routes.api_publication import router as api_publication_router
-from app.routes.bot import router as bot_router
-from app.routes.bot_store import router as bot_store_router
-from app.routes.conversation import router as conversation_router
-from app.routes.global_config import router as global_config_router
-from app.routes.published_api import router as published_api_router
-from app.routes.user import router as user_router
 from app.user import User
 from app.utils import is_running_on_lambda
 from fastapi import Depends, FastAPI, Request
@@ -24,6 +17,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.types import ASGIApp, Message
@@ -59,7 +53,17 @@ app = FastAPI(
 )
 
 
+# Routers are imported only for the API being served, so that the published API
+# does not load the modules of the main API on a cold start and vice versa.
 if not is_published_api:
+    from app.routes.admin import router as admin_router
+    from app.routes.api_publication import router as api_publication_router
+    from app.routes.bot import router as bot_router
+    from app.routes.bot_store import router as bot_store_router
+    from app.routes.conversation import router as conversation_router
+    from app.routes.global_config import router as global_config_router
+    from app.routes.user import router as user_router
+
     app.include_router(conversation_router)
     app.include_router(bot_router)
     app.include_router(api_publication_router)
@@ -68,6 +72,8 @@ if not is_published_api:
     app.include_router(bot_store_router)
     app.include_router(global_config_router)
 else:
+    from app.routes.published_api import router as published_api_router
+
     app.include_router(published_api_router)
 
 
@@ -77,6 +83,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination token of `GET /conversations`
+    expose_headers=["X-Next-Token"],
 )
 
 
@@ -135,6 +143,14 @@ def add_current_user_to_request(request: Request, call_next: ASGIApp):
     return response
 
 
+@app.middleware("http")
+async def drain_background_tasks_after_request(request: Request, call_next: ASGIApp):
+    response = await call_next(request)  # type: ignore
+    # Post-turn bookkeeping must finish before Lambda freezes the environment
+    await run_in_threadpool(drain_background_tasks)
+    return response
+
+
 @app.middleware("http")
 async def add_log_requests(request: Request, call_next: ASGIApp):
     logger.info(f"Request path: {request.url.path}")
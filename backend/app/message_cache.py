@@ -0,0 +1,141 @@
+"""Cache of conversation history converted for the model.
+
+Each turn sends the whole branch of the conversation to the model, although
+only the latest messages are new. Content blocks converted from a message are
+cached per message, so that earlier messages are neither converted nor have
+their blobs fetched again. Messages are identified by the cache key that
+`trace_to_root` sets, and blocks by what else the conversion depends on, e.g.
+the API and the model family. Only the latest blocks of a message are kept.
+
+Blocks holding raw bytes, i.e. images and documents, are not cached: they
+would keep the attachments of every cached conversation in memory.
+
+Conversation ids come from the client, so entries are scoped to the user as
+well: the cache is shared by all requests served by the process.
+"""
+
+import logging
+import os
+from typing import Any, Callable, Hashable
+
+from app.cache import TTLCache
+from app.repositories.blob_store import resolve_blobs
+from app.repositories.models.conversation import SimpleMessageModel, TextContentModel
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Number of conversations to keep the converted messages of
+MESSAGE_CACHE_SIZE = int(os.environ.get("MESSAGE_CACHE_SIZE", "64"))
+MESSAGE_CACHE_TTL = int(os.environ.get("MESSAGE_CACHE_TTL", str(15 * 60)))
+
+# Converted blocks by user and conversation, then by message, along with the
+# variant and fingerprint they were converted for
+message_cache: TTLCache[tuple[str, str], dict[str, tuple[tuple, list[Any]]]] = TTLCache(
+    max_size=MESSAGE_CACHE_SIZE, ttl=MESSAGE_CACHE_TTL
+)
+
+
+def compose_message_cache_key(
+    user_id: str, conversation_id: str, message_id: str
+) -> tuple[tuple[str, str], str]:
+    return (user_id, conversation_id), message_id
+
+
+def _fingerprint(message: SimpleMessageModel) -> tuple[int, ...]:
+    # Text is the only content appended to in place, when continuing a generation
+    return tuple(
+        len(content.body)
+        for content in message.content
+        if isinstance(content, TextContentModel)
+    )
+
+
+def _has_bytes(value: Any) -> bool:
+    if isinstance(value, (bytes, bytearray)):
+        return True
+    if isinstance(value, dict):
+        return any(_has_bytes(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_bytes(v) for v in value)
+    return False
+
+
+def _copy_blocks(blocks: list[Any]) -> list[Any]:
+    """Copy blocks down to the dicts they hold, sharing anything deeper.
+
+    Callers may modify what they get, e.g. Strands replaces blank texts and
+    redacts tool results in place, but only at these levels.
+    """
+    return [
+        {k: dict(v) if isinstance(v, dict) else v for k, v in block.items()}
+        for block in blocks
+    ]
+
+
+def convert_messages(
+    messages: list[SimpleMessageModel],
+    convert: Callable[[SimpleMessageModel], list[Any]],
+    variant: Hashable,
+    cacheable: Callable[[SimpleMessageModel], bool] | None = None,
+) -> list[list[Any]]:
+    """Return the content blocks of each message as converted by `convert`.
+
+    Blocks of messages with a cache key are reused until the message changes.
+
+    Args:
+        messages: Messages to convert.
+        convert: Converts a message to its content blocks.
+        variant: Everything besides the message that the result of `convert`
+            depends on.
+        cacheable: Whether the blocks of a message may be cached. Defaults to
+            all messages with a cache key.
+    """
+    conversations: dict[tuple[str, str], dict[str, tuple[tuple, list[Any]]]] = {}
+    entries: list[tuple[dict[str, tuple[tuple, list[Any]]], str, tuple] | None] = []
+    for message in messages:
+        cache_key = message._cache_key
+        if cache_key is None or (cacheable is not None and not cacheable(message)):
+            entries.append(None)
+            continue
+
+        conversation_key, message_key = cache_key
+        blocks_by_key = conversations.get(conversation_key)
+        if blocks_by_key is None:
+            blocks_by_key = message_cache.get(conversation_key)
+            if blocks_by_key is None:
+                blocks_by_key = {}
+                message_cache.put(conversation_key, blocks_by_key)
+            conversations[conversation_key] = blocks_by_key
+
+        entries.append((blocks_by_key, message_key, (variant, _fingerprint(message))))
+
+    cached: list[list[Any] | None] = []
+    for entry in entries:
+        found = entry[0].get(entry[1]) if entry is not None else None
+        if found is None or entry is None or found[0] != entry[2]:
+            # Not cached, or cached for another variant or version of the message
+            cached.append(None)
+        else:
+            cached.append(found[1])
+
+    misses = [message for message, blocks in zip(messages, cached) if blocks is None]
+    if misses:
+        logger.debug(f"Converting {len(misses)} of {len(messages)} messages")
+        resolve_blobs(content for message in misses for content in message.content)
+
+    results: list[list[Any]] = []
+    for message, entry, blocks in zip(messages, entries, cached):
+        if blocks is None:
+            blocks = convert(message)
+            if entry is None or _has_bytes(blocks):
+                results.append(blocks)
+                continue
+
+            # Replaces the blocks of any other variant or version
+            blocks_by_key, message_key, version = entry
+            blocks_by_key[message_key] = (version, blocks)
+
+        results.append(_copy_blocks(blocks))
+
+    return results
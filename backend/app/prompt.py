@@ -160,3 +160,47 @@ first answer [^aaa].
 """
 
     return inserted_prompt
+
+
+def build_history_summary_prompt(summary: str) -> str:
+    # Prompt for the summary of the messages dropped from the context window.
+    return """The earlier part of this conversation is no longer shown. Here is a summary of it:
+<conversation_summary>
+{}
+</conversation_summary>
+""".format(
+        summary
+    )
+
+
+def build_summarize_history_prompt(
+    transcript: str, previous_summary: str | None
+) -> str:
+    # Prompt to summarize the messages dropped from the context window.
+    previous = (
+        """Here is the summary of the conversation before the transcript:
+<previous_summary>
+{}
+</previous_summary>
+
+""".format(
+            previous_summary
+        )
+        if previous_summary
+        else ""
+    )
+    return """{}Here is a transcript of a conversation between a user and an assistant:
+<transcript>
+{}
+</transcript>
+
+Summarize the conversation so that the assistant can continue it without the transcript. When summarizing, please follow the rules below:
+<rules>
+- Keep the facts, decisions, names, numbers and open questions the user may refer to later.
+- Include the previous summary, if any, in your summary.
+- Summary must be in the same language as the conversation.
+- Return the summary only. DO NOT include any strings other than the summary.
+</rules>
+""".format(
+        previous, transcript
+    )
@@ -0,0 +1,118 @@
+"""Content-addressed store of image and attachment bodies.
+
+Bodies are stored once per user under the SHA-256 of their bytes, so a file
+attached in several turns or conversations is uploaded once. Stored messages
+keep the key in `blob_key` and an empty `body`. `resolve_blobs` fetches the
+bodies, concurrently, when a request to the model or the API response needs
+them.
+"""
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from app.cache import TTLCache
+from app.repositories.models.conversation import (
+    AttachmentContentModel,
+    ContentModel,
+    ImageContentModel,
+)
+from app.utils import LazyClient, get_aws_client
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Blobs share the bucket of large messages. Bodies stay in the message if unset.
+BLOB_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET")
+# Smaller bodies are kept in the message
+BLOB_MIN_SIZE = int(os.environ.get("BLOB_MIN_SIZE", "4096"))
+BLOB_MAX_WORKERS = int(os.environ.get("BLOB_MAX_WORKERS", "8"))
+BLOB_CACHE_SIZE = int(os.environ.get("BLOB_CACHE_SIZE", "16"))
+
+BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
+s3_client = LazyClient(lambda: get_aws_client("s3", region_name=BEDROCK_REGION))
+
+_executor = ThreadPoolExecutor(max_workers=BLOB_MAX_WORKERS, thread_name_prefix="blob")
+
+# Bodies by key. Blobs are immutable, so entries never go stale. A cached key
+# is also known to exist in the bucket.
+blob_cache: TTLCache[str, bytes] = TTLCache(max_size=BLOB_CACHE_SIZE)
+
+
+def compose_blob_prefix(user_id: str) -> str:
+    return f"{user_id}/blobs/"
+
+
+def compose_blob_key(user_id: str, body: bytes) -> str:
+    return f"{compose_blob_prefix(user_id)}{hashlib.sha256(body).hexdigest()}"
+
+
+def is_blob_store_enabled() -> bool:
+    return BLOB_BUCKET is not None
+
+
+def _put_blob(key: str, body: bytes) -> None:
+    if key in blob_cache:
+        return
+
+    try:
+        s3_client.head_object(Bucket=BLOB_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+            raise e
+
+        s3_client.put_object(Bucket=BLOB_BUCKET, Key=key, Body=body)
+
+    blob_cache.put(key, body)
+
+
+def _get_blob(key: str) -> bytes:
+    return blob_cache.get_or_load(
+        key,
+        lambda: s3_client.get_object(Bucket=BLOB_BUCKET, Key=key)["Body"].read(),
+    )
+
+
+def store_blobs(user_id: str, contents: Iterable[ContentModel]) -> None:
+    """Upload the bodies of the image and attachment contents that are not in
+    the blob store yet and set their `blob_key`. Bodies are kept in memory.
+    """
+    if not is_blob_store_enabled():
+        return
+
+    pending = [
+        content
+        for content in contents
+        if isinstance(content, (ImageContentModel, AttachmentContentModel))
+        and content.blob_key is None
+        and len(content.body) >= BLOB_MIN_SIZE
+    ]
+    if not pending:
+        return
+
+    keys = [compose_blob_key(user_id, content.body) for content in pending]
+    list(_executor.map(_put_blob, keys, [content.body for content in pending]))
+    for content, key in zip(pending, keys):
+        content.blob_key = key
+
+
+def resolve_blobs(contents: Iterable[ContentModel]) -> None:
+    """Fetch the bodies of the contents loaded without them, concurrently."""
+    pending = [
+        content
+        for content in contents
+        if isinstance(content, (ImageContentModel, AttachmentContentModel))
+        and content.blob_key is not None
+        and not content.body
+    ]
+    if not pending:
+        return
+
+    keys = list({content.blob_key for content in pending if content.blob_key})
+    logger.info(f"Fetching {len(keys)} blobs")
+    bodies = dict(zip(keys, _executor.map(_get_blob, keys)))
+    for content in pending:
+        content.body = bodies[content.blob_key]  # type: ignore[index]
@@ -1,12 +1,17 @@
+from __future__ import annotations
+
 import logging
 import os
 import random
 import time
+from typing import TYPE_CHECKING
 
 from app.repositories.common import get_opensearch_client
 from app.repositories.models.custom_bot import BotMeta
 from app.user import User
-from opensearchpy import OpenSearch
+
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
 
 env_prefix = os.environ.get("ENV_PREFIX", "")
 INDEX_NAME = f"{env_prefix}bot"
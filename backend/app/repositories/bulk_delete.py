@@ -0,0 +1,215 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from app.repositories.common import TRANSACTION_BATCH_WRITE_SIZE
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# S3 DeleteObjects accepts up to 1000 keys per request
+S3_DELETE_BATCH_SIZE = 1000
+BULK_DELETE_MAX_WORKERS = int(os.environ.get("BULK_DELETE_MAX_WORKERS", "8"))
+# Attempts of a BatchWriteItem request until no item is left unprocessed
+BULK_DELETE_MAX_ATTEMPTS = 8
+BULK_DELETE_BACKOFF_BASE = 0.05
+BULK_DELETE_BACKOFF_MAX = 5.0
+
+
+class BulkDeleteError(Exception):
+    pass
+
+
+@dataclass
+class BulkDeleteProgress:
+    deleted_items: int = 0
+    deleted_objects: int = 0
+
+
+class BulkDeleter:
+    """Deletes DynamoDB items and their S3 objects with concurrent batch requests.
+
+    Items are deleted with `BatchWriteItem` in batches of 25, retrying
+    unprocessed items with exponential backoff. S3 objects are deleted with
+    `DeleteObjects` in batches of 1000. An item with an S3 object is only
+    deleted once the object is, so that no item refers to a missing object.
+
+    Use as a context manager, or call `close` to wait for all deletions.
+    The first failed request is raised from `close`.
+
+    Args:
+        table: DynamoDB table resource.
+        s3_client: S3 client for the objects. Required to pass `object_key`.
+        bucket: Bucket of the objects.
+        on_progress: Called with the progress after each completed batch.
+    """
+
+    def __init__(
+        self,
+        table,
+        s3_client: Any = None,
+        bucket: str | None = None,
+        max_workers: int = BULK_DELETE_MAX_WORKERS,
+        on_progress: Callable[[BulkDeleteProgress], None] | None = None,
+    ) -> None:
+        self.table = table
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.progress = BulkDeleteProgress()
+        self._on_progress = on_progress
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bulk-delete"
+        )
+        self._lock = threading.Lock()
+        self._keys: list[dict] = []
+        # Pairs of object key and the key of the item referring to it, if any
+        self._objects: list[tuple[str, dict | None]] = []
+        self._futures: set[Future] = set()
+
+    def __enter__(self) -> "BulkDeleter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def delete(self, key: dict, object_key: str | None = None) -> None:
+        """Delete the item `key`, after the S3 object `object_key` if given."""
+        if object_key is None:
+            self._add_keys([key])
+            return
+
+        self._add_object(object_key, key)
+
+    def delete_object(self, object_key: str) -> None:
+        """Delete an S3 object no item refers to."""
+        self._add_object(object_key, None)
+
+    def close(self) -> None:
+        """Delete the buffered items and wait for all deletions to finish."""
+        try:
+            while True:
+                with self._lock:
+                    objects, self._objects = self._objects, []
+                    futures = list(self._futures)
+                if objects:
+                    self._submit(self._delete_objects, objects)
+                    continue
+
+                if futures:
+                    for future in futures:
+                        future.result()
+                        with self._lock:
+                            self._futures.discard(future)
+                    continue
+
+                # Items left over once the objects they refer to are deleted
+                with self._lock:
+                    keys, self._keys = self._keys, []
+                if not keys:
+                    break
+                for i in range(0, len(keys), TRANSACTION_BATCH_WRITE_SIZE):
+                    self._submit(
+                        self._write_batch, keys[i : i + TRANSACTION_BATCH_WRITE_SIZE]
+                    )
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+        logger.info(
+            f"Deleted {self.progress.deleted_items} items and "
+            f"{self.progress.deleted_objects} objects"
+        )
+
+    def _add_object(self, object_key: str, key: dict | None) -> None:
+        with self._lock:
+            self._objects.append((object_key, key))
+            if len(self._objects) < S3_DELETE_BATCH_SIZE:
+                return
+            batch, self._objects = self._objects, []
+        self._submit(self._delete_objects, batch)
+
+    def _submit(self, fn: Callable[[list], None], batch: list) -> None:
+        future = self._executor.submit(fn, batch)
+        with self._lock:
+            self._futures.add(future)
+
+    def _add_keys(self, keys: list[dict]) -> None:
+        batches = []
+        with self._lock:
+            self._keys.extend(keys)
+            while len(self._keys) >= TRANSACTION_BATCH_WRITE_SIZE:
+                batches.append(self._keys[:TRANSACTION_BATCH_WRITE_SIZE])
+                self._keys = self._keys[TRANSACTION_BATCH_WRITE_SIZE:]
+
+        for batch in batches:
+            self._submit(self._write_batch, batch)
+
+    def _report(self, deleted_items: int = 0, deleted_objects: int = 0) -> None:
+        with self._lock:
+            self.progress.deleted_items += deleted_items
+            self.progress.deleted_objects += deleted_objects
+            if self._on_progress is not None:
+                self._on_progress(self.progress)
+
+    def _write_batch(self, keys: list[dict]) -> None:
+        client = self.table.meta.client  # Use DynamoDB client for batch_write_item
+        table_name = self.table.table_name
+        requests = [{"DeleteRequest": {"Key": key}} for key in keys]
+
+        for attempt in range(BULK_DELETE_MAX_ATTEMPTS):
+            if attempt > 0:
+                # Exponential backoff with full jitter
+                time.sleep(
+                    random.uniform(
+                        0,
+                        min(
+                            BULK_DELETE_BACKOFF_MAX,
+                            BULK_DELETE_BACKOFF_BASE * 2**attempt,
+                        ),
+                    )
+                )
+
+            response = client.batch_write_item(RequestItems={table_name: requests})
+            unprocessed = response.get("UnprocessedItems", {}).get(table_name, [])
+            self._report(deleted_items=len(requests) - len(unprocessed))
+            if not unprocessed:
+                return
+            requests = unprocessed
+
+        raise BulkDeleteError(
+            f"{len(requests)} items were left unprocessed after "
+            f"{BULK_DELETE_MAX_ATTEMPTS} attempts"
+        )
+
+    def _delete_objects(self, objects: list[tuple[str, dict | None]]) -> None:
+        response = self.s3_client.delete_objects(
+            Bucket=self.bucket,
+            Delete={
+                "Objects": [{"Key": object_key} for object_key, _ in objects],
+                "Quiet": True,
+            },
+        )
+        errors = response.get("Errors", [])
+        failed = {error["Key"] for error in errors}
+        self._report(deleted_objects=len(objects) - len(failed))
+
+        # Keep the items of objects that could not be deleted
+        self._add_keys(
+            [
+                key
+                for object_key, key in objects
+                if key is not None and object_key not in failed
+            ]
+        )
+        if errors:
+            raise BulkDeleteError(
+                f"Failed to delete {len(errors)} objects, e.g. {errors[0]['Key']}: "
+                f"{errors[0].get('Message')}"
+            )
@@ -1,10 +1,18 @@
 import json
+import logging
 import os
-from typing import Literal
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Literal
 
 import boto3
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+from app.cache import CacheStats, TTLCache
+
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 DDB_ENDPOINT_URL = os.environ.get("DDB_ENDPOINT_URL")
 CONVERSATION_TABLE_NAME = os.environ.get("CONVERSATION_TABLE_NAME", "")
@@ -22,6 +30,15 @@ OPENSEARCH_DOMAIN_ENDPOINT = os.environ.get(
 TRANSACTION_BATCH_WRITE_SIZE = 25
 TRANSACTION_BATCH_READ_SIZE = 100
 
+# Scoped (row-level) credentials issued by STS are cached per table and user.
+SCOPED_CREDENTIAL_CACHE_SIZE = int(
+    os.environ.get("SCOPED_CREDENTIAL_CACHE_SIZE", "256")
+)
+# Stop using credentials this many seconds before they expire.
+SCOPED_CREDENTIAL_EXPIRY_MARGIN = 120
+# Start a background refresh once credentials are this close to the margin.
+SCOPED_CREDENTIAL_REFRESH_AHEAD = 300
+
 type_table = Literal["conversation", "bot"]
 _table_name_map = {"conversation": CONVERSATION_TABLE_NAME, "bot": BOT_TABLE_NAME}
 
@@ -47,6 +64,49 @@ def decompose_conv_id(conv_id: str):
     return conv_id.split("#")[-1]
 
 
+def compose_message_item_id(user_id: str, conversation_id: str, message_id: str):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#MESSAGE#{conversation_id}#{message_id}"
+
+
+def compose_message_item_prefix(user_id: str, conversation_id: str | None = None):
+    return (
+        f"{user_id}#MESSAGE#{conversation_id}#"
+        if conversation_id
+        else f"{user_id}#MESSAGE#"
+    )
+
+
+def decompose_message_item_id(composed_id: str):
+    return composed_id.split("#")[-1]
+
+
+def compose_feedback_item_id(user_id: str, conversation_id: str, message_id: str):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#FEEDBACK#{conversation_id}#{message_id}"
+
+
+def compose_feedback_item_prefix(user_id: str, conversation_id: str | None = None):
+    return (
+        f"{user_id}#FEEDBACK#{conversation_id}#"
+        if conversation_id
+        else f"{user_id}#FEEDBACK#"
+    )
+
+
+def decompose_feedback_item_id(composed_id: str):
+    return composed_id.split("#")[-1]
+
+
+def compose_history_summary_id(user_id: str, conversation_id: str):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#HISTORY_SUMMARY#{conversation_id}"
+
+
+def compose_history_summary_prefix(user_id: str):
+    return f"{user_id}#HISTORY_SUMMARY#"
+
+
 def compose_related_document_source_id(
     user_id: str,
     conversation_id: str,
@@ -56,10 +116,32 @@ def compose_related_document_source_id(
     return f"{user_id}#RELATED_DOCUMENT#{conversation_id}#{source_id}"
 
 
+def compose_related_document_prefix(user_id: str, conversation_id: str | None = None):
+    return (
+        f"{user_id}#RELATED_DOCUMENT#{conversation_id}#"
+        if conversation_id
+        else f"{user_id}#RELATED_DOCUMENT#"
+    )
+
+
 def decompose_related_document_source_id(composed_id: str):
     return composed_id.split("#")[-1]
 
 
+def compose_blob_reference_id(user_id: str, blob_key: str):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#BLOB#{blob_key.rsplit('/', 1)[-1]}"
+
+
+def compose_blob_reference_prefix(user_id: str):
+    return f"{user_id}#BLOB#"
+
+
+def compose_deletion_job_id(user_id: str, job_id: str):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#DELETION_JOB#{job_id}"
+
+
 def compose_item_type(user_id: str, item_type: Literal["bot", "alias"]):
     if item_type == "bot":
         return f"{user_id}#BOT"
@@ -79,22 +161,7 @@ def decompose_sk(sk: str):
     return sk.split("#")[-1]
 
 
-def _get_aws_resource(service_name, table_name: str, user_id: str | None = None):
-    """Get AWS resource with optional row-level access control for DynamoDB.
-    Ref: https://docs.aws.amazon.com/IAM/latest/UserGuide/reference_policies_examples_dynamodb_items.html
-    """
-    if "AWS_EXECUTION_ENV" not in os.environ:
-        if DDB_ENDPOINT_URL:
-            return boto3.resource(
-                service_name,
-                endpoint_url=DDB_ENDPOINT_URL,
-                aws_access_key_id="key",
-                aws_secret_access_key="key",
-                region_name=REGION,
-            )  # type: ignore[call-overload]
-        else:
-            return boto3.resource(service_name, region_name=REGION)  # type: ignore[call-overload]
-
+def _compose_policy_document(table_name: str, user_id: str | None) -> str:
     policy_document: dict[str, list[dict]] = {
         "Statement": [
             {
@@ -126,19 +193,138 @@ def _get_aws_resource(service_name, table_name: str, user_id: str | None = None)
             "ForAllValues:StringLike": {"dynamodb:LeadingKeys": [f"{user_id}*"]}
         }
 
-    sts_client = boto3.client("sts")
-    assumed_role_object = sts_client.assume_role(
-        RoleArn=TABLE_ACCESS_ROLE_ARN,
-        RoleSessionName="DynamoDBSession",
-        Policy=json.dumps(policy_document),
-    )
-    credentials = assumed_role_object["Credentials"]
-    session = boto3.Session(
-        aws_access_key_id=credentials["AccessKeyId"],
-        aws_secret_access_key=credentials["SecretAccessKey"],
-        aws_session_token=credentials["SessionToken"],
-    )
-    return session.resource(service_name, region_name=REGION)  # type: ignore[call-overload]
+    return json.dumps(policy_document)
+
+
+class _ScopedCredentials:
+    """Assumed-role credentials and the resources bound to them.
+
+    boto3 sessions and resources are not thread-safe, so each thread gets its
+    own resource, created on first use and reused afterwards.
+    """
+
+    def __init__(self, service_name: str, credentials: dict) -> None:
+        self.service_name = service_name
+        self.credentials = credentials
+        self._local = threading.local()
+
+    def resource(self):
+        resource = getattr(self._local, "resource", None)
+        if resource is None:
+            session = boto3.Session(
+                aws_access_key_id=self.credentials["AccessKeyId"],
+                aws_secret_access_key=self.credentials["SecretAccessKey"],
+                aws_session_token=self.credentials["SessionToken"],
+            )
+            resource = session.resource(self.service_name, region_name=REGION)  # type: ignore[call-overload]
+            self._local.resource = resource
+
+        return resource
+
+
+class ScopedResourcePool:
+    """Cache of assumed-role credentials for boto3 resources.
+
+    Each entry is keyed by (service, table, user id), so the session policy and
+    therefore the row-level scope of a cached entry never changes. The
+    credentials are shared, but every thread gets its own resource.
+    Entries are dropped `expiry_margin` seconds before the credentials expire,
+    and refreshed in the background once they are within `refresh_ahead`
+    seconds of that point.
+    """
+
+    def __init__(
+        self,
+        max_size: int = SCOPED_CREDENTIAL_CACHE_SIZE,
+        expiry_margin: float = SCOPED_CREDENTIAL_EXPIRY_MARGIN,
+        refresh_ahead: float = SCOPED_CREDENTIAL_REFRESH_AHEAD,
+    ) -> None:
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        # Values are (credentials, ttl) pairs as returned by `_assume_role`.
+        self._cache: TTLCache[
+            tuple[str, str, str | None], tuple[_ScopedCredentials, float]
+        ] = TTLCache(max_size=max_size)
+        self._refreshing: set[tuple[str, str, str | None]] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._cache.stats
+
+    def _assume_role(self, service_name: str, table_name: str, user_id: str | None):
+        sts_client = boto3.client("sts")
+        assumed_role_object = sts_client.assume_role(
+            RoleArn=TABLE_ACCESS_ROLE_ARN,
+            RoleSessionName="DynamoDBSession",
+            Policy=_compose_policy_document(table_name, user_id),
+        )
+        credentials = assumed_role_object["Credentials"]
+        ttl = (
+            credentials["Expiration"] - datetime.now(timezone.utc)
+        ).total_seconds() - self.expiry_margin
+        return _ScopedCredentials(service_name, credentials), ttl
+
+    def _refresh(self, key: tuple[str, str, str | None]):
+        try:
+            credentials, ttl = self._assume_role(*key)
+            if ttl > 0:
+                self._cache.put(key, (credentials, ttl), ttl=ttl)
+        except Exception as e:
+            # The current credentials are still valid, so just log and retry later.
+            logger.warning(f"Failed to refresh scoped credentials: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, service_name: str, table_name: str, user_id: str | None = None):
+        key = (service_name, table_name, user_id)
+        cached = self._cache.get(key)
+        if cached is None:
+            # Concurrent misses for the same key share one STS call.
+            credentials, _ = self._cache.load(
+                key,
+                lambda: self._assume_role(service_name, table_name, user_id),
+                ttl=lambda loaded: loaded[1],
+            )
+            return credentials.resource()
+
+        expires_in = self._cache.expires_in(key)
+        if expires_in is not None and expires_in < self.refresh_ahead:
+            with self._lock:
+                start_refresh = key not in self._refreshing
+                self._refreshing.add(key)
+            if start_refresh:
+                threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+
+        return cached[0].resource()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+scoped_resource_pool = ScopedResourcePool()
+
+
+def _get_aws_resource(service_name, table_name: str, user_id: str | None = None):
+    """Get AWS resource with optional row-level access control for DynamoDB.
+    Ref: https://docs.aws.amazon.com/IAM/latest/UserGuide/reference_policies_examples_dynamodb_items.html
+    """
+    if "AWS_EXECUTION_ENV" not in os.environ:
+        if DDB_ENDPOINT_URL:
+            return boto3.resource(
+                service_name,
+                endpoint_url=DDB_ENDPOINT_URL,
+                aws_access_key_id="key",
+                aws_secret_access_key="key",
+                region_name=REGION,
+            )  # type: ignore[call-overload]
+        else:
+            return boto3.resource(service_name, region_name=REGION)  # type: ignore[call-overload]
+
+    # Assumed-role credentials are reused until shortly before they expire,
+    # so most calls skip the STS round trip.
+    return scoped_resource_pool.get(service_name, table_name, user_id)
 
 
 def get_dynamodb_client(user_id=None, table_type: type_table = "conversation"):
@@ -173,13 +359,17 @@ def get_bot_table_client():
     )
 
 
-def get_opensearch_client(collection_type: str = "bot") -> OpenSearch:
+def get_opensearch_client(collection_type: str = "bot") -> "OpenSearch":
     """Get OpenSearch client with AWS authentication.
 
     Args:
         collection_type: Type of collection to connect to ("bot" or "conversation")
         Note: This method now uses a single shared endpoint for both bot and conversation collections
     """
+    # Imported here as the clients pull in aiohttp and are only needed for search.
+    from opensearchpy import OpenSearch, RequestsHttpConnection
+    from requests_aws4auth import AWS4Auth
+
     endpoint = OPENSEARCH_DOMAIN_ENDPOINT
     if not endpoint:
         raise ValueError("OPENSEARCH_DOMAIN_ENDPOINT is not set")
@@ -1,27 +1,50 @@
+import base64
 import json
 import logging
 import os
+import time
 from decimal import Decimal as decimal
 
-import boto3
-from typing import Dict
+from typing import Callable, Dict
+from app.repositories.blob_store import blob_cache, compose_blob_prefix, store_blobs
+from app.repositories.bulk_delete import BulkDeleteProgress, BulkDeleter
 from app.repositories.common import (
-    TRANSACTION_BATCH_WRITE_SIZE,
+    TRANSACTION_BATCH_READ_SIZE,
     RecordNotFoundError,
+    compose_blob_reference_id,
+    compose_blob_reference_prefix,
     compose_conv_id,
+    compose_deletion_job_id,
+    compose_feedback_item_id,
+    compose_feedback_item_prefix,
+    compose_history_summary_id,
+    compose_history_summary_prefix,
+    compose_message_item_id,
+    compose_message_item_prefix,
+    compose_related_document_prefix,
     compose_related_document_source_id,
     decompose_conv_id,
+    decompose_feedback_item_id,
+    decompose_message_item_id,
     decompose_related_document_source_id,
     get_conversation_table_client,
 )
+from app.repositories.message_codec import (
+    MESSAGE_MAP_COMPRESSION,
+    decode_message_map,
+    encode_message_map,
+)
 from app.repositories.models.conversation import (
+    ConversationDeletionJobModel,
     ConversationMeta,
     ConversationModel,
     FeedbackModel,
+    HistorySummaryModel,
     MessageModel,
     RelatedDocumentModel,
     ToolResultModel,
 )
+from app.utils import LazyClient, get_aws_client, get_current_time
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from pydantic import TypeAdapter
@@ -32,14 +55,180 @@ logger.setLevel(logging.INFO)
 THRESHOLD_LARGE_MESSAGE = 300 * 1024  # 300KB
 LARGE_MESSAGE_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET")
 
+# Storage layouts of the message map, recorded in `MessageStorage` of the
+# conversation item. Items written before the attribute existed hold the whole
+# map inline (`MessageMap`) or in S3 (`IsLargeMessage`).
+# With "ITEMS", every message is stored as its own item next to the
+# conversation item and only changed messages are written on each turn.
+MESSAGE_STORAGE_ITEMS = "ITEMS"
+
+# Attributes read to list conversations. `Model` and `LastUpdated` are copied
+# to the conversation item so that the message map is not read.
+CONVERSATION_LIST_ATTRIBUTES = [
+    "SK",
+    "CreateTime",
+    "Title",
+    "BotId",
+    "Model",
+    "LastUpdated",
+]
+CONVERSATION_LIST_PAGE_SIZE = 50
+
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
-s3_client = boto3.client("s3", BEDROCK_REGION)
+s3_client = LazyClient(
+    lambda: get_aws_client("s3", region_name=BEDROCK_REGION)
+)
+
+
+def _compose_large_message_path(
+    user_id: str, conversation_id: str, message_id: str
+) -> str:
+    return f"{user_id}/{conversation_id}/messages/{message_id}.json"
+
+
+def _compose_message_item(
+    user_id: str,
+    conversation_id: str,
+    message_id: str,
+    message: MessageModel,
+    threshold: int,
+) -> dict:
+    item = {
+        "PK": user_id,
+        "SK": compose_message_item_id(user_id, conversation_id, message_id),
+        # Kept outside of the message body so that a branch can be resolved
+        # without reading the messages themselves.
+        "Parent": message.parent,
+    }
+    store_blobs(user_id, message.content)
+    message_dump = message.model_dump(by_alias=True)
+    blob_keys = set()
+    for content, content_dump in zip(message.content, message_dump["content"]):
+        blob_key = getattr(content, "blob_key", None)
+        if blob_key is not None:
+            # The body is resolved from the blob store when needed
+            content_dump["body"] = ""
+            blob_keys.add(blob_key)
+    if blob_keys:
+        # Read on deletion to release the references to the blobs
+        item["BlobKeys"] = blob_keys
+
+    message_map = {message_id: message_dump}
+    message_map_json = json.dumps(message_map)
+    body: str | bytes = message_map_json
+    size = len(message_map_json.encode("utf-8"))
+    if MESSAGE_MAP_COMPRESSION == "always" or (
+        MESSAGE_MAP_COMPRESSION == "large" and size > threshold
+    ):
+        encoded = encode_message_map(message_map)
+        body = encoded
+        size = len(encoded)
+
+    if size > threshold:
+        large_message_path = _compose_large_message_path(
+            user_id, conversation_id, message_id
+        )
+        s3_client.put_object(
+            Bucket=LARGE_MESSAGE_BUCKET,
+            Key=large_message_path,
+            Body=body,
+        )
+        item["IsLargeMessage"] = True
+        item["LargeMessagePath"] = large_message_path
+    elif isinstance(body, bytes):
+        item["EncodedMessageMap"] = body
+    else:
+        # Keep the `MessageMap` attribute name so that indexing pipelines treat
+        # message items the same way as conversation items.
+        item["MessageMap"] = body
+
+    return item
+
+
+def _add_blob_references(
+    table, user_id: str, conversation_id: str, blob_keys: set[str]
+) -> None:
+    """Record that the conversation refers to the blobs.
+
+    Blobs are shared across the conversations of the user, so each has a
+    reference item listing the conversations referring to it. The blob is
+    deleted with the last of them.
+    """
+    for blob_key in blob_keys:
+        table.update_item(
+            Key={"PK": user_id, "SK": compose_blob_reference_id(user_id, blob_key)},
+            UpdateExpression="ADD Conversations :conversation",
+            ExpressionAttributeValues={":conversation": {conversation_id}},
+        )
+
+
+def _release_blob(
+    deleter: BulkDeleter, user_id: str, conversation_id: str, blob_key: str
+) -> None:
+    """Remove the reference of the conversation to the blob and delete the blob
+    if no other conversation refers to it.
+    """
+    key = {"PK": user_id, "SK": compose_blob_reference_id(user_id, blob_key)}
+    try:
+        response = deleter.table.update_item(
+            Key=key,
+            UpdateExpression="DELETE Conversations :conversation",
+            # Blobs stored without a reference are left to the deletion of all
+            # conversations of the user
+            ConditionExpression="attribute_exists(Conversations)",
+            ExpressionAttributeValues={":conversation": {conversation_id}},
+            ReturnValues="UPDATED_NEW",
+        )
+        if response.get("Attributes", {}).get("Conversations"):
+            return
+
+        # Fails if another conversation referred to the blob in the meantime
+        deleter.table.delete_item(
+            Key=key, ConditionExpression="attribute_not_exists(Conversations)"
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return
+        raise e
+
+    deleter.delete_object(blob_key)
+    blob_cache.invalidate(blob_key)
+
+
+def _delete_message_item(table, user_id: str, conversation_id: str, message_id: str):
+    response = table.delete_item(
+        Key={
+            "PK": user_id,
+            "SK": compose_message_item_id(user_id, conversation_id, message_id),
+        },
+        ReturnValues="ALL_OLD",
+    )
+    old_item = response.get("Attributes") or {}
+    if old_item.get("IsLargeMessage", False):
+        s3_client.delete_object(
+            Bucket=LARGE_MESSAGE_BUCKET, Key=old_item["LargeMessagePath"]
+        )
+
+    table.delete_item(
+        Key={
+            "PK": user_id,
+            "SK": compose_feedback_item_id(user_id, conversation_id, message_id),
+        }
+    )
 
 
 def store_conversation(
     user_id: str, conversation: ConversationModel, threshold=THRESHOLD_LARGE_MESSAGE
 ):
-    logger.info(f"Storing conversation: {conversation.model_dump_json()}")
+    """Store the conversation item and the messages changed since it was loaded.
+
+    Conversations in a legacy layout are migrated on their first store.
+    """
+    changed_ids, removed_ids = conversation.changed_message_ids()
+    logger.info(
+        f"Storing conversation: {conversation.id} "
+        f"(changed messages: {changed_ids}, removed messages: {removed_ids})"
+    )
     table = get_conversation_table_client(user_id)
 
     item_params = {
@@ -52,6 +241,17 @@ def store_conversation(
         "TotalPrice": decimal(str(conversation.total_price)),
         "LastMessageId": conversation.last_message_id,
         "ShouldContinue": conversation.should_continue,
+        "MessageStorage": MESSAGE_STORAGE_ITEMS,
+        "LastUpdated": decimal(get_current_time()),
+        "IsLargeMessage": False,
+        # Keep only `system` message in conversation item, which is used for listing.
+        "MessageMap": json.dumps(
+            {
+                k: v.model_dump(by_alias=True)
+                for k, v in conversation.message_map.items()
+                if k == "system"
+            }
+        ),
     }
     #Inlcuir frontend_session_id si existe
     if conversation.userId:
@@ -63,132 +263,515 @@ def store_conversation(
     if conversation.bot_id:
         item_params["BotId"] = conversation.bot_id
 
-    message_map = {
-        k: v.model_dump(by_alias=True) for k, v in conversation.message_map.items()
-    }
-    message_map_size = len(json.dumps(message_map).encode("utf-8"))
-    logger.info(f"Message map size: {message_map_size}")
-    if message_map_size > threshold:
-        logger.info(
-            f"Message map size {message_map_size} exceeds threshold {threshold}"
-        )
-        item_params["IsLargeMessage"] = True
-        large_message_path = f"{user_id}/{conversation.id}/message_map.json"
-        item_params["LargeMessagePath"] = large_message_path
-        # Store all message in S3
-        s3_client.put_object(
-            Bucket=LARGE_MESSAGE_BUCKET,
-            Key=large_message_path,
-            Body=json.dumps(message_map),
-        )
-        # Store only `system` attribute in DynamoDB
-        item_params["MessageMap"] = json.dumps(
-            {k: v for k, v in message_map.items() if k == "system"}
+    system_message = conversation.message_map.get("system")
+    if system_message is not None:
+        # NOTE: all message has the same model
+        item_params["Model"] = system_message.model
+
+    message_items = [
+        _compose_message_item(
+            user_id=user_id,
+            conversation_id=conversation.id,
+            message_id=message_id,
+            message=conversation.message_map[message_id],
+            threshold=threshold,
         )
-    else:
-        item_params["IsLargeMessage"] = False
-        item_params["MessageMap"] = json.dumps(message_map)
+        for message_id in changed_ids
+    ]
+    # Reference the blobs before the messages referring to them are written
+    _add_blob_references(
+        table,
+        user_id,
+        conversation.id,
+        {key for item in message_items for key in item.get("BlobKeys", ())},
+    )
+
+    # Write messages before the conversation item so that `LastMessageId`
+    # never points to a missing message.
+    with table.batch_writer() as writer:
+        for message_item in message_items:
+            writer.put_item(Item=message_item)
+
+    for message_id in removed_ids:
+        _delete_message_item(table, user_id, conversation.id, message_id)
 
     response = table.put_item(
         Item=item_params,
     )
+
+    if conversation._legacy_large_message_path is not None:
+        # Whole message map of the legacy layout is no longer referenced
+        s3_client.delete_object(
+            Bucket=LARGE_MESSAGE_BUCKET, Key=conversation._legacy_large_message_path
+        )
+        conversation._legacy_large_message_path = None
+
+    conversation.mark_stored()
     return response
 
 
-def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
+def _encode_next_token(last_evaluated_key: dict) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps(last_evaluated_key).encode("utf-8")
+    ).decode("utf-8")
+
+
+def _decode_next_token(user_id: str, next_token: str) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(next_token.encode("utf-8")))
+    except ValueError:
+        raise ValueError("Invalid next_token")
+
+    if (
+        not isinstance(key, dict)
+        or key.get("PK") != user_id
+        or not str(key.get("SK", "")).startswith(f"{user_id}#CONV#")
+    ):
+        raise ValueError("Invalid next_token")
+    return key
+
+
+def _find_conversation_models(table, user_id: str, sks: list[str]) -> dict[str, str]:
+    """Read the model from the message map of conversation items written before
+    `Model` was denormalised onto the item. Returns model names by SK.
+    """
+    client = table.meta.client  # Use DynamoDB client for batch_get_item
+    models: dict[str, str] = {}
+    for i in range(0, len(sks), TRANSACTION_BATCH_READ_SIZE):
+        request_items = {
+            table.table_name: {
+                "Keys": [
+                    {"PK": user_id, "SK": sk}
+                    for sk in sks[i : i + TRANSACTION_BATCH_READ_SIZE]
+                ],
+                "ProjectionExpression": "SK, MessageMap",
+            }
+        }
+        while request_items:
+            response = client.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(table.table_name, []):
+                models[item["SK"]] = (
+                    json.loads(item.get("MessageMap", "{}"))
+                    .get("system", {})
+                    .get("model", "")
+                )
+
+            request_items = response.get("UnprocessedKeys")
+
+    return models
+
+
+def find_conversation_page_by_user_id(
+    user_id: str,
+    limit: int | None = CONVERSATION_LIST_PAGE_SIZE,
+    next_token: str | None = None,
+) -> tuple[list[ConversationMeta], str | None]:
+    """Find a page of conversations, newest first.
+
+    Only the attributes used for listing are read. Returns the conversations
+    and the opaque token of the next page, `None` on the last page.
+    """
     logger.info(f"Finding conversations for user: {user_id}")
     table = get_conversation_table_client(user_id)
 
+    attribute_names = {
+        f"#{name.lower()}": name for name in CONVERSATION_LIST_ATTRIBUTES
+    }
     query_params = {
         "KeyConditionExpression": Key("PK").eq(user_id)
         # NOTE: Need SK to fetch only conversations
         & Key("SK").begins_with(f"{user_id}#CONV#"),
         "ScanIndexForward": False,
+        "ProjectionExpression": ", ".join(attribute_names),
+        "ExpressionAttributeNames": attribute_names,
     }
+    if limit:
+        query_params["Limit"] = limit
+    if next_token:
+        query_params["ExclusiveStartKey"] = _decode_next_token(user_id, next_token)
 
     response = table.query(**query_params)
+    items = response["Items"]
+
+    # Conversations not stored since `Model` was added
+    legacy_models = _find_conversation_models(
+        table, user_id, [item["SK"] for item in items if "Model" not in item]
+    )
+
     conversations = [
         ConversationMeta(
             id=decompose_conv_id(item["SK"]),
             create_time=float(item["CreateTime"]),
             title=item["Title"],
             # NOTE: all message has the same model
-            model=json.loads(item["MessageMap"]).get("system", {}).get("model", ""),
+            model=item.get("Model", legacy_models.get(item["SK"], "")),
             bot_id=item["BotId"] if "BotId" in item else None,
+            last_updated_time=(
+                float(item["LastUpdated"]) if "LastUpdated" in item else None
+            ),
         )
-        for item in response["Items"]
+        for item in items
     ]
 
-    query_count = 1
-    MAX_QUERY_COUNT = 5
-    while "LastEvaluatedKey" in response:
-        model = (
-            json.loads(response["Items"][0]["MessageMap"])
-            .get("system", {})
-            .get("model", "")
-        )
-        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    next_token = None
+    if "LastEvaluatedKey" in response:
+        next_token = _encode_next_token(response["LastEvaluatedKey"])
+
+    return conversations, next_token
+
+
+def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
+    """Find all conversations of the user, newest first."""
+    conversations, next_token = find_conversation_page_by_user_id(user_id, limit=None)
+    while next_token:
         # NOTE: max page size is 1MB
         # See: https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Query.Pagination.html
-        response = table.query(
-            **query_params,
+        page, next_token = find_conversation_page_by_user_id(
+            user_id, limit=None, next_token=next_token
         )
-        conversations.extend(
-            [
-                ConversationMeta(
-                    id=decompose_conv_id(item["SK"]),
-                    create_time=float(item["CreateTime"]),
-                    title=item["Title"],
-                    model=model,
-                    bot_id=item["BotId"] if "BotId" in item else None,
+        conversations.extend(page)
+
+    logger.info(f"Found {len(conversations)} conversations for user: {user_id}")
+    return conversations
+
+
+def _find_message_items(table, user_id: str, conversation_id: str) -> list[dict]:
+    items: list[dict] = []
+    last_evaluated_key = None
+    while True:
+        response = table.query(
+            KeyConditionExpression=(
+                Key("PK").eq(user_id)
+                & Key("SK").begins_with(
+                    compose_message_item_prefix(user_id, conversation_id)
                 )
-                for item in response["Items"]
-            ]
+            ),
+            **(
+                {
+                    "ExclusiveStartKey": last_evaluated_key,
+                }
+                if last_evaluated_key is not None
+                else {}
+            ),
         )
-        query_count += 1
-        if query_count > MAX_QUERY_COUNT:
-            logger.warning(f"Query count exceeded {MAX_QUERY_COUNT}")
+        items.extend(response.get("Items") or [])
+
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if last_evaluated_key is None:
             break
 
-    logger.info(f"Found conversations: {conversations}")
-    return conversations
+    return items
 
 
-def find_conversation_by_id(user_id: str, conversation_id: str) -> ConversationModel:
-    logger.info(f"Finding conversation: {conversation_id}")
-    table = get_conversation_table_client(user_id)
+def _load_message_map(item: dict) -> dict:
+    if item.get("IsLargeMessage", False):
+        response = s3_client.get_object(
+            Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
+        )
+        return decode_message_map(response["Body"].read())
+
+    if "EncodedMessageMap" in item:
+        return decode_message_map(item["EncodedMessageMap"])
+
+    return json.loads(item["MessageMap"])
+
+
+def _find_feedbacks(
+    table, user_id: str, conversation_id: str
+) -> dict[str, FeedbackModel]:
+    """Find the feedback items of the conversation by message id."""
+    feedbacks: dict[str, FeedbackModel] = {}
+    query_params = {
+        "KeyConditionExpression": Key("PK").eq(user_id)
+        & Key("SK").begins_with(
+            compose_feedback_item_prefix(user_id, conversation_id)
+        ),
+    }
+
+    while True:
+        response = table.query(**query_params)
+        for feedback_item in response.get("Items", []):
+            feedbacks[decompose_feedback_item_id(feedback_item["SK"])] = (
+                FeedbackModel.model_validate(feedback_item["Feedback"])
+            )
+
+        if "LastEvaluatedKey" not in response:
+            break
+
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    return feedbacks
+
+
+def _apply_feedbacks(
+    message_map: dict[str, MessageModel], feedbacks: dict[str, FeedbackModel]
+) -> dict[str, MessageModel]:
+    """Merge the feedback items, which take precedence over the feedback stored
+    in the messages.
+    """
+    for message_id, feedback in feedbacks.items():
+        message = message_map.get(message_id)
+        if message is not None:
+            message.feedback = feedback
+
+    return message_map
+
+
+def _find_conversation_item(
+    table, user_id: str, conversation_id: str, projection: str | None = None
+) -> dict:
     response = table.query(
         IndexName="SKIndex",
         KeyConditionExpression=Key("SK").eq(compose_conv_id(user_id, conversation_id)),
+        **({"ProjectionExpression": projection} if projection else {}),
     )
     if len(response["Items"]) == 0:
         raise RecordNotFoundError(f"No conversation found with id: {conversation_id}")
 
     # NOTE: conversation is unique
-    item = response["Items"][0]
-    if item.get("IsLargeMessage", False):
-        large_message_path = item["LargeMessagePath"]
-        response = s3_client.get_object(
-            Bucket=LARGE_MESSAGE_BUCKET, Key=large_message_path
-        )
-        message_map = json.loads(response["Body"].read().decode("utf-8"))
-    else:
-        message_map = json.loads(item["MessageMap"])
+    return response["Items"][0]
+
 
+def _to_conversation_model(
+    item: dict, message_map: dict[str, MessageModel]
+) -> ConversationModel:
     conv = ConversationModel(
         id=decompose_conv_id(item["SK"]),
         create_time=float(item["CreateTime"]),
         title=item["Title"],
         total_price=item.get("TotalPrice", 0),
-        message_map={k: MessageModel.model_validate(v) for k, v in message_map.items()},
+        message_map=message_map,
         last_message_id=item["LastMessageId"],
         bot_id=item["BotId"] if "BotId" in item else None,
         should_continue=item.get("ShouldContinue", False),
+        # Read back so that storing the conversation again keeps them
+        userId=item.get("UserId"),
+        attributes=item.get("Attributes"),
+    )
+    if item.get("MessageStorage") == MESSAGE_STORAGE_ITEMS:
+        conv.mark_stored()
+
+    elif item.get("IsLargeMessage", False):
+        conv._legacy_large_message_path = item["LargeMessagePath"]
+
+    return conv
+
+
+def _load_all_messages(
+    table, user_id: str, conversation_id: str, item: dict
+) -> dict[str, MessageModel]:
+    if item.get("MessageStorage") == MESSAGE_STORAGE_ITEMS:
+        message_map: dict = {}
+        for message_item in _find_message_items(table, user_id, conversation_id):
+            message_map.update(_load_message_map(message_item))
+
+    else:
+        # Legacy layout: the whole message map is stored in the conversation item or S3
+        message_map = _load_message_map(item)
+
+    return _apply_feedbacks(
+        {k: MessageModel.model_validate(v) for k, v in message_map.items()},
+        _find_feedbacks(table, user_id, conversation_id),
+    )
+
+
+def find_conversation_by_id(user_id: str, conversation_id: str) -> ConversationModel:
+    logger.info(f"Finding conversation: {conversation_id}")
+    table = get_conversation_table_client(user_id)
+    item = _find_conversation_item(table, user_id, conversation_id)
+    conv = _to_conversation_model(
+        item, _load_all_messages(table, user_id, conversation_id, item)
+    )
+
+    logger.info(f"Found conversation: {conv.id} ({len(conv.message_map)} messages)")
+    return conv
+
+
+def _find_message_parents(
+    table, user_id: str, conversation_id: str
+) -> dict[str, str | None] | None:
+    """Return the parent of each message, or `None` if some item lacks `Parent`."""
+    parents: dict[str, str | None] = {}
+    query_params = {
+        "KeyConditionExpression": Key("PK").eq(user_id)
+        & Key("SK").begins_with(compose_message_item_prefix(user_id, conversation_id)),
+        "ProjectionExpression": "SK, #parent",
+        "ExpressionAttributeNames": {"#parent": "Parent"},
+    }
+
+    while True:
+        response = table.query(**query_params)
+        for message_item in response.get("Items", []):
+            if "Parent" not in message_item:
+                return None
+
+            parents[decompose_message_item_id(message_item["SK"])] = message_item[
+                "Parent"
+            ]
+
+        if "LastEvaluatedKey" not in response:
+            break
+
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    return parents
+
+
+def _get_messages(
+    table, user_id: str, conversation_id: str, message_ids: list[str]
+) -> dict[str, MessageModel]:
+    """Batch get message items by id."""
+    client = table.meta.client  # Use DynamoDB client for batch_get_item
+    message_map: dict = {}
+    for i in range(0, len(message_ids), TRANSACTION_BATCH_READ_SIZE):
+        request_items = {
+            table.table_name: {
+                "Keys": [
+                    {
+                        "PK": user_id,
+                        "SK": compose_message_item_id(
+                            user_id, conversation_id, message_id
+                        ),
+                    }
+                    for message_id in message_ids[i : i + TRANSACTION_BATCH_READ_SIZE]
+                ]
+            }
+        }
+        while request_items:
+            response = client.batch_get_item(RequestItems=request_items)
+            for message_item in response.get("Responses", {}).get(
+                table.table_name, []
+            ):
+                message_map.update(_load_message_map(message_item))
+
+            request_items = response.get("UnprocessedKeys")
+
+    return {k: MessageModel.model_validate(v) for k, v in message_map.items()}
+
+
+def find_conversation_branch(
+    user_id: str, conversation_id: str, message_id: str | None = None
+) -> ConversationModel:
+    """Find a conversation, loading only the messages from `message_id` to the root.
+
+    `message_id` defaults to the last message. Other messages, e.g. sibling
+    branches, are loaded on first access through `message_map`. Conversations
+    that are not stored as message items are loaded entirely.
+    """
+    logger.info(f"Finding branch of conversation: {conversation_id} ({message_id})")
+    table = get_conversation_table_client(user_id)
+    item = _find_conversation_item(table, user_id, conversation_id)
+
+    parents = (
+        _find_message_parents(table, user_id, conversation_id)
+        if item.get("MessageStorage") == MESSAGE_STORAGE_ITEMS
+        else None
     )
-    logger.info(f"Found conversation: {conv}")
+    if parents is None:
+        return _to_conversation_model(
+            item, _load_all_messages(table, user_id, conversation_id, item)
+        )
+
+    # `system` and `instruction` are the roots used when a branch starts over
+    branch: list[str] = [
+        node for node in ("system", "instruction") if node in parents
+    ]
+    node: str | None = message_id or item["LastMessageId"]
+    while node is not None and node in parents and node not in branch:
+        branch.append(node)
+        node = parents[node]
+
+    feedbacks = _find_feedbacks(table, user_id, conversation_id)
+    conv = _to_conversation_model(
+        item,
+        _apply_feedbacks(
+            _get_messages(table, user_id, conversation_id, branch), feedbacks
+        ),
+    )
+    conv.defer_messages(
+        parents,
+        lambda deferred_id: _apply_feedbacks(
+            _get_messages(table, user_id, conversation_id, [deferred_id]), feedbacks
+        ).get(deferred_id),
+    )
+
+    logger.info(f"Found conversation: {conv.id} ({len(branch)} messages loaded)")
     return conv
 
 
+def _create_bulk_deleter(
+    table, on_progress: Callable[[BulkDeleteProgress], None] | None = None
+) -> BulkDeleter:
+    return BulkDeleter(
+        table,
+        s3_client=s3_client,
+        bucket=LARGE_MESSAGE_BUCKET,
+        on_progress=on_progress,
+    )
+
+
+def _delete_items_by_prefix(
+    deleter: BulkDeleter,
+    user_id: str,
+    prefix: str,
+    deadline: float | None = None,
+    blob_keys: set[str] | None = None,
+) -> bool:
+    """Delete the items (and their S3 objects) whose SK starts with `prefix`.
+
+    Stops between pages once `time.monotonic()` passes `deadline`. Returns
+    False if items may be left. The blobs the deleted messages refer to are
+    added to `blob_keys` if given.
+    """
+    query_params = {
+        "KeyConditionExpression": Key("PK").eq(user_id) & Key("SK").begins_with(prefix),
+        "ProjectionExpression": "SK, IsLargeMessage, LargeMessagePath, BlobKeys",
+    }
+
+    while True:
+        response = deleter.table.query(**query_params)
+        for item in response.get("Items", []):
+            if blob_keys is not None:
+                blob_keys.update(item.get("BlobKeys", ()))
+            deleter.delete(
+                {"PK": user_id, "SK": item["SK"]},
+                object_key=(
+                    item["LargeMessagePath"]
+                    if item.get("IsLargeMessage", False)
+                    else None
+                ),
+            )
+
+        if "LastEvaluatedKey" not in response:
+            return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _delete_blobs(
+    deleter: BulkDeleter, user_id: str, deadline: float | None = None
+) -> bool:
+    """Delete the blobs of the user. Returns False if blobs may be left."""
+    list_params = {
+        "Bucket": LARGE_MESSAGE_BUCKET,
+        "Prefix": compose_blob_prefix(user_id),
+    }
+
+    while True:
+        response = s3_client.list_objects_v2(**list_params)
+        for obj in response.get("Contents", []):
+            deleter.delete_object(obj["Key"])
+
+        if not response.get("IsTruncated", False):
+            return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+
+        list_params["ContinuationToken"] = response["NextContinuationToken"]
+
+
 def delete_conversation_by_id(user_id: str, conversation_id: str):
     logger.info(f"Deleting conversation: {conversation_id}")
     table = get_conversation_table_client(user_id)
@@ -197,7 +780,7 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
         # Check if the conversation has a large message map
         response = table.get_item(
             Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
-            ProjectionExpression="IsLargeMessage, LargeMessagePath",
+            ProjectionExpression="IsLargeMessage, LargeMessagePath, MessageStorage",
         )
 
         item = response.get("Item")
@@ -212,10 +795,34 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
             Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
-        delete_related_documents(
-            user_id=user_id,
-            conversation_id=conversation_id,
+        table.delete_item(
+            Key={
+                "PK": user_id,
+                "SK": compose_history_summary_id(user_id, conversation_id),
+            }
         )
+        with _create_bulk_deleter(table) as deleter:
+            if item and item.get("MessageStorage") == MESSAGE_STORAGE_ITEMS:
+                blob_keys: set[str] = set()
+                _delete_items_by_prefix(
+                    deleter,
+                    user_id,
+                    compose_message_item_prefix(user_id, conversation_id),
+                    blob_keys=blob_keys,
+                )
+                for blob_key in blob_keys:
+                    _release_blob(deleter, user_id, conversation_id, blob_key)
+
+            _delete_items_by_prefix(
+                deleter,
+                user_id,
+                compose_feedback_item_prefix(user_id, conversation_id),
+            )
+            _delete_items_by_prefix(
+                deleter,
+                user_id,
+                compose_related_document_prefix(user_id, conversation_id),
+            )
 
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
@@ -228,58 +835,133 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
     return response
 
 
-def delete_conversation_by_user_id(user_id: str):
+def delete_conversation_by_user_id(
+    user_id: str,
+    deadline: float | None = None,
+    on_progress: Callable[[BulkDeleteProgress], None] | None = None,
+) -> bool:
+    """Delete all conversations of the user with their messages and related
+    documents.
+
+    With `deadline`, a `time.monotonic()` value, deletion stops between pages
+    once it has passed and False is returned. Calling again continues where it
+    stopped, since deleted items are no longer found.
+    """
     logger.info(f"Deleting ALL conversations for user: {user_id}")
     table = get_conversation_table_client(user_id)
 
-    query_params = {
-        "KeyConditionExpression": Key("PK").eq(user_id)
+    # Conversation items first, so that they disappear from the list early
+    prefixes = [
         # NOTE: Need SK to fetch only conversations
-        & Key("SK").begins_with(f"{user_id}#CONV#"),
-        "ProjectionExpression": "SK, IsLargeMessage, LargeMessagePath",
-    }
+        f"{user_id}#CONV#",
+        compose_message_item_prefix(user_id),
+        compose_feedback_item_prefix(user_id),
+        compose_history_summary_prefix(user_id),
+        compose_related_document_prefix(user_id),
+        compose_blob_reference_prefix(user_id),
+    ]
+    try:
+        with _create_bulk_deleter(table, on_progress=on_progress) as deleter:
+            for prefix in prefixes:
+                if not _delete_items_by_prefix(deleter, user_id, prefix, deadline):
+                    return False
 
-    def delete_batch(batch):
-        with table.batch_writer() as writer:
-            for item in batch:
-                writer.delete_item(Key={"PK": user_id, "SK": item["SK"]})
+            # Blobs are shared across the conversations of the user
+            if LARGE_MESSAGE_BUCKET is not None and not _delete_blobs(
+                deleter, user_id, deadline
+            ):
+                return False
 
-    def delete_large_messages(items):
-        for item in items:
-            if item.get("IsLargeMessage", False):
-                s3_client.delete_object(
-                    Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
-                )
+    except ClientError as e:
+        logger.error(f"An error occurred: {e.response['Error']['Message']}")
+        raise e
 
-    try:
-        response = table.query(
-            **query_params,
-        )
+    return True
 
-        while True:
-            items = response.get("Items", [])
-            delete_large_messages(items)
 
-            for i in range(0, len(items), TRANSACTION_BATCH_WRITE_SIZE):
-                batch = items[i : i + TRANSACTION_BATCH_WRITE_SIZE]
-                delete_batch(batch)
+def store_conversation_deletion_job(user_id: str, job: ConversationDeletionJobModel):
+    """Store the job. This also releases its lease."""
+    table = get_conversation_table_client(user_id)
+    item = {
+        "PK": user_id,
+        "SK": compose_deletion_job_id(user_id, job.id),
+        "Status": job.status,
+        "CreateTime": decimal(job.create_time),
+        "UpdateTime": decimal(job.update_time),
+        "DeletedItems": job.deleted_items,
+        "DeletedObjects": job.deleted_objects,
+        "LeaseExpiry": 0,
+    }
+    if job.error:
+        item["Error"] = job.error
 
-            # Check if next page exists
-            if "LastEvaluatedKey" not in response:
-                break
+    return table.put_item(Item=item)
+
+
+def find_conversation_deletion_job_by_id(
+    user_id: str, job_id: str
+) -> ConversationDeletionJobModel:
+    table = get_conversation_table_client(user_id)
+    response = table.get_item(
+        Key={"PK": user_id, "SK": compose_deletion_job_id(user_id, job_id)},
+        ConsistentRead=True,
+    )
+    item = response.get("Item")
+    if item is None:
+        raise RecordNotFoundError(f"Deletion job with id {job_id} not found")
+
+    return ConversationDeletionJobModel(
+        id=job_id,
+        status=item["Status"],
+        create_time=float(item["CreateTime"]),
+        update_time=float(item["UpdateTime"]),
+        deleted_items=int(item["DeletedItems"]),
+        deleted_objects=int(item["DeletedObjects"]),
+        error=item.get("Error"),
+    )
 
-            # Load next page
-            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-            response = table.query(
-                **query_params,
-            )
 
-        delete_related_documents(user_id=user_id)
+def acquire_conversation_deletion_job_lease(
+    user_id: str, job_id: str, lease_seconds: float
+) -> bool:
+    """Lease the running job so that only one request works on it at a time.
 
+    Returns False if the job is not running or already leased. The lease is
+    released by `store_conversation_deletion_job`.
+    """
+    table = get_conversation_table_client(user_id)
+    now = get_current_time()
+    try:
+        table.update_item(
+            Key={"PK": user_id, "SK": compose_deletion_job_id(user_id, job_id)},
+            UpdateExpression="SET LeaseExpiry = :expiry",
+            ConditionExpression="#status = :running AND LeaseExpiry < :now",
+            ExpressionAttributeNames={"#status": "Status"},
+            ExpressionAttributeValues={
+                ":expiry": decimal(now + int(lease_seconds * 1000)),
+                ":running": "RUNNING",
+                ":now": decimal(now),
+            },
+        )
     except ClientError as e:
-        logger.error(f"An error occurred: {e.response['Error']['Message']}")
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
         raise e
 
+    return True
+
+
+def find_conversation_title(user_id: str, conversation_id: str) -> str:
+    table = get_conversation_table_client(user_id)
+    response = table.get_item(
+        Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
+        ProjectionExpression="Title",
+    )
+    if "Item" not in response:
+        raise RecordNotFoundError(f"No conversation found with id: {conversation_id}")
+
+    return response["Item"]["Title"]
+
 
 def change_conversation_title(user_id: str, conversation_id: str, new_title: str):
     logger.info(f"Updating conversation title: {conversation_id} to {new_title}")
@@ -309,33 +991,124 @@ def change_conversation_title(user_id: str, conversation_id: str, new_title: str
     return response
 
 
+def replace_conversation_title(
+    user_id: str, conversation_id: str, old_title: str, new_title: str
+) -> bool:
+    """Change the title only if it is still `old_title`, so that a title set in
+    the meantime is kept. Returns False if the title was not changed.
+    """
+    logger.info(f"Replacing conversation title: {conversation_id} to {new_title}")
+    table = get_conversation_table_client(user_id)
+
+    try:
+        table.update_item(
+            Key={
+                "PK": user_id,
+                "SK": compose_conv_id(user_id, conversation_id),
+            },
+            UpdateExpression="set Title=:t",
+            ExpressionAttributeValues={":t": new_title, ":old": old_title},
+            ConditionExpression="Title = :old",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        else:
+            raise e
+
+    return True
+
+
+def _message_exists(
+    table, user_id: str, conversation_id: str, message_id: str, item: dict
+) -> bool:
+    if item.get("MessageStorage") != MESSAGE_STORAGE_ITEMS:
+        # Legacy layout: the whole message map is stored in the conversation item
+        # or S3, too costly to load for each feedback. Not checked, as feedback
+        # of an unknown message is never merged on read.
+        return True
+
+    response = table.get_item(
+        Key={
+            "PK": user_id,
+            "SK": compose_message_item_id(user_id, conversation_id, message_id),
+        },
+        ProjectionExpression="SK",
+    )
+    return "Item" in response
+
+
 def update_feedback(
     user_id: str, conversation_id: str, message_id: str, feedback: FeedbackModel
 ):
+    """Store the feedback as its own item, merged into the message when the
+    conversation is loaded, so that the message itself is not rewritten.
+    """
     logger.info(f"Updating feedback for conversation: {conversation_id}")
     table = get_conversation_table_client(user_id)
-    conv = find_conversation_by_id(user_id, conversation_id)
-    message_map = conv.message_map
-    message_map[message_id].feedback = feedback
+    # Only the layout is needed, not the legacy message map
+    item = _find_conversation_item(
+        table, user_id, conversation_id, projection="SK, MessageStorage"
+    )
+    if not _message_exists(table, user_id, conversation_id, message_id, item):
+        raise RecordNotFoundError(
+            f"No message found with id: {message_id} in conversation: {conversation_id}"
+        )
 
-    response = table.update_item(
-        Key={
+    response = table.put_item(
+        Item={
             "PK": user_id,
-            "SK": compose_conv_id(user_id, conversation_id),
-        },
-        UpdateExpression="set MessageMap = :m",
-        ExpressionAttributeValues={
-            ":m": json.dumps(
-                {k: v.model_dump(by_alias=True) for k, v in message_map.items()}
-            )
-        },
-        ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
-        ReturnValues="UPDATED_NEW",
+            "SK": compose_feedback_item_id(user_id, conversation_id, message_id),
+            "Feedback": feedback.model_dump(),
+        }
     )
     logger.info(f"Updated feedback response: {response}")
     return response
 
 
+def find_history_summary(
+    user_id: str, conversation_id: str
+) -> HistorySummaryModel | None:
+    table = get_conversation_table_client(user_id)
+    response = table.get_item(
+        Key={
+            "PK": user_id,
+            "SK": compose_history_summary_id(user_id, conversation_id),
+        },
+    )
+    item = response.get("Item")
+    if item is None:
+        return None
+
+    return HistorySummaryModel(
+        until_message_id=item["UntilMessageId"],
+        body=item["Body"],
+        create_time=float(item["CreateTime"]),
+    )
+
+
+def store_history_summary(
+    user_id: str, conversation_id: str, summary: HistorySummaryModel
+):
+    """Store the summary as its own item, so that it is not overwritten by
+    storing the conversation while the summary is being generated.
+    """
+    logger.info(
+        f"Storing history summary of conversation: {conversation_id} "
+        f"until message: {summary.until_message_id}"
+    )
+    table = get_conversation_table_client(user_id)
+    return table.put_item(
+        Item={
+            "PK": user_id,
+            "SK": compose_history_summary_id(user_id, conversation_id),
+            "UntilMessageId": summary.until_message_id,
+            "Body": summary.body,
+            "CreateTime": decimal(summary.create_time),
+        }
+    )
+
+
 def store_related_documents(
     user_id: str,
     conversation_id: str,
@@ -438,40 +1211,7 @@ def find_related_document_by_id(
 
 def delete_related_documents(user_id: str, conversation_id: str | None = None):
     table = get_conversation_table_client(user_id)
-    sort_keys: list[str] = []
-
-    last_evaluated_key = None
-    while True:
-        response = table.query(
-            KeyConditionExpression=(
-                Key("PK").eq(user_id)
-                & Key("SK").begins_with(
-                    f"{user_id}#RELATED_DOCUMENT#{conversation_id}#"
-                    if conversation_id
-                    else f"{user_id}#RELATED_DOCUMENT#"
-                )
-            ),
-            ProjectionExpression="SK",
-            ScanIndexForward=False,
-            **(
-                {
-                    "ExclusiveStartKey": last_evaluated_key,
-                }
-                if last_evaluated_key is not None
-                else {}
-            ),
+    with _create_bulk_deleter(table) as deleter:
+        _delete_items_by_prefix(
+            deleter, user_id, compose_related_document_prefix(user_id, conversation_id)
         )
-        sort_keys.extend(item["SK"] for item in response.get("Items") or [])
-
-        last_evaluated_key = response.get("LastEvaluatedKey")
-        if last_evaluated_key is None:
-            break
-
-    with table.batch_writer() as writer:
-        for sort_key in sort_keys:
-            writer.delete_item(
-                Key={
-                    "PK": user_id,
-                    "SK": sort_key,
-                },
-            )
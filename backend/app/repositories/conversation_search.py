@@ -1,11 +1,19 @@
+from __future__ import annotations
+
 import logging
 import os
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from app.repositories.common import get_opensearch_client
+from app.repositories.common import (
+    compose_conv_id,
+    compose_message_item_prefix,
+    get_opensearch_client,
+)
 from app.repositories.models.conversation_search import ConversationSearchModel
 from app.user import User
-from opensearchpy import OpenSearch
+
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
 
 env_prefix = os.environ.get("ENV_PREFIX", "")
 INDEX_NAME = f"{env_prefix}conversation"
@@ -29,9 +37,18 @@ def find_conversations_by_query(
 
     # Only search conversations belonging to the user
     # Combining both filtering conditions for more restrictive search
+    # Messages may be stored as separate items, which are indexed as separate documents
     filter_must = [
         {"term": {"PK.keyword": user.id}},
-        {"prefix": {"SK.keyword": f"{user.id}#CONV#"}},
+        {
+            "bool": {
+                "should": [
+                    {"prefix": {"SK.keyword": f"{user.id}#CONV#"}},
+                    {"prefix": {"SK.keyword": compose_message_item_prefix(user.id)}},
+                ],
+                "minimum_should_match": 1,
+            }
+        },
     ]
 
     search_body = {
@@ -72,7 +89,8 @@ def find_conversations_by_query(
                 "filter": {"bool": {"must": filter_must}},
             }
         },
-        "size": limit,
+        # Several message documents may belong to the same conversation
+        "size": limit * 5,
         "sort": [
             {"_score": {"order": "desc"}},  # 1. Primary sort by relevance score
             {
@@ -120,18 +138,89 @@ def find_conversations_by_query(
         response = client.search(index=INDEX_NAME, body=search_body)
         logger.debug(f"Search response: {response}")
 
-        conversations = []
+        conversations: dict[str, ConversationSearchModel] = {}
+        titled_ids: set[str] = set()
         for hit in response["hits"]["hits"]:
             try:
                 conversation_meta = ConversationSearchModel.from_opensearch_response(
                     hit
                 )
-                conversations.append(conversation_meta)
             except Exception as e:
                 logger.error(f"Error processing hit: {e}, hit: {hit}")
                 continue
-        logger.info(f"Found {len(conversations)} conversations matching query: {query}")
-        return conversations
+
+            if "Title" in hit["_source"]:
+                titled_ids.add(conversation_meta.id)
+
+            existing = conversations.get(conversation_meta.id)
+            if existing is None:
+                conversations[conversation_meta.id] = conversation_meta
+                continue
+
+            # Merge hits of the same conversation, keeping the best-scored order
+            if "Title" in hit["_source"]:
+                existing.title = conversation_meta.title
+                existing.bot_id = conversation_meta.bot_id
+            existing.last_updated_time = max(
+                existing.last_updated_time, conversation_meta.last_updated_time
+            )
+            if conversation_meta.highlights:
+                existing.highlights = [
+                    *(existing.highlights or []),
+                    *conversation_meta.highlights,
+                ]
+
+        results = list(conversations.values())[:limit]
+        _fill_titles(
+            client=client,
+            user=user,
+            conversations=[c for c in results if c.id not in titled_ids],
+        )
+
+        logger.info(f"Found {len(results)} conversations matching query: {query}")
+        return results
     except Exception as e:
         logger.error(f"Error searching conversations: {e}")
         raise
+
+
+def _fill_titles(
+    client: OpenSearch,
+    user: User,
+    conversations: list[ConversationSearchModel],
+):
+    """Fill title and bot id of conversations only matched by their messages."""
+    if not conversations:
+        return
+
+    response = client.search(
+        index=INDEX_NAME,
+        body={
+            "query": {
+                "bool": {
+                    "filter": [
+                        {"term": {"PK.keyword": user.id}},
+                        {
+                            "terms": {
+                                "SK.keyword": [
+                                    compose_conv_id(user.id, c.id)
+                                    for c in conversations
+                                ]
+                            }
+                        },
+                    ]
+                }
+            },
+            "_source": ["SK", "Title", "BotId"],
+            "size": len(conversations),
+        },
+    )
+    sources = {
+        ConversationSearchModel.from_opensearch_response(hit).id: hit["_source"]
+        for hit in response["hits"]["hits"]
+    }
+    for conversation in conversations:
+        source = sources.get(conversation.id)
+        if source is not None:
+            conversation.title = source.get("Title", conversation.title)
+            conversation.bot_id = source.get("BotId")
@@ -1,8 +1,10 @@
 import base64
 import json
 import logging
+import os
 from decimal import Decimal as decimal
 
+from app.cache import TTLCache
 from app.repositories.common import (
     TRANSACTION_BATCH_READ_SIZE,
     RecordNotFoundError,
@@ -32,6 +34,23 @@ from botocore.exceptions import ClientError
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
 
+BOT_CACHE_SIZE = int(os.environ.get("BOT_CACHE_SIZE", "256"))
+# Usage attributes (`LastUsedTime`, `UsageStats`, `IsStarred`) do not change
+# `LastModified`, so cached bots may show them this many seconds late.
+BOT_CACHE_TTL = int(os.environ.get("BOT_CACHE_TTL", "300"))
+
+# Parsed bots keyed by bot id and the `LastModified` stamp of the item they
+# were parsed from. Every write to the configuration, visibility or sync status
+# of a bot sets a new stamp, including writes from other processes such as the
+# embedding state machine, so a stale entry is never hit.
+bot_cache: TTLCache[tuple[str, int | None], BotModel] = TTLCache(
+    max_size=BOT_CACHE_SIZE, ttl=BOT_CACHE_TTL
+)
+
+
+def invalidate_bot_cache(bot_id: str) -> None:
+    bot_cache.invalidate_where(lambda key: key[0] == bot_id)
+
 
 class BotNotFoundException(Exception):
     """Exception raised when a bot is not found."""
@@ -77,6 +96,7 @@ def store_bot(custom_bot: BotModel):
         ],
         "ActiveModels": custom_bot.active_models.model_dump(),  # type: ignore[attr-defined]
         "UsageStats": custom_bot.usage_stats.model_dump(),
+        "LastModified": get_current_time(),
     }
 
     if custom_bot.last_used_time:
@@ -134,7 +154,8 @@ def update_bot(
         "GenerationParams = :generation_params, "
         "DisplayRetrievedChunks = :display_retrieved_chunks, "
         "ConversationQuickStarters = :conversation_quick_starters, "
-        "ActiveModels = :active_models"
+        "ActiveModels = :active_models, "
+        "LastModified = :last_modified"
     )
 
     expression_attribute_values = {
@@ -152,6 +173,7 @@ def update_bot(
             starter.model_dump() for starter in conversation_quick_starters
         ],
         ":active_models": active_models.model_dump(),  # type: ignore[attr-defined]
+        ":last_modified": get_current_time(),
     }
     if bedrock_knowledge_base:
         if bedrock_knowledge_base.exist_knowledge_base_id is not None or (
@@ -197,6 +219,8 @@ def update_bot(
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
+    finally:
+        invalidate_bot_cache(bot_id)
 
     return response
 
@@ -360,10 +384,11 @@ def update_knowledge_base_id(
     try:
         response = table.update_item(
             Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET BedrockKnowledgeBase.knowledge_base_id = :kb_id, BedrockKnowledgeBase.data_source_ids = :ds_ids",
+            UpdateExpression="SET BedrockKnowledgeBase.knowledge_base_id = :kb_id, BedrockKnowledgeBase.data_source_ids = :ds_ids, LastModified = :last_modified",
             ExpressionAttributeValues={
                 ":kb_id": knowledge_base_id,
                 ":ds_ids": data_source_ids,
+                ":last_modified": get_current_time(),
             },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
@@ -387,10 +412,11 @@ def update_guardrails_params(
     try:
         response = table.update_item(
             Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET GuardrailsParams.guardrail_arn = :guardrail_arn, GuardrailsParams.guardrail_version = :guardrail_version",
+            UpdateExpression="SET GuardrailsParams.guardrail_arn = :guardrail_arn, GuardrailsParams.guardrail_version = :guardrail_version, LastModified = :last_modified",
             ExpressionAttributeValues={
                 ":guardrail_arn": guardrail_arn,
                 ":guardrail_version": guardrail_version,
+                ":last_modified": get_current_time(),
             },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
@@ -417,11 +443,12 @@ def update_bot_shared_status(
     table = get_bot_table_client()
     logger.info(f"Updating shared status for bot: {bot_id}")
 
-    update_expression = "SET SharedStatus = :shared_status, AllowedCognitoUsers = :allowed_user_ids, AllowedCognitoGroups = :allowed_group_ids"
+    update_expression = "SET SharedStatus = :shared_status, AllowedCognitoUsers = :allowed_user_ids, AllowedCognitoGroups = :allowed_group_ids, LastModified = :last_modified"
     expression_attribute_values = {
         ":shared_status": shared_status,
         ":allowed_user_ids": allowed_user_ids,
         ":allowed_group_ids": allowed_group_ids,
+        ":last_modified": get_current_time(),
     }
 
     if shared_scope != "private":
@@ -444,6 +471,8 @@ def update_bot_shared_status(
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
+    finally:
+        invalidate_bot_cache(bot_id)
     return response
 
 
@@ -702,6 +731,34 @@ def find_bot_by_id(bot_id: str) -> BotModel:
     return bot
 
 
+def find_bot_last_modified(bot_id: str) -> int | None:
+    """Return the `LastModified` stamp of the bot.
+    Bots not modified since the attribute was introduced have no stamp.
+    """
+    table = get_bot_table_client()
+    response = table.query(
+        IndexName="BotIdIndex",
+        KeyConditionExpression=Key("BotId").eq(bot_id),
+        ProjectionExpression="LastModified",
+    )
+
+    if len(response["Items"]) == 0:
+        raise RecordNotFoundError(f"Bot with id {bot_id} not found")
+
+    last_modified = response["Items"][0].get("LastModified")
+    return int(last_modified) if last_modified is not None else None
+
+
+def find_bot_by_id_with_cache(bot_id: str) -> BotModel:
+    """Same as `find_bot_by_id`, but reuses the parsed bot while its
+    `LastModified` stamp is unchanged. Concurrent misses share one load.
+    """
+    last_modified = find_bot_last_modified(bot_id)
+    bot = bot_cache.get_or_load((bot_id, last_modified), lambda: find_bot_by_id(bot_id))
+    # Callers own the returned model.
+    return bot.model_copy(deep=True)
+
+
 def find_queued_bots() -> list[BotModel]:
     """Find all 'QUEUED' bots."""
     bot_table = get_bot_table_client()
@@ -770,7 +827,7 @@ def update_bot_publication(
     try:
         response = table.update_item(
             Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET ApiPublishmentStackName = :val, ApiPublishedDatetime = :time, ApiPublishCodeBuildId = :build_id",
+            UpdateExpression="SET ApiPublishmentStackName = :val, ApiPublishedDatetime = :time, ApiPublishCodeBuildId = :build_id, LastModified = :time",
             # NOTE: Stack naming rule: ApiPublishmentStack{published_api_id}.
             # See bedrock-chat-stack.ts > `ApiPublishmentStack`
             ExpressionAttributeValues={
@@ -795,7 +852,8 @@ def delete_bot_publication(owner_user_id: str, bot_id: str):
     try:
         response = table.update_item(
             Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="REMOVE ApiPublishmentStackName, ApiPublishedDatetime, ApiPublishCodeBuildId",
+            UpdateExpression="SET LastModified = :last_modified REMOVE ApiPublishmentStackName, ApiPublishedDatetime, ApiPublishCodeBuildId",
+            ExpressionAttributeValues={":last_modified": get_current_time()},
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
     except ClientError as e:
@@ -821,6 +879,8 @@ def delete_bot_by_id(owner_user_id: str, bot_id: str):
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
+    finally:
+        invalidate_bot_cache(bot_id)
 
     return response
 
@@ -1,5 +1,8 @@
 import logging
+import os
+from threading import Thread
 
+from app.cache import TTLCache
 from app.utils import get_bedrock_agent_client
 from app.repositories.models.custom_bot_kb import (
     BedrockAgentGetKnowledgeBaseResponse,
@@ -10,26 +13,69 @@ from app.repositories.models.custom_bot_kb import (
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+KNOWLEDGE_BASE_INFO_CACHE_SIZE = int(
+    os.environ.get("KNOWLEDGE_BASE_INFO_CACHE_SIZE", "256")
+)
+KNOWLEDGE_BASE_INFO_CACHE_TTL = int(
+    os.environ.get("KNOWLEDGE_BASE_INFO_CACHE_TTL", str(10 * 60))
+)
 
-def get_knowledge_base_info(
+# Knowledge base configurations keyed by (knowledge_base_id, version).
+# Callers pass the last synchronization of the bot as the version, so that a
+# finished sync (which may run in another process) is never served stale.
+knowledge_base_info_cache: TTLCache[
+    tuple[str, str], BedrockAgentGetKnowledgeBaseResponse
+] = TTLCache(
+    max_size=KNOWLEDGE_BASE_INFO_CACHE_SIZE,
+    ttl=KNOWLEDGE_BASE_INFO_CACHE_TTL,
+)
+
+
+def _fetch_knowledge_base_info(
     knowledge_base_id: str | None,
 ) -> BedrockAgentGetKnowledgeBaseResponse:
     client = get_bedrock_agent_client()
-    try:
-        response = client.get_knowledge_base(knowledgeBaseId=knowledge_base_id)
-        return BedrockAgentGetKnowledgeBaseResponse(
-            knowledge_base=KnowledgeBase(
-                knowledge_base_configuration=KnowledgeBaseConfiguration(
-                    type=response.get("knowledgeBase", {})
-                    .get("knowledgeBaseConfiguration", {})
-                    .get("type", "VECTOR")
-                )
+    response = client.get_knowledge_base(knowledgeBaseId=knowledge_base_id)  # type: ignore[arg-type]
+    return BedrockAgentGetKnowledgeBaseResponse(
+        knowledge_base=KnowledgeBase(
+            knowledge_base_configuration=KnowledgeBaseConfiguration(
+                type=response.get("knowledgeBase", {})
+                .get("knowledgeBaseConfiguration", {})
+                .get("type", "VECTOR")
             )
         )
+    )
+
+
+def get_knowledge_base_info(
+    knowledge_base_id: str | None,
+    version: str = "",
+) -> BedrockAgentGetKnowledgeBaseResponse:
+    try:
+        if knowledge_base_id is None:
+            return _fetch_knowledge_base_info(knowledge_base_id)
+
+        return knowledge_base_info_cache.get_or_load(
+            (knowledge_base_id, version),
+            lambda: _fetch_knowledge_base_info(knowledge_base_id),
+        )
     except Exception as e:
+        # Not cached, so that the next call retries
         logger.error(f"Failed to get knowledge base info: {e}")
         return BedrockAgentGetKnowledgeBaseResponse(
             knowledge_base=KnowledgeBase(
                 knowledge_base_configuration=KnowledgeBaseConfiguration(type="VECTOR")
             )
         )
+
+
+def prefetch_knowledge_base_info(knowledge_base_id: str, version: str = "") -> None:
+    """Load the knowledge base info in the background unless already cached."""
+    if (knowledge_base_id, version) in knowledge_base_info_cache:
+        return
+
+    Thread(
+        target=get_knowledge_base_info,
+        args=(knowledge_base_id, version),
+        daemon=True,
+    ).start()
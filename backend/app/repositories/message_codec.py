@@ -0,0 +1,55 @@
+"""Versioned binary encoding of message maps.
+
+An encoded message map starts with a version byte followed by the payload.
+Message maps written before as plain JSON start with `{`, so both formats can
+be told apart and read by `decode_message_map`.
+"""
+
+import json
+import os
+import zlib
+from typing import Any, Literal
+
+# Version bytes of the encodings. Never reuse a value once it has been written.
+ENCODING_ZLIB_JSON = 1
+
+# When to store message maps encoded:
+# - "large": only those above the large message threshold, which would otherwise
+#   be written to S3. Smaller ones stay plain JSON in `MessageMap`, which the
+#   conversation search and usage analysis pipelines read.
+# - "always": every message map. Messages are then only searchable by title.
+# - "off": never.
+type_message_map_compression = Literal["large", "always", "off"]
+MESSAGE_MAP_COMPRESSION: type_message_map_compression = os.environ.get(  # type: ignore
+    "MESSAGE_MAP_COMPRESSION", "large"
+)
+MESSAGE_MAP_COMPRESSION_LEVEL = int(
+    os.environ.get("MESSAGE_MAP_COMPRESSION_LEVEL", "6")
+)
+
+
+def encode_message_map(
+    message_map: dict, level: int = MESSAGE_MAP_COMPRESSION_LEVEL
+) -> bytes:
+    payload = json.dumps(message_map, separators=(",", ":")).encode("utf-8")
+    return bytes([ENCODING_ZLIB_JSON]) + zlib.compress(payload, level)
+
+
+def decode_message_map(value: Any) -> dict:
+    """Decode a message map stored in any format.
+
+    Accepts plain JSON as `str` or `bytes` and encoded `bytes`, including the
+    `Binary` wrapper boto3 returns for DynamoDB binary attributes.
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+
+    data = bytes(getattr(value, "value", value))
+    if data[:1] == b"{":
+        return json.loads(data)
+
+    version = data[0] if data else None
+    if version == ENCODING_ZLIB_JSON:
+        return json.loads(zlib.decompress(data[1:]))
+
+    raise ValueError(f"Unknown message map encoding: {version}")
@@ -4,7 +4,16 @@ import json
 import logging
 import re
 from pathlib import Path
-from typing import TYPE_CHECKING, Annotated, Any, Literal, Self, TypeGuard
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Callable,
+    Iterable,
+    Literal,
+    Self,
+    TypeGuard,
+)
 from urllib.parse import urlparse, unquote
 
 from app.repositories.models.common import Base64EncodedBytes
@@ -42,6 +51,7 @@ from pydantic import (
     Discriminator,
     Field,
     JsonValue,
+    PrivateAttr,
     field_validator,
     model_validator,
 )
@@ -92,6 +102,8 @@ class ImageContentModel(BaseModel):
         ...,
         description="Image bytes.",
     )
+    # Key of the body in the blob store. The body is empty until resolved.
+    blob_key: str | None = None
 
     @classmethod
     def from_image_content(cls, content: ImageContent) -> Self:
@@ -165,6 +177,8 @@ class AttachmentContentModel(BaseModel):
         description="Attachment file bytes.",
     )
     file_name: str
+    # Key of the body in the blob store. The body is empty until resolved.
+    blob_key: str | None = None
 
     @classmethod
     def from_attachment_content(cls, content: AttachmentContent) -> Self:
@@ -228,6 +242,39 @@ class FeedbackModel(BaseModel):
     comment: str
 
 
+class TokenUsageModel(BaseModel):
+    """Tokens and price of the request that generated a message.
+
+    Input tokens exclude the tokens read from and written to the prompt cache.
+    """
+
+    input_tokens: int
+    output_tokens: int
+    cache_read_input_tokens: int
+    cache_write_input_tokens: int
+    price: float
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of the input tokens read from the prompt cache."""
+        total = (
+            self.input_tokens
+            + self.cache_read_input_tokens
+            + self.cache_write_input_tokens
+        )
+        return self.cache_read_input_tokens / total if total > 0 else 0.0
+
+
+class HistorySummaryModel(BaseModel):
+    """Summary of the messages of a conversation dropped from the context
+    window, i.e. those before `until_message_id` on its branch.
+    """
+
+    until_message_id: str
+    body: str
+    create_time: float
+
+
 class ChunkModel(BaseModel):
     content: str
     content_type: str = Field(default="s3")
@@ -678,12 +725,22 @@ class SimpleMessageModel(BaseModel):
     role: str
     content: list[ContentModel]
 
+    # User and conversation ids, and key of the message in `app.message_cache`.
+    # Not persisted.
+    _cache_key: tuple[tuple[str, str], str] | None = PrivateAttr(default=None)
+
     @classmethod
-    def from_message_model(cls, message: MessageModel):
-        return SimpleMessageModel(
+    def from_message_model(
+        cls,
+        message: MessageModel,
+        cache_key: tuple[tuple[str, str], str] | None = None,
+    ):
+        simple_message = SimpleMessageModel(
             role=message.role,
             content=message.content,
         )
+        simple_message._cache_key = cache_key
+        return simple_message
 
     def to_schema(self) -> SimpleMessage:
         return SimpleMessage(
@@ -717,6 +774,9 @@ class MessageModel(BaseModel):
     thinking_log: list[SimpleMessageModel] | None = Field(
         default=None, description="Only available for agent."
     )
+    usage: TokenUsageModel | None = Field(
+        default=None, description="Only available for assistant messages."
+    )
 
     @field_validator("thinking_log", mode="before")
     @classmethod
@@ -792,6 +852,44 @@ class MessageModel(BaseModel):
             ]
 
 
+class LazyMessageMap(dict[str, MessageModel]):
+    """Message map holding part of a conversation, loading other messages on access.
+
+    Iteration and `len` only cover the messages loaded so far.
+    """
+
+    def __init__(
+        self,
+        loaded: dict[str, MessageModel],
+        unloaded_ids: Iterable[str],
+        loader: Callable[[str], MessageModel | None],
+    ) -> None:
+        super().__init__(loaded)
+        self._unloaded_ids = set(unloaded_ids) - set(loaded)
+        self._loader = loader
+
+    def __missing__(self, key: str) -> MessageModel:
+        if key not in self._unloaded_ids:
+            raise KeyError(key)
+
+        self._unloaded_ids.discard(key)
+        message = self._loader(key)
+        if message is None:
+            raise KeyError(key)
+
+        self[key] = message
+        return message
+
+    def __contains__(self, key: object) -> bool:
+        return super().__contains__(key) or key in self._unloaded_ids
+
+    def get(self, key: str, default: Any = None) -> Any:  # type: ignore[override]
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
 class ConversationModel(BaseModel):
     id: str
     create_time: float
@@ -804,12 +902,78 @@ class ConversationModel(BaseModel):
     userId: str | None = None
     attributes: dict | None = None
 
+    # Messages as last loaded from / written to the repository, used to write
+    # only the messages that changed. `None` means nothing is persisted yet.
+    _stored_messages: (
+        dict[str, tuple[MessageModel, tuple[str, ...], FeedbackModel | None]] | None
+    ) = PrivateAttr(default=None)
+    # S3 path of a legacy whole-map object to remove once migrated.
+    _legacy_large_message_path: str | None = PrivateAttr(default=None)
+
+    def mark_stored(self) -> None:
+        self._stored_messages = {
+            message_id: (message, tuple(message.children), message.feedback)
+            for message_id, message in self.message_map.items()
+        }
+
+    def defer_messages(
+        self,
+        message_ids: Iterable[str],
+        loader: Callable[[str], MessageModel | None],
+    ) -> None:
+        """Load `message_ids` on first access to `message_map` instead of up front."""
+
+        def load(message_id: str) -> MessageModel | None:
+            message = loader(message_id)
+            if message is not None and self._stored_messages is not None:
+                # Loaded as persisted, so it is not written back unless changed
+                self._stored_messages[message_id] = (
+                    message,
+                    tuple(message.children),
+                    message.feedback,
+                )
+            return message
+
+        self.message_map = LazyMessageMap(self.message_map, message_ids, load)
+
+    def changed_message_ids(self) -> tuple[list[str], list[str]]:
+        """Return (changed or added, removed) message ids since `mark_stored`."""
+        if self._stored_messages is None:
+            return list(self.message_map), []
+
+        changed = [
+            message_id
+            for message_id, message in self.message_map.items()
+            if (stored := self._stored_messages.get(message_id)) is None
+            or stored[0] is not message
+            or stored[1] != tuple(message.children)
+            or stored[2] is not message.feedback
+        ]
+        removed = [
+            message_id
+            for message_id in self._stored_messages
+            if message_id not in self.message_map
+        ]
+        return changed, removed
+
+
 class ConversationMeta(BaseModel):
     id: str
     title: str
     create_time: float
     model: str
     bot_id: str | None
+    last_updated_time: float | None = None
+
+
+class ConversationDeletionJobModel(BaseModel):
+    id: str
+    status: Literal["RUNNING", "SUCCEEDED", "FAILED"]
+    create_time: float
+    update_time: float
+    deleted_items: int = 0
+    deleted_objects: int = 0
+    error: str | None = None
 
 
 class RelatedDocumentModel(BaseModel):
@@ -34,7 +34,11 @@ class ConversationSearchModel(BaseModel):
 
         # Extract conversation ID from SK (e.g. "{user_id}#CONV#{conversation_id}" -> "{conversation_id}")
         sk = source.get("SK", "")
-        conversation_id = decompose_conv_id(sk)
+        if "#MESSAGE#" in sk:
+            # Message item: "{user_id}#MESSAGE#{conversation_id}#{message_id}"
+            conversation_id = sk.split("#")[-2]
+        else:
+            conversation_id = decompose_conv_id(sk)
 
         # Get last updated time from source with fallback logic
         last_updated_time = 0.0
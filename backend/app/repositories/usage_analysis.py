@@ -7,10 +7,10 @@ from datetime import date, timedelta
 from functools import partial
 from typing import Any
 
-import boto3
 from app.repositories.common import get_bot_table_client
 from app.repositories.models.custom_bot import BotMetaWithStackInfo
 from app.repositories.models.usage_analysis import UsagePerBot, UsagePerUser
+from app.utils import LazyClient, get_aws_client
 from boto3.dynamodb.conditions import Attr, Key
 
 REGION = os.environ.get("REGION", "us-east-1")
@@ -29,12 +29,12 @@ QUERY_LIMIT = 1000
 
 
 logger = logging.getLogger(__name__)
-athena = boto3.client("athena")
+athena = LazyClient(lambda: get_aws_client("athena"))
 
 
 def _find_cognito_user_by_id(user_id: str) -> dict | None:
     """Find user by id from cognito."""
-    cognito = boto3.client("cognito-idp")
+    cognito = get_aws_client("cognito-idp")
     try:
         response = cognito.admin_get_user(UserPoolId=USER_POOL_ID, Username=user_id)
     except cognito.exceptions.UserNotFoundException:
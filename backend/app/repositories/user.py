@@ -1,8 +1,8 @@
 import logging
 import os
 
-import boto3
 from app.user import UserGroup, UserWithoutGroups
+from app.utils import LazyClient, get_aws_client
 from botocore.exceptions import ClientError
 from reretry import retry
 
@@ -11,7 +11,7 @@ logger.setLevel(logging.DEBUG)
 
 USER_POOL_ID = os.environ.get("USER_POOL_ID")
 
-client = boto3.client("cognito-idp")
+client = LazyClient(lambda: get_aws_client("cognito-idp"))
 
 
 class TooManyRequestsError(Exception):
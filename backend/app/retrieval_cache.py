@@ -0,0 +1,163 @@
+"""Cache of knowledge base retrieval results.
+
+Users of a shared bot often ask the same question, each of which would
+otherwise be a `Retrieve` request to the knowledge base. Results are cached
+per knowledge base, synchronization and search parameters, for a normalized
+form of the query.
+
+The default backend keeps results in process memory. A backend shared
+between processes can be installed with `set_retrieval_cache_backend`, or by
+setting RETRIEVAL_CACHE_BACKEND to the `module:factory` path of a function
+returning one.
+"""
+
+import copy
+import importlib
+import logging
+import os
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Callable, NamedTuple, Protocol
+
+from app.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL = int(os.environ.get("RETRIEVAL_CACHE_TTL", str(15 * 60)))
+RETRIEVAL_CACHE_BACKEND = os.environ.get("RETRIEVAL_CACHE_BACKEND")
+
+
+class RetrievalCacheKey(NamedTuple):
+    knowledge_base_id: str
+    # Last synchronization of the knowledge base known to the caller, so that
+    # results from before a sync are not served after it.
+    version: str
+    bot_filter: str | None
+    search_type: str
+    max_results: int
+    query: str
+
+
+# Results as cached: the retrieved documents and how long retrieving them took.
+CachedRetrieval = tuple[list[Any], float]
+
+
+class RetrievalCacheBackend(Protocol):
+    def get(self, key: RetrievalCacheKey) -> CachedRetrieval | None: ...
+
+    def put(self, key: RetrievalCacheKey, value: CachedRetrieval) -> None: ...
+
+    def invalidate_knowledge_base(self, knowledge_base_id: str) -> None: ...
+
+
+class InMemoryRetrievalCacheBackend:
+    def __init__(
+        self, max_size: int = RETRIEVAL_CACHE_SIZE, ttl: float = RETRIEVAL_CACHE_TTL
+    ) -> None:
+        self._cache: TTLCache[RetrievalCacheKey, CachedRetrieval] = TTLCache(
+            max_size=max_size, ttl=ttl
+        )
+
+    def get(self, key: RetrievalCacheKey) -> CachedRetrieval | None:
+        return self._cache.get(key)
+
+    def put(self, key: RetrievalCacheKey, value: CachedRetrieval) -> None:
+        self._cache.put(key, value)
+
+    def invalidate_knowledge_base(self, knowledge_base_id: str) -> None:
+        self._cache.invalidate_where(
+            lambda key: key.knowledge_base_id == knowledge_base_id
+        )
+
+
+@dataclass
+class RetrievalCacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Total retrieval time avoided by hits, in seconds
+    saved_latency: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.。？！]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so that trivially different questions share results.
+
+    Unicode forms, case, runs of whitespace and trailing punctuation are
+    ignored.
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = _WHITESPACE.sub(" ", query).strip()
+    return _TRAILING_PUNCTUATION.sub("", query)
+
+
+class RetrievalCache:
+    def __init__(self, backend: RetrievalCacheBackend) -> None:
+        self.backend = backend
+        self.stats = RetrievalCacheStats()
+
+    def get_or_retrieve(
+        self, key: RetrievalCacheKey, retrieve: Callable[[], list[Any]]
+    ) -> list[Any]:
+        """Return cached results for `key`, calling `retrieve` on a miss."""
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            # A shared backend being unavailable must not break retrieval
+            logger.warning(f"Failed to read retrieval cache: {e}")
+            cached = None
+
+        if cached is not None:
+            results, latency = cached
+            self.stats.hits += 1
+            self.stats.saved_latency += latency
+            logger.info(
+                f"Retrieval cache hit for knowledge base {key.knowledge_base_id}: "
+                f"hit rate {self.stats.hit_rate:.1%}, "
+                f"saved {self.stats.saved_latency * 1000:.0f}ms in total"
+            )
+            # Callers own the returned results
+            return copy.deepcopy(results)
+
+        started = time.monotonic()
+        results = retrieve()
+        self.stats.misses += 1
+        try:
+            self.backend.put(key, (copy.deepcopy(results), time.monotonic() - started))
+        except Exception as e:
+            logger.warning(f"Failed to write retrieval cache: {e}")
+
+        return results
+
+
+def _create_backend() -> RetrievalCacheBackend:
+    if RETRIEVAL_CACHE_BACKEND:
+        module_name, _, factory_name = RETRIEVAL_CACHE_BACKEND.partition(":")
+        factory = getattr(importlib.import_module(module_name), factory_name)
+        return factory()
+
+    return InMemoryRetrievalCacheBackend()
+
+
+retrieval_cache = RetrievalCache(_create_backend())
+
+
+def set_retrieval_cache_backend(backend: RetrievalCacheBackend):
+    """Install a backend, e.g. one shared by all processes."""
+    retrieval_cache.backend = backend
+
+
+def invalidate_retrieval_cache(knowledge_base_id: str):
+    """Drop cached results of the knowledge base, e.g. after an ingestion job."""
+    retrieval_cache.backend.invalidate_knowledge_base(knowledge_base_id)
@@ -1,8 +1,10 @@
 from app.repositories.conversation import (
+    CONVERSATION_LIST_PAGE_SIZE,
     change_conversation_title,
     delete_conversation_by_id,
     delete_conversation_by_user_id,
     find_conversation_by_user_id,
+    find_conversation_page_by_user_id,
     find_related_document_by_id,
     find_related_documents_by_conversation_id,
     update_feedback,
@@ -12,6 +14,7 @@ from app.routes.schemas.conversation import (
     ChatInput,
     ChatOutput,
     Conversation,
+    ConversationDeletionJobOutput,
     ConversationMetaOutput,
     ConversationSearchResult,
     FeedbackInput,
@@ -27,11 +30,17 @@ from app.usecases.chat import (
     propose_conversation_title,
     search_conversations as search_conversations_usecase,
 )
+from app.usecases.conversation_deletion import (
+    continue_conversation_deletion,
+    start_conversation_deletion,
+)
 from app.user import User
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 
 router = APIRouter(tags=["conversation"])
 
+NEXT_TOKEN_HEADER = "X-Next-Token"
+
 
 @router.get("/health")
 def health():
@@ -44,7 +53,9 @@ def post_message(request: Request, chat_input: ChatInput):
     """Send chat message"""
     current_user: User = request.state.current_user
 
-    conversation, message = chat(user=current_user, chat_input=chat_input)
+    conversation, message = chat(
+        user=current_user, chat_input=chat_input, generate_conversation_title=True
+    )
     output = chat_output_from_message(conversation=conversation, message=message)
     return output
 
@@ -104,11 +115,33 @@ def remove_conversation(request: Request, conversation_id: str):
 @router.get("/conversations", response_model=list[ConversationMetaOutput])
 def get_all_conversations(
     request: Request,
+    response: Response,
+    limit: int | None = None,
+    next_token: str | None = None,
 ):
-    """Get all conversation metadata"""
+    """Get all conversation metadata, newest first.
+    NOTE:
+    - If `limit` or `next_token` is specified, only one page is returned and the
+      token of the next page is set to the `X-Next-Token` response header.
+      The header is absent on the last page.
+    - limit: must be between 1 and 1000.
+    """
     current_user: User = request.state.current_user
 
-    conversations = find_conversation_by_user_id(current_user.id)
+    if limit is None and next_token is None:
+        conversations = find_conversation_by_user_id(current_user.id)
+    else:
+        if limit is not None and not 1 <= limit <= 1000:
+            raise ValueError("limit must be between 1 and 1000")
+
+        conversations, next_token = find_conversation_page_by_user_id(
+            current_user.id,
+            limit=limit or CONVERSATION_LIST_PAGE_SIZE,
+            next_token=next_token,
+        )
+        if next_token:
+            response.headers[NEXT_TOKEN_HEADER] = next_token
+
     output = [
         ConversationMetaOutput(
             id=conversation.id,
@@ -116,6 +149,7 @@ def get_all_conversations(
             create_time=conversation.create_time,
             model=conversation.model,
             bot_id=conversation.bot_id,
+            last_updated_time=conversation.last_updated_time,
         )
         for conversation in conversations
     ]
@@ -128,6 +162,29 @@ def remove_all_conversations(request: Request):
     delete_conversation_by_user_id(request.state.current_user.id)
 
 
+@router.post(
+    "/conversations/deletion-jobs", response_model=ConversationDeletionJobOutput
+)
+def post_conversation_deletion_job(request: Request):
+    """Start deleting all conversations as a job.
+    NOTE:
+    - Each request works on the job for a limited time. Poll the job with
+      `GET /conversations/deletion-jobs/{job_id}` until the status is not `RUNNING`.
+    """
+    job = start_conversation_deletion(request.state.current_user)
+    return ConversationDeletionJobOutput(**job.model_dump())
+
+
+@router.get(
+    "/conversations/deletion-jobs/{job_id}",
+    response_model=ConversationDeletionJobOutput,
+)
+def get_conversation_deletion_job(request: Request, job_id: str):
+    """Get the progress of a deletion job, continuing it if it is running."""
+    job = continue_conversation_deletion(request.state.current_user, job_id)
+    return ConversationDeletionJobOutput(**job.model_dump())
+
+
 @router.get("/conversations/search", response_model=list[ConversationSearchResult])
 def search_conversations(request: Request, query: str):
     """Search conversations by keyword"""
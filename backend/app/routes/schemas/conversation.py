@@ -233,6 +233,7 @@ class ConversationMetaOutput(BaseSchema):
     create_time: float
     model: str
     bot_id: str | None
+    last_updated_time: float | None = None
 
 
 class ConversationSearchResult(BaseSchema):
@@ -259,3 +260,13 @@ class NewTitleInput(BaseSchema):
 
 class ProposedTitle(BaseSchema):
     title: str
+
+
+class ConversationDeletionJobOutput(BaseSchema):
+    id: str
+    status: Literal["RUNNING", "SUCCEEDED", "FAILED"]
+    create_time: float
+    update_time: float
+    deleted_items: int
+    deleted_objects: int
+    error: str | None
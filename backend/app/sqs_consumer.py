@@ -1,5 +1,6 @@
 import json
 
+from app.background import drain_background_tasks
 from app.routes.schemas.conversation import ChatInput
 from app.usecases.chat import chat, chat_output_from_message
 from app.user import User
@@ -24,4 +25,5 @@ def handler(event, context):
         )
         print(chat_result)
 
+    drain_background_tasks()
     return {"statusCode": 200, "body": json.dumps("Processing completed")}
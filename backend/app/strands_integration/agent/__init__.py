@@ -2,10 +2,11 @@
 Agent module for Strands integration.
 """
 
-from .config import get_bedrock_model_config
+from .config import get_bedrock_model_config, get_prompt_cache_prefix
 from .factory import create_strands_agent
 
 __all__ = [
     "get_bedrock_model_config",
+    "get_prompt_cache_prefix",
     "create_strands_agent",
 ]
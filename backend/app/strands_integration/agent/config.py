@@ -5,19 +5,38 @@ Agent configuration utilities for Strands integration.
 import logging
 
 from app.bedrock import (
+    PromptCachePrefix,
     get_model_id,
     generation_params_to_converse_configuration,
-    is_prompt_caching_supported,
+    plan_prefix_cache_points,
 )
 from app.repositories.models.conversation import type_model_name
 from app.repositories.models.custom_bot import GenerationParamsModel
 from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
 
 from strands.models import BedrockModel
+from strands.types.tools import ToolSpec
 
 logger = logging.getLogger(__name__)
 
 
+def get_prompt_cache_prefix(
+    model_name: type_model_name,
+    instructions: list[str],
+    tool_specs: list[ToolSpec],
+    has_tools: bool = False,
+) -> PromptCachePrefix:
+    """Plan the cache points on the system prompt and the tools as the agent
+    sends them."""
+    system_prompt = "\n\n".join(instructions).strip()
+    return plan_prefix_cache_points(
+        model_name,
+        system=[{"text": system_prompt}] if system_prompt else [],
+        tools=[{"toolSpec": tool_spec} for tool_spec in tool_specs],
+        has_tools=has_tools,
+    )
+
+
 def get_bedrock_model_config(
     model_name: type_model_name = "claude-v3.5-sonnet",
     instructions: list[str] = [],
@@ -26,6 +45,7 @@ def get_bedrock_model_config(
     enable_reasoning: bool = False,
     prompt_caching_enabled: bool = False,
     has_tools: bool = False,
+    tool_specs: list[ToolSpec] | None = None,
 ) -> BedrockModel.BedrockConfig:
     """Get Bedrock model configuration."""
 
@@ -74,16 +94,20 @@ def get_bedrock_model_config(
         logger.info(f"Enabled Guardrails: {guardrail_config["guardrailIdentifier"]}")
 
     # Add prompt caching configuration
-    if prompt_caching_enabled and not (
-        has_tools and not is_prompt_caching_supported(model_name, target="tool")
-    ):
-        # Only enable system prompt caching if there are instructions
-        if is_prompt_caching_supported(model_name, "system") and len(instructions) > 0:
+    if prompt_caching_enabled:
+        cache_prefix = get_prompt_cache_prefix(
+            model_name=model_name,
+            instructions=instructions,
+            tool_specs=tool_specs or [],
+            has_tools=has_tools,
+        )
+
+        # Only cache the system prompt and the tools if they are long enough
+        if cache_prefix.system:
             config["cache_prompt"] = "default"
             logger.debug(f"Enabled system prompt caching for model {model_name}")
 
-        # Only enable tool caching if model supports it and tools are available
-        if is_prompt_caching_supported(model_name, target="tool") and has_tools:
+        if cache_prefix.tools:
             config["cache_tools"] = "default"
             logger.debug(f"Enabled tool caching for model {model_name}")
 
@@ -2,9 +2,12 @@
 Agent factory for Strands integration.
 """
 
+import hashlib
 import logging
 import os
+from dataclasses import dataclass
 
+from app.cache import TTLCache
 from app.repositories.models.conversation import type_model_name
 from app.repositories.models.custom_bot import BotModel, GenerationParamsModel
 from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
@@ -12,6 +15,7 @@ from app.strands_integration.utils import get_strands_tools
 from strands import Agent
 from strands.hooks import HookProvider
 from strands.models import BedrockModel
+from strands.types.tools import AgentTool as StrandsAgentTool
 
 from app.strands_integration.agent.config import get_bedrock_model_config
 
@@ -19,8 +23,89 @@ logger = logging.getLogger(__name__)
 
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
 
+AGENT_TEMPLATE_CACHE_SIZE = int(os.environ.get("AGENT_TEMPLATE_CACHE_SIZE", "128"))
+AGENT_TEMPLATE_CACHE_TTL = int(os.environ.get("AGENT_TEMPLATE_CACHE_TTL", "3600"))
 
-def create_strands_agent(
+# Bot attributes the model config, system prompt and tools are built from.
+# A change to any of them results in a new template.
+_TEMPLATE_BOT_FIELDS = {
+    "instruction",
+    "generation_params",
+    "agent",
+    "knowledge",
+    "bedrock_knowledge_base",
+    "bedrock_guardrails",
+    "prompt_caching_enabled",
+    "sync_last_exec_id",
+}
+
+
+@dataclass(frozen=True)
+class AgentTemplate:
+    """Parts of an agent shared by every turn with the same bot and settings.
+
+    Agents created from a template share the model, which holds its own
+    Bedrock client, and the tools. Conversation state, hooks and callbacks
+    are per agent.
+    """
+
+    model: BedrockModel
+    system_prompt: str | None
+    tools: tuple[StrandsAgentTool, ...]
+
+
+# Keyed by bot id, bot fingerprint, model and request flags
+agent_template_cache: TTLCache[tuple, AgentTemplate] = TTLCache(
+    max_size=AGENT_TEMPLATE_CACHE_SIZE, ttl=AGENT_TEMPLATE_CACHE_TTL
+)
+
+
+def _compose_bot_fingerprint(bot: BotModel) -> str:
+    # Chat handlers run in other processes than the bot API, so the key has to
+    # change with the bot itself rather than rely on invalidation alone.
+    return hashlib.sha256(
+        bot.model_dump_json(include=_TEMPLATE_BOT_FIELDS).encode("utf-8")
+    ).hexdigest()
+
+
+def _compose_template_key(
+    bot: BotModel | None,
+    instructions: list[str],
+    model_name: type_model_name,
+    generation_params: GenerationParamsModel | None,
+    guardrail: BedrockGuardrailsModel | None,
+    enable_reasoning: bool,
+    prompt_caching_enabled: bool,
+    has_tools: bool,
+) -> tuple:
+    # Instructions and settings are usually derived from the bot, but callers
+    # may pass their own.
+    request_fingerprint = hashlib.sha256(
+        "\0".join(
+            [
+                *instructions,
+                generation_params.model_dump_json() if generation_params else "",
+                guardrail.model_dump_json() if guardrail else "",
+            ]
+        ).encode("utf-8")
+    ).hexdigest()
+    return (
+        bot.id if bot else None,
+        _compose_bot_fingerprint(bot) if bot else None,
+        model_name,
+        request_fingerprint,
+        enable_reasoning,
+        prompt_caching_enabled,
+        has_tools,
+    )
+
+
+def invalidate_agent_templates(bot_id: str) -> int:
+    """Drop the templates of the bot. Returns the number of dropped entries."""
+    return agent_template_cache.invalidate_where(lambda key: key[0] == bot_id)
+
+
+def build_agent_template(
     bot: BotModel | None,
     instructions: list[str],
     model_name: type_model_name,
@@ -29,8 +114,8 @@ def create_strands_agent(
     enable_reasoning: bool = False,
     prompt_caching_enabled: bool = False,
     has_tools: bool = False,
-    hooks: list[HookProvider] | None = None,
-) -> Agent:
+) -> AgentTemplate:
+    tools = tuple(get_strands_tools(bot, model_name))
     model_config = get_bedrock_model_config(
         model_name=model_name,
         instructions=instructions,
@@ -39,6 +124,7 @@ def create_strands_agent(
         enable_reasoning=enable_reasoning,
         prompt_caching_enabled=prompt_caching_enabled,
         has_tools=has_tools,
+        tool_specs=[tool.tool_spec for tool in tools],
     )
     logger.debug(f"[AGENT_FACTORY] Model config: {model_config}")
     model = BedrockModel(
@@ -49,10 +135,51 @@ def create_strands_agent(
     # Strands does not support list of instructions, so we join them into a single string.
     system_prompt = "\n\n".join(instructions).strip() if instructions else None
 
-    agent = Agent(
+    return AgentTemplate(
         model=model,
-        tools=get_strands_tools(bot, model_name),  # type: ignore
-        hooks=hooks or [],
         system_prompt=system_prompt,
+        tools=tools,
+    )
+
+
+def create_strands_agent(
+    bot: BotModel | None,
+    instructions: list[str],
+    model_name: type_model_name,
+    generation_params: GenerationParamsModel | None = None,
+    guardrail: BedrockGuardrailsModel | None = None,
+    enable_reasoning: bool = False,
+    prompt_caching_enabled: bool = False,
+    has_tools: bool = False,
+    hooks: list[HookProvider] | None = None,
+) -> Agent:
+    template = agent_template_cache.get_or_load(
+        _compose_template_key(
+            bot=bot,
+            instructions=instructions,
+            model_name=model_name,
+            generation_params=generation_params,
+            guardrail=guardrail,
+            enable_reasoning=enable_reasoning,
+            prompt_caching_enabled=prompt_caching_enabled,
+            has_tools=has_tools,
+        ),
+        lambda: build_agent_template(
+            bot=bot,
+            instructions=instructions,
+            model_name=model_name,
+            generation_params=generation_params,
+            guardrail=guardrail,
+            enable_reasoning=enable_reasoning,
+            prompt_caching_enabled=prompt_caching_enabled,
+            has_tools=has_tools,
+        ),
+    )
+
+    agent = Agent(
+        model=template.model,
+        tools=list(template.tools),  # type: ignore
+        hooks=hooks or [],
+        system_prompt=template.system_prompt,
     )
     return agent
@@ -14,7 +14,10 @@ from app.repositories.models.custom_bot import (
     GenerationParamsModel,
 )
 from app.routes.schemas.conversation import ChatInput
-from app.strands_integration.agent import create_strands_agent
+from app.strands_integration.agent import (
+    create_strands_agent,
+    get_prompt_cache_prefix,
+)
 from app.strands_integration.converters import (
     simple_message_models_to_strands_messages,
     strands_message_to_simple_message_model,
@@ -141,6 +144,18 @@ def converse_with_strands(
         obs_context,
     )
 
+    # Cache points the model places on the system prompt and the tools
+    cache_prefix = (
+        get_prompt_cache_prefix(
+            model_name=chat_input.message.model,
+            instructions=instructions,
+            tool_specs=agent.tool_registry.get_all_tool_specs(),
+            has_tools=has_tools,
+        )
+        if prompt_caching_enabled
+        else None
+    )
+
     # Convert SimpleMessageModel list to Strands Messages format
     strands_messages = simple_message_models_to_strands_messages(
         simple_messages=messages,
@@ -148,6 +163,7 @@ def converse_with_strands(
         guardrail=guardrail,
         search_results=search_results,
         prompt_caching_enabled=prompt_caching_enabled,
+        cache_prefix=cache_prefix,
     )
 
     def run_agent(agent: Agent) -> tuple[StopReason, Message, EventLoopMetrics]:
@@ -6,9 +6,11 @@ import logging
 from typing import TypeGuard
 
 from app.bedrock import (
-    is_prompt_caching_supported,
+    PromptCachePrefix,
     is_unsigned_reasoning_content_supported,
+    plan_message_cache_points,
 )
+from app.message_cache import convert_messages
 from app.repositories.models.conversation import (
     ContentModel,
     MessageModel,
@@ -65,8 +67,13 @@ def simple_message_models_to_strands_messages(
     guardrail: BedrockGuardrailsModel | None = None,
     search_results: list[SearchResult] | None = None,
     prompt_caching_enabled: bool = True,
+    cache_prefix: PromptCachePrefix | None = None,
 ) -> Messages:
-    """Convert SimpleMessageModel list to Strands Messages format."""
+    """Convert SimpleMessageModel list to Strands Messages format.
+
+    Message cache points leave room for those in `cache_prefix`, placed by the
+    model on the system prompt and the tools.
+    """
 
     grounding_source = None
     if search_results and guardrail and guardrail.is_guardrail_enabled:
@@ -99,34 +106,45 @@ def simple_message_models_to_strands_messages(
 
         return content_model_to_strands_content_blocks(c)
 
+    def convert(message: SimpleMessageModel) -> list[ContentBlock]:
+        return [
+            block for c in message.content for block in process_content(c, message.role)
+        ]
+
+    conversation_messages = [
+        message for message in simple_messages if _is_conversation_role(message.role)
+    ]
     messages: Messages = [
         {
             "role": message.role,
-            "content": [
-                block
-                for c in message.content
-                for block in process_content(c, message.role)
-            ],
+            "content": content,
         }
-        for message in simple_messages
+        for message, content in zip(
+            conversation_messages,
+            convert_messages(
+                conversation_messages,
+                convert,
+                variant=("strands", is_unsigned_reasoning_content_supported(model)),
+                # Texts of user messages are wrapped with the grounding source of
+                # the turn
+                cacheable=lambda message: grounding_source is None
+                or message.role != "user",
+            ),
+        )
+        # Narrows the role for the type checker, all messages pass
         if _is_conversation_role(message.role)
     ]
 
     # Add message cache points (same logic as legacy bedrock.py)
-    if prompt_caching_enabled and is_prompt_caching_supported(model, target="message"):
-        for order, message in enumerate(
-            filter(lambda m: m["role"] == "user", reversed(messages))
-        ):
-            if order >= 2:
-                break
-
-            message["content"] = [
-                *(message["content"]),
+    if prompt_caching_enabled:
+        for index in plan_message_cache_points(model, messages, cache_prefix):
+            messages[index]["content"] = [
+                *(messages[index]["content"]),
                 {
                     "cachePoint": {"type": "default"},
                 },
             ]
-            logger.debug(f"Added message cache point to user message: {message}")
+            logger.debug(f"Added message cache point to message {index}")
 
     return messages
 
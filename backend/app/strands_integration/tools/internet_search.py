@@ -1,6 +1,10 @@
+import hashlib
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from app.cache import TTLCache
 from app.repositories.models.custom_bot import BotModel
 from strands import tool
 from strands.types.tools import AgentTool as StrandsAgentTool
@@ -8,6 +12,18 @@ from strands.types.tools import AgentTool as StrandsAgentTool
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Summaries are requested concurrently, up to this many at a time.
+SUMMARY_MAX_CONCURRENCY = 8
+# Time given to summarize the results of one search, in seconds. Results not
+# summarized by then are returned truncated.
+SUMMARY_DEADLINE = 20
+# Bodies shorter than this are returned as they are.
+SUMMARY_MIN_CONTENT_LENGTH = 1000
+FALLBACK_CONTENT_LENGTH = 1000
+
+# Summaries keyed by (url, query hash). The summary depends on the query.
+summary_cache: TTLCache[tuple[str, str], str] = TTLCache(max_size=512, ttl=60 * 60)
+
 
 def _search_with_duckduckgo_standalone(
     query: str, time_limit: str, locale: str
@@ -39,17 +55,17 @@ def _search_with_duckduckgo_standalone(
             )
 
         # Format results for citation support
-        formatted_results = []
-        for result in results:
-            formatted_results.append(
+        formatted_results = _summarize_results(
+            [
                 {
-                    "content": _summarize_content_standalone(
-                        result["body"], result["title"], result["href"], query
-                    ),
+                    "content": result["body"],
                     "source_name": result["title"],
                     "source_link": result["href"],
                 }
-            )
+                for result in results
+            ],
+            query,
+        )
 
         logger.info(
             f"DuckDuckGo search completed. Found {len(formatted_results)} results"
@@ -103,14 +119,13 @@ def _search_with_firecrawl_standalone(
                 if title or content:
                     formatted_results.append(
                         {
-                            "content": _summarize_content_standalone(
-                                content, title, url, query
-                            ),
+                            "content": content,
                             "source_name": title,
                             "source_link": url,
                         }
                     )
 
+        formatted_results = _summarize_results(formatted_results, query)
         logger.info(
             f"Firecrawl search completed. Found {len(formatted_results)} results"
         )
@@ -122,21 +137,99 @@ def _search_with_firecrawl_standalone(
         return []
 
 
+def _truncate_content(content: str) -> str:
+    return (
+        content[:FALLBACK_CONTENT_LENGTH] + "..."
+        if len(content) > FALLBACK_CONTENT_LENGTH
+        else content
+    )
+
+
+def _summarize_results(
+    results: list[dict[str, str]], query: str
+) -> list[dict[str, str]]:
+    """Summarize the content of search results concurrently.
+
+    Short bodies are kept as they are. Results that are not summarized within
+    SUMMARY_DEADLINE are returned truncated, so that the tool still responds.
+    """
+    long_results = [
+        result
+        for result in results
+        if len(result["content"]) >= SUMMARY_MIN_CONTENT_LENGTH
+    ]
+    if not long_results:
+        return results
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(SUMMARY_MAX_CONCURRENCY, len(long_results)),
+        thread_name_prefix="internet-search-summary",
+    )
+    futures = {
+        id(result): executor.submit(
+            _summarize_content_standalone,
+            result["content"],
+            result["source_name"],
+            result["source_link"],
+            query,
+        )
+        for result in long_results
+    }
+    done, not_done = wait(futures.values(), timeout=SUMMARY_DEADLINE)
+    # Do not wait for the summaries over the deadline
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        logger.warning(
+            f"Summarized {len(done)} of {len(futures)} results within {SUMMARY_DEADLINE}s"
+        )
+
+    return [
+        (
+            {
+                **result,
+                "content": (
+                    future.result()
+                    if future in done
+                    else _truncate_content(result["content"])
+                ),
+            }
+            if (future := futures.get(id(result))) is not None
+            else result
+        )
+        for result in results
+    ]
+
+
 def _summarize_content_standalone(
     content: str, title: str, url: str, query: str
 ) -> str:
     """Standalone content summarization."""
     try:
-        from app.utils import get_bedrock_runtime_client
+        if not url:
+            return _invoke_summary_model(content, title, url, query)
 
-        # Truncate content if too long
-        max_input_length = 8000
-        if len(content) > max_input_length:
-            content = content[:max_input_length] + "..."
+        return summary_cache.get_or_load(
+            (url, hashlib.sha256(query.encode("utf-8")).hexdigest()),
+            lambda: _invoke_summary_model(content, title, url, query),
+        )
 
-        client = get_bedrock_runtime_client()
+    except Exception as e:
+        logger.error(f"Error summarizing content: {e}")
+        # Fallback: return truncated content
+        return _truncate_content(content)
+
+
+def _invoke_summary_model(content: str, title: str, url: str, query: str) -> str:
+    from app.utils import get_bedrock_runtime_client
 
-        prompt = f"""Please provide a concise summary of the following web content in 500-800 tokens maximum. Focus on information that directly answers or relates to the user's query: "{query}"
+    # Truncate content if too long
+    max_input_length = 8000
+    if len(content) > max_input_length:
+        content = content[:max_input_length] + "..."
+
+    client = get_bedrock_runtime_client()
+
+    prompt = f"""Please provide a concise summary of the following web content in 500-800 tokens maximum. Focus on information that directly answers or relates to the user's query: "{query}"
 
 Title: {title}
 URL: {url}
@@ -144,32 +237,24 @@ Content: {content}
 
 Summary:"""
 
-        response = client.invoke_model(
-            modelId="anthropic.claude-3-haiku-20240307-v1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(
-                {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 800,
-                    "messages": [{"role": "user", "content": prompt}],
-                }
-            ),
-        )
-
-        response_body = json.loads(response["body"].read())
-        summary = response_body["content"][0]["text"].strip()
+    response = client.invoke_model(
+        modelId="anthropic.claude-3-haiku-20240307-v1:0",
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(
+            {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 800,
+                "messages": [{"role": "user", "content": prompt}],
+            }
+        ),
+    )
 
-        logger.info(
-            f"Summarized content from {len(content)} chars to {len(summary)} chars"
-        )
-        return summary
+    response_body = json.loads(response["body"].read())
+    summary = response_body["content"][0]["text"].strip()
 
-    except Exception as e:
-        logger.error(f"Error summarizing content: {e}")
-        # Fallback: return truncated content
-        fallback_content = content[:1000] + "..." if len(content) > 1000 else content
-        return fallback_content
+    logger.info(f"Summarized content from {len(content)} chars to {len(summary)} chars")
+    return summary
 
 
 def _get_internet_tool_config(bot: BotModel | None):
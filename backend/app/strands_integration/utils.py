@@ -2,20 +2,27 @@
 Strands integration utilities - Independent tool management.
 """
 
+from __future__ import annotations
+
 import logging
-from typing import Dict
+from typing import TYPE_CHECKING, Callable, Dict
 
 from app.bedrock import is_tooluse_supported
 from app.repositories.models.custom_bot import BedrockAgentToolModel, BotModel
 from app.routes.schemas.conversation import type_model_name
-from strands.types.tools import AgentTool as StrandsAgentTool
+
+if TYPE_CHECKING:
+    # strands is only loaded by the tools themselves.
+    from strands.types.tools import AgentTool as StrandsAgentTool
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-def get_strands_registered_tools(bot: BotModel | None = None) -> list[StrandsAgentTool]:
-    """Get list of available Strands tools."""
+def _get_strands_tool_factories() -> (
+    dict[str, Callable[[BotModel | None], StrandsAgentTool]]
+):
+    """Tool factories by tool name, so that only the tools in use are created."""
     from app.strands_integration.tools.bedrock_agent import create_bedrock_agent_tool
     from app.strands_integration.tools.calculator import create_calculator_tool
     from app.strands_integration.tools.internet_search import (
@@ -23,11 +30,16 @@ def get_strands_registered_tools(bot: BotModel | None = None) -> list[StrandsAge
     )
     from app.strands_integration.tools.simple_list import simple_list, structured_list
 
-    tools: list[StrandsAgentTool] = []
-    tools.append(create_internet_search_tool(bot))
-    tools.append(create_bedrock_agent_tool(bot))
-    # tools.append(create_calculator_tool(bot))  # For testing purposes
-    return tools
+    return {
+        "internet_search": create_internet_search_tool,
+        "bedrock_agent": create_bedrock_agent_tool,
+        # "calculator": create_calculator_tool,  # For testing purposes
+    }
+
+
+def get_strands_registered_tools(bot: BotModel | None = None) -> list[StrandsAgentTool]:
+    """Get list of available Strands tools."""
+    return [factory(bot) for factory in _get_strands_tool_factories().values()]
 
 
 def get_strands_tools(
@@ -48,20 +60,14 @@ def get_strands_tools(
     if not bot or not bot.is_agent_enabled():
         return []
 
-    registered_tools = get_strands_registered_tools(bot)
+    tool_factories = _get_strands_tool_factories()
     tools: list[StrandsAgentTool] = []
 
     # Get tools based on bot's tool configuration
     for tool in bot.agent.tools:
-        if tool.name not in [t.tool_name for t in registered_tools]:
-            continue
-
-        # Append tool by matching name
-        matched_tool = next(
-            (t for t in registered_tools if t.tool_name == tool.name), None
-        )
-        if matched_tool:
-            tools.append(matched_tool)
+        factory = tool_factories.get(tool.name)
+        if factory is not None:
+            tools.append(factory(bot))
 
     # Add knowledge tool if bot has knowledge base
     if bot.has_knowledge():
@@ -11,6 +11,7 @@ from app.repositories.custom_bot import (
     delete_bot_by_id,
     find_alias_by_bot_id,
     find_bot_by_id,
+    find_bot_by_id_with_cache,
     find_owned_bots_by_user_id,
     find_pinned_public_bots,
     find_recently_used_bots_by_user_id,
@@ -106,6 +107,14 @@ def _update_s3_documents_by_diff(
         delete_file_from_s3(DOCUMENT_BUCKET, document_path, ignore_not_exist=True)
 
 
+def _invalidate_agent_templates(bot_id: str):
+    # Imported here as the agent factory loads strands, which the bot API does
+    # not need otherwise.
+    from app.strands_integration.agent.factory import invalidate_agent_templates
+
+    invalidate_agent_templates(bot_id)
+
+
 def create_new_bot(user: User, bot_input: BotInput) -> BotOutput:
     """Create a new bot.
     Bot is created as private.
@@ -283,6 +292,7 @@ def modify_owned_bot(
             modify_input.active_models.model_dump()  # type: ignore
         ),
     )
+    _invalidate_agent_templates(bot_id)
 
     if sync_status == "QUEUED":
         # If necessary, start the Embedding state machine.
@@ -353,7 +363,7 @@ def fetch_bot(user: User, bot_id: str) -> tuple[bool, BotModel]:
     `False` means the bot is shared by another user.
     """
     try:
-        bot = find_bot_by_id(bot_id)
+        bot = find_bot_by_id_with_cache(bot_id)
     except RecordNotFoundError as e:
         # NOTE: If the bot is not found, it must be an alias.
         logger.info(f"Bot {bot_id} is not found. Update alias.")
@@ -488,6 +498,7 @@ def remove_bot_by_id(user: User, bot_id: str):
     if bot.is_editable_by_user(user):
         owner_user_id = bot.owner_user_id
         delete_bot_by_id(owner_user_id, bot_id)
+        _invalidate_agent_templates(bot_id)
     else:
         delete_alias_by_id(user.id, bot_id)
 
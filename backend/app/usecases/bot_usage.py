@@ -0,0 +1,159 @@
+"""Write-behind aggregation of bot usage.
+
+Every turn with a bot counts one use on the bot item of the owner and sets the
+last used time on the item of the user. Shared bots concentrate the counter
+writes on a single item, so increments are buffered per bot and written at most
+once per `BOT_USAGE_FLUSH_INTERVAL`, and last used times at most once per
+`BOT_LAST_USED_GRANULARITY`.
+
+The first use after an interval is written immediately, so a bot used once is
+still counted. Buffered increments are written with the next use once the
+interval has passed, or when any later invocation drains its background tasks.
+Increments of the last interval before the execution environment stops
+receiving invocations are only written if it runs the exit flush on shutdown,
+which Lambda does not guarantee.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+from app.background import on_drain_background_tasks
+from app.cache import TTLCache
+from app.repositories.common import RecordNotFoundError
+from app.repositories.custom_bot import (
+    update_alias_last_used_time,
+    update_bot_last_used_time,
+    update_bot_stats,
+)
+from app.repositories.models.custom_bot import BotModel
+from app.user import User
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BOT_USAGE_FLUSH_INTERVAL = float(os.environ.get("BOT_USAGE_FLUSH_INTERVAL", "30"))
+BOT_LAST_USED_GRANULARITY = float(os.environ.get("BOT_LAST_USED_GRANULARITY", "60"))
+BOT_USAGE_MAX_TRACKED = int(os.environ.get("BOT_USAGE_MAX_TRACKED", "4096"))
+
+
+class BotUsageAggregator:
+    """Buffers usage count increments and throttles last used time writes.
+
+    Args:
+        flush_interval: Minimum seconds between counter writes of a bot.
+        last_used_granularity: Minimum seconds between last used time writes of
+            a user and bot.
+        max_tracked: Maximum number of keys whose last write is remembered.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = BOT_USAGE_FLUSH_INTERVAL,
+        last_used_granularity: float = BOT_LAST_USED_GRANULARITY,
+        max_tracked: int = BOT_USAGE_MAX_TRACKED,
+    ) -> None:
+        self._lock = threading.Lock()
+        # Increments not written yet, keyed by (owner user id, bot id)
+        self._pending: dict[tuple[str, str], int] = {}
+        # Keys written within the flush interval or granularity
+        self._flushed: TTLCache[tuple[str, str], bool] = TTLCache(
+            max_size=max_tracked, ttl=flush_interval
+        )
+        self._last_used_written: TTLCache[tuple[str, str], bool] = TTLCache(
+            max_size=max_tracked, ttl=last_used_granularity
+        )
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(self._pending.values())
+
+    def record(self, user: User, bot: BotModel) -> None:
+        """Count one use of `bot` by `user`.
+
+        Raises `RecordNotFoundError` if the user has neither the bot nor an
+        alias of it, in which case the use is not counted.
+        """
+        self._touch_last_used(user, bot)
+
+        owner_id = user.id if bot.is_owned_by_user(user) else bot.owner_user_id
+        key = (owner_id, bot.id)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if key in self._flushed:
+                return
+
+            increment = self._pending.pop(key)
+            self._flushed.put(key, True)
+
+        self._write_stats(key, increment)
+
+    def flush(self) -> None:
+        """Write all buffered increments."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            for key in pending:
+                self._flushed.put(key, True)
+
+        self._write_pending(pending)
+
+    def flush_due(self) -> None:
+        """Write the buffered increments of the bots whose flush interval has
+        passed since their last write."""
+        with self._lock:
+            due = {
+                key: increment
+                for key, increment in self._pending.items()
+                if key not in self._flushed
+            }
+            for key in due:
+                del self._pending[key]
+                self._flushed.put(key, True)
+
+        self._write_pending(due)
+
+    def _write_pending(self, pending: dict[tuple[str, str], int]) -> None:
+        for key, increment in pending.items():
+            try:
+                self._write_stats(key, increment)
+            except Exception as e:
+                logger.exception(f"Failed to flush usage stats of bot {key[1]}: {e}")
+
+    def _touch_last_used(self, user: User, bot: BotModel) -> None:
+        key = (user.id, bot.id)
+        if key in self._last_used_written:
+            return
+
+        if bot.is_owned_by_user(user):
+            update_bot_last_used_time(user.id, bot.id)
+        else:
+            update_alias_last_used_time(user.id, bot.id)
+        self._last_used_written.put(key, True)
+
+    def _write_stats(self, key: tuple[str, str], increment: int) -> None:
+        owner_id, bot_id = key
+        try:
+            update_bot_stats(owner_id, bot_id, increment)
+        except RecordNotFoundError:
+            logger.info(f"Dropping {increment} uses of removed bot {bot_id}")
+        except Exception:
+            # Put the increments back for the next write
+            with self._lock:
+                self._pending[key] = self._pending.get(key, 0) + increment
+                self._flushed.invalidate(key)
+            raise
+
+
+bot_usage_aggregator = BotUsageAggregator()
+
+# Handlers drain the background tasks before Lambda freezes the environment
+on_drain_background_tasks("flush_bot_usage", bot_usage_aggregator.flush_due)
+# Best effort: Lambda only runs exit handlers on a graceful shutdown.
+atexit.register(bot_usage_aggregator.flush)
+
+
+def record_bot_usage(user: User, bot: BotModel) -> None:
+    bot_usage_aggregator.record(user, bot)
@@ -1,17 +1,26 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Callable
 
 from app.agents.tools.agent_tool import ToolRunResult
 from app.agents.utils import get_tools
+from app.background import submit_background_task
 from app.bedrock import (
     BedrockGuardrailsModel,
-    call_converse_api,
-    compose_args_for_converse_api,
     is_tooluse_supported,
 )
-from app.prompt import build_rag_prompt, get_prompt_to_cite_tool_results
+from app.message_cache import compose_message_cache_key
+from app.prompt import (
+    build_history_summary_prompt,
+    build_rag_prompt,
+    get_prompt_to_cite_tool_results,
+)
+from app.repositories.blob_store import resolve_blobs
 from app.repositories.conversation import (
     RecordNotFoundError,
+    find_conversation_branch,
     find_conversation_by_id,
     store_conversation,
     store_related_documents,
@@ -21,10 +30,10 @@ from app.repositories.custom_bot import alias_exists, store_alias
 from app.repositories.models.conversation import (
     ConversationModel,
     MessageModel,
-    ReasoningContentModel,
     RelatedDocumentModel,
     SimpleMessageModel,
     TextContentModel,
+    TokenUsageModel,
     ToolResultContentModel,
     ToolUseContentModel,
 )
@@ -45,8 +54,16 @@ from app.routes.schemas.conversation import (
     type_model_name,
 )
 from app.stream import ConverseApiStreamHandler, OnStopInput, OnThinking
-from app.usecases.bot import fetch_bot, modify_bot_last_used_time, modify_bot_stats
-from app.usecases.global_config import get_title_model
+from app.usecases.bot import fetch_bot
+from app.usecases.bot_usage import record_bot_usage
+from app.usecases.context_window import fit_context_window
+from app.usecases.conversation_title import (
+    DEFAULT_CONVERSATION_TITLE,
+    TitleGeneration,
+    generate_title,
+    needs_title,
+    wait_for_title,
+)
 from app.user import User
 from app.utils import get_current_time
 from app.strands_integration.observability import add_miscellaneous_node
@@ -54,6 +71,7 @@ from app.vector_search import (
     SearchResult,
     search_related_docs,
     search_result_to_related_document,
+    warm_knowledge_base_cache,
 )
 from typing_extensions import deprecated
 from ulid import ULID
@@ -70,9 +88,18 @@ def prepare_conversation(
     bot = None
 
     try:
-        # Fetch existing conversation
-        conversation = find_conversation_by_id(user.id, chat_input.conversation_id)
-        logger.info(f"Found conversation: {conversation}")
+        # Fetch existing conversation. Only the branch being continued is loaded,
+        # other messages are loaded if accessed.
+        conversation = find_conversation_branch(
+            user.id,
+            chat_input.conversation_id,
+            (
+                None
+                if chat_input.continue_generate
+                else chat_input.message.parent_message_id
+            ),
+        )
+        logger.info(f"Found conversation: {conversation.id}")
         parent_id = chat_input.message.parent_message_id
         if chat_input.message.parent_message_id == "system" and chat_input.bot_id:
             # The case editing first user message and use bot
@@ -145,7 +172,7 @@ def prepare_conversation(
         # Create new conversation
         conversation = ConversationModel(
             id=chat_input.conversation_id,
-            title="New conversation",
+            title=DEFAULT_CONVERSATION_TITLE,
             total_price=0.0,
             create_time=current_time,
             message_map=initial_message_map,
@@ -181,30 +208,52 @@ def prepare_conversation(
 
 
 def trace_to_root(
-    node_id: str | None, message_map: dict[str, MessageModel]
+    node_id: str | None,
+    message_map: dict[str, MessageModel],
+    conversation_id: str | None = None,
+    user_id: str | None = None,
 ) -> list[SimpleMessageModel]:
-    """Trace message map from leaf node to root node."""
+    """Trace message map from leaf node to root node.
+
+    With `conversation_id` and `user_id`, messages get a cache key so that
+    converting them for the model is cached across turns.
+    """
     result: list[SimpleMessageModel] = []
     if not node_id or node_id == "system":
         node_id = "instruction" if "instruction" in message_map else "system"
 
     current_node = message_map.get(node_id)
     while current_node:
-        result.append(SimpleMessageModel.from_message_model(message=current_node))
+        cache_key = (
+            compose_message_cache_key(user_id, conversation_id, node_id)
+            if conversation_id is not None and user_id is not None
+            else None
+        )
+        result.append(
+            SimpleMessageModel.from_message_model(
+                message=current_node, cache_key=cache_key
+            )
+        )
         if current_node.thinking_log:
-            result.extend(
-                log
-                for log in reversed(current_node.thinking_log)
-                if any(
+            for index in reversed(range(len(current_node.thinking_log))):
+                log = current_node.thinking_log[index]
+                if not any(
                     isinstance(content, ToolUseContentModel)
                     or isinstance(content, ToolResultContentModel)
                     for content in log.content
-                )
-            )
+                ):
+                    continue
+
+                if conversation_id is not None and user_id is not None:
+                    log._cache_key = compose_message_cache_key(
+                        user_id, conversation_id, f"{node_id}#{index}"
+                    )
+                result.append(log)
 
         parent_id = current_node.parent
         if parent_id is None:
             break
+        node_id = parent_id
         current_node = message_map.get(parent_id)
 
     return result[::-1]
@@ -218,9 +267,26 @@ def chat(
     on_thinking: Callable[[OnThinking], None] | None = None,
     on_tool_result: Callable[[ToolRunResult], None] | None = None,
     on_reasoning: Callable[[str], None] | None = None,
+    generate_conversation_title: bool = False,
 ) -> tuple[ConversationModel, MessageModel]:
     user_msg_id, conversation, bot = prepare_conversation(user, chat_input)
+
+    # Title a new conversation while the first answer is generated. Only the
+    # interactive chat shows titles, published API conversations stay untitled.
+    title_generation: TitleGeneration | None = None
+    if (
+        generate_conversation_title
+        and not chat_input.continue_generate
+        and needs_title(conversation)
+    ):
+        title_generation = TitleGeneration(user.id, conversation)
+        title_generation.start(
+            trace_to_root(node_id=user_msg_id, message_map=conversation.message_map)
+        )
+
     display_citation = bot is not None and bot.display_retrieved_chunks
+    if bot is not None and bot.has_knowledge():
+        warm_knowledge_base_cache(bot)
 
     message_map = conversation.message_map
     instructions: list[str] = (
@@ -301,6 +367,8 @@ def chat(
     messages = trace_to_root(
         node_id=node_id,
         message_map=message_map,
+        conversation_id=conversation.id,
+        user_id=user.id,
     )
 
     if chat_input.continue_generate:
@@ -310,12 +378,30 @@ def chat(
 
     else:
         messages.append(
-            SimpleMessageModel.from_message_model(message=message_map[user_msg_id]),
+            SimpleMessageModel.from_message_model(
+                message=message_map[user_msg_id],
+                cache_key=compose_message_cache_key(
+                    user.id, conversation.id, user_msg_id
+                ),
+            ),
         )
         message_for_continue_generate = None
 
     generation_params = bot.generation_params if bot else None
 
+    # Drop the oldest turns that do not fit the context window of the model
+    context_window = fit_context_window(
+        user_id=user.id,
+        conversation_id=conversation.id,
+        messages=messages,
+        model=chat_input.message.model,
+        instructions=instructions,
+        generation_params=generation_params,
+    )
+    messages = context_window.messages
+    if context_window.summary is not None:
+        instructions.append(build_history_summary_prompt(context_window.summary.body))
+
     # Guardrails
     guardrail = bot.bedrock_guardrails if bot else None
 
@@ -380,6 +466,7 @@ def chat(
         search_results=search_results,
         related_documents=related_documents,
         on_stop=on_stop,
+        title_generation=title_generation,
     )
 
 
@@ -513,6 +600,24 @@ def converse_legacy(
         thinking_log.append(tool_result_message)
 
 
+# Runs the writes of a turn that are independent of each other.
+_store_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="post-turn")
+
+
+@contextmanager
+def _timed(timings: dict[str, float], stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = (time.perf_counter() - started) * 1000
+
+
+def _timed_call(timings: dict[str, float], stage: str, fn: Callable[[], object]):
+    with _timed(timings, stage):
+        return fn()
+
+
 def post_process_result(
     result: OnStopInput,
     message_for_continue_generate: SimpleMessageModel | None,
@@ -524,6 +629,7 @@ def post_process_result(
     search_results: list[SearchResult],
     related_documents: list[RelatedDocumentModel],
     on_stop: Callable[[OnStopInput], None] | None = None,
+    title_generation: TitleGeneration | None = None,
 ):
     """Post-process OnStopInput and update conversation."""
 
@@ -536,6 +642,20 @@ def post_process_result(
     conversation.total_price += result["price"]
     conversation.should_continue = stop_reason == "max_tokens"
 
+    # Record the usage of this turn to check prompt caching against the price
+    message.usage = TokenUsageModel(
+        input_tokens=result["input_token_count"],
+        output_tokens=result["output_token_count"],
+        cache_read_input_tokens=result["cache_read_input_count"],
+        cache_write_input_tokens=result["cache_write_input_count"],
+        price=result["price"],
+    )
+    logger.info(
+        f"Prompt cache hit rate: {message.usage.cache_hit_rate:.2f} "
+        f"(read: {result['cache_read_input_count']}, "
+        f"write: {result['cache_write_input_count']})"
+    )
+
     # Set message parent and generate assistant message ID
     message.parent = user_msg_id
 
@@ -577,52 +697,94 @@ def post_process_result(
         # Store RAG results in ToolResultCapture for citation support
         related_documents.extend(search_results_as_related_documents)
 
-    # Observability: add final output node linked to agent node
-    add_miscellaneous_node(
-        conversation_id=conversation.id,
-        user_msg_id=user_msg_id,
-        assistant_msg_id=assistant_msg_id,
-        metadata={
-            "stop_reason": str(result["stop_reason"]),
-            "input_tokens": result["input_token_count"],
-            "output_tokens": result["output_token_count"],
-            "price": result["price"],
-        },
-        last_message_id=prev_last_message_id,
-    )
-
-    # Store conversation before finish streaming so that front-end can avoid 404 issue
-    store_conversation(user.id, conversation)
-    if related_documents:
-        store_related_documents(
-            user_id=user.id,
-            conversation_id=conversation.id,
-            related_documents=related_documents,
+    timings: dict[str, float] = {}
+
+    # Store conversation before finish streaming so that front-end can avoid 404 issue.
+    # Related documents are written concurrently to the conversation.
+    with _timed(timings, "store"):
+        store_related_documents_future = (
+            _store_executor.submit(
+                _timed_call,
+                timings,
+                "store_related_documents",
+                lambda: store_related_documents(
+                    user_id=user.id,
+                    conversation_id=conversation.id,
+                    related_documents=related_documents,
+                ),
+            )
+            if related_documents
+            else None
         )
 
+        def store():
+            store_conversation(user.id, conversation)
+
+        try:
+            _timed_call(
+                timings,
+                "store_conversation",
+                (
+                    store
+                    if title_generation is None
+                    # Stored with the title if it is ready by now
+                    else lambda: title_generation.store(store)
+                ),
+            )
+        finally:
+            if store_related_documents_future is not None:
+                store_related_documents_future.result()
+
     # Call on_stop callback
     if on_stop:
-        on_stop(result)
+        with _timed(timings, "on_stop"):
+            on_stop(result)
+
+    # Bookkeeping the client does not wait for. Handlers drain these before
+    # they return.
+    # Observability: add final output node linked to agent node
+    submit_background_task(
+        "add_miscellaneous_node",
+        lambda: add_miscellaneous_node(
+            conversation_id=conversation.id,
+            user_msg_id=user_msg_id,
+            assistant_msg_id=assistant_msg_id,
+            metadata={
+                "stop_reason": str(result["stop_reason"]),
+                "input_tokens": result["input_token_count"],
+                "output_tokens": result["output_token_count"],
+                "price": result["price"],
+            },
+            last_message_id=prev_last_message_id,
+        ),
+    )
 
     # Update bot statistics
     if bot:
         logger.debug("Bot is provided. Updating bot last used time.")
-        try:
-            # Update bot last used time
-            modify_bot_last_used_time(user, bot)
-            # Update bot stats
-            modify_bot_stats(user, bot, increment=1)
-        except RecordNotFoundError:
-            # Published API users don't own the bot and have no alias record
-            logger.info(f"Skipping bot stats update for user {user.id} (no alias record)")
+        submit_background_task("update_bot_stats", lambda: _update_bot_stats(user, bot))
 
+    logger.info(
+        f"Post-turn stages for {conversation.id} (ms): "
+        + ", ".join(f"{stage}={elapsed:.1f}" for stage, elapsed in timings.items())
+    )
     return conversation, message
 
 
+def _update_bot_stats(user: User, bot: BotModel):
+    try:
+        # Update bot last used time and stats, both aggregated across turns
+        record_bot_usage(user, bot)
+    except RecordNotFoundError:
+        # Published API users don't own the bot and have no alias record
+        logger.info(f"Skipping bot stats update for user {user.id} (no alias record)")
+
+
 def chat_output_from_message(
     conversation: ConversationModel,
     message: MessageModel,
 ) -> ChatOutput:
+    resolve_blobs(message.content)
     return ChatOutput(
         conversation_id=conversation.id,
         create_time=conversation.create_time,
@@ -660,66 +822,26 @@ def propose_conversation_title(
     user_id: str,
     conversation_id: str,
 ) -> str:
-    # Use the configured title model for generating conversation titles
-    model = get_title_model()
-
-    PROMPT = """Reading the conversation above, what is the appropriate title for the conversation? When answering the title, please follow the rules below:
-<rules>
-- Title length must be from 15 to 20 characters.
-- Prefer more specific title than general. Your title should always be distinct from others.
-- Return the conversation title only. DO NOT include any strings other than the title.
-- Title must be in the same language as the conversation.
-</rules>
-"""
-    # Fetch existing conversation
-    conversation = find_conversation_by_id(user_id, conversation_id)
-
+    # Titles of new conversations are generated along with the first answer
+    title = wait_for_title(user_id, conversation_id)
+    if title != DEFAULT_CONVERSATION_TITLE:
+        return title
+
+    # The generation failed or is still running. A title generated later in the
+    # background does not replace the one stored by the client.
+    conversation = find_conversation_branch(user_id, conversation_id)
     messages = trace_to_root(
         node_id=conversation.last_message_id,
         message_map=conversation.message_map,
     )
-
-    # Append message to generate title
-    new_message = SimpleMessageModel(
-        role="user",
-        content=[
-            TextContentModel(
-                content_type="text",
-                body=PROMPT,
-            )
-        ],
-    )
-    messages.append(new_message)
-
-    # Invoke Bedrock
-    args = compose_args_for_converse_api(
-        messages=[
-            message
-            for message in messages
-            if not any(
-                isinstance(content, ToolUseContentModel)
-                or isinstance(content, ToolResultContentModel)
-                or isinstance(content, ReasoningContentModel)
-                for content in message.content
-            )
-        ],
-        model=model,
-        stream=False,
-    )
-    response = call_converse_api(args)
-    reply_txt = (
-        response["output"]["message"]["content"][0]["text"]
-        if "message" in response["output"]
-        and len(response["output"]["message"]["content"]) > 0
-        and "text" in response["output"]["message"]["content"][0]
-        else ""
-    )
-
-    return reply_txt
+    return generate_title(messages)
 
 
 def fetch_conversation(user_id: str, conversation_id: str) -> Conversation:
     conversation = find_conversation_by_id(user_id, conversation_id)
+    resolve_blobs(
+        c for message in conversation.message_map.values() for c in message.content
+    )
 
     message_map = {
         message_id: MessageOutput(
@@ -0,0 +1,313 @@
+"""Fitting the conversation history into the context window of the model.
+
+Each turn sends the whole branch of the conversation, so long conversations
+send ever more input tokens until they exceed the context window. Once the
+history exceeds the input token budget of the model, the oldest turns are
+dropped, down to about `CONTEXT_TRUNCATE_RATIO` of the budget. The cut stays at
+the same message in the following turns, so that the history sent keeps its
+prefix and prompt caching keeps working, until the history from the cut on
+exceeds the budget again.
+
+The dropped turns are summarized in the background and the summary is stored
+with the conversation. Later turns that drop the same turns use the summary
+in the system prompt instead.
+"""
+
+import logging
+import math
+import os
+from typing import NamedTuple
+
+from app.background import submit_background_task
+from app.bedrock import (
+    ESTIMATED_CHARS_PER_TOKEN,
+    ESTIMATED_IMAGE_TOKENS,
+    calculate_price,
+    call_converse_api,
+    compose_args_for_converse_api,
+    estimate_tokens,
+    generation_params_to_converse_configuration,
+    get_context_window_tokens,
+)
+from app.prompt import build_summarize_history_prompt
+from app.repositories.conversation import find_history_summary, store_history_summary
+from app.repositories.models.conversation import (
+    AttachmentContentModel,
+    ContentModel,
+    HistorySummaryModel,
+    ImageContentModel,
+    SimpleMessageModel,
+    TextContentModel,
+    ToolResultContentModel,
+    type_model_name,
+)
+from app.repositories.models.custom_bot import GenerationParamsModel
+from app.usecases.global_config import get_title_model
+from app.utils import get_current_time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Share of the context window available to the input
+CONTEXT_WINDOW_RATIO = float(os.environ.get("CONTEXT_WINDOW_RATIO", "0.8"))
+# Optional limit on the input tokens below the context window, to bound the cost
+# of long conversations
+CONTEXT_MAX_INPUT_TOKENS = int(os.environ.get("CONTEXT_MAX_INPUT_TOKENS", "0"))
+# Share of the budget the history is cut down to once it exceeds the budget
+CONTEXT_TRUNCATE_RATIO = float(os.environ.get("CONTEXT_TRUNCATE_RATIO", "0.6"))
+# Attachments stored in the blob store are loaded without their body
+CONTEXT_ATTACHMENT_TOKENS = int(os.environ.get("CONTEXT_ATTACHMENT_TOKENS", "4000"))
+ENABLE_HISTORY_SUMMARY = (
+    os.environ.get("ENABLE_HISTORY_SUMMARY", "true").lower() == "true"
+)
+
+
+class ContextWindow(NamedTuple):
+    messages: list[SimpleMessageModel]
+    # Summary of the dropped messages, if available
+    summary: HistorySummaryModel | None
+
+
+def _estimate_content_tokens(content: ContentModel) -> int:
+    if isinstance(content, TextContentModel):
+        return len(content.body) // ESTIMATED_CHARS_PER_TOKEN
+
+    elif isinstance(content, ImageContentModel):
+        return ESTIMATED_IMAGE_TOKENS
+
+    elif isinstance(content, AttachmentContentModel):
+        return (
+            len(content.body) // ESTIMATED_CHARS_PER_TOKEN
+            if content.body
+            else CONTEXT_ATTACHMENT_TOKENS
+        )
+
+    return estimate_tokens(content.model_dump(exclude={"content_type"}))
+
+
+def estimate_message_tokens(message: SimpleMessageModel) -> int:
+    return sum(_estimate_content_tokens(content) for content in message.content)
+
+
+def get_input_token_budget(
+    model: type_model_name,
+    generation_params: GenerationParamsModel | None = None,
+) -> int:
+    """Tokens available to the system prompt and the messages, leaving room
+    for the output.
+    """
+    inference_config = generation_params_to_converse_configuration(
+        model=model, generation_params=generation_params
+    )["inferenceConfig"]
+    budget = int(get_context_window_tokens(model) * CONTEXT_WINDOW_RATIO) - (
+        inference_config.get("maxTokens", 0)
+    )
+    if CONTEXT_MAX_INPUT_TOKENS > 0:
+        budget = min(budget, CONTEXT_MAX_INPUT_TOKENS)
+
+    return budget
+
+
+def _message_id(message: SimpleMessageModel) -> str | None:
+    # Set by `trace_to_root` for messages of a stored conversation
+    return message._cache_key[1] if message._cache_key is not None else None
+
+
+def _is_turn_start(message: SimpleMessageModel) -> bool:
+    # Tool results are sent as user messages within a turn
+    return message.role == "user" and not all(
+        isinstance(content, ToolResultContentModel) for content in message.content
+    )
+
+
+def plan_context_window(
+    messages: list[SimpleMessageModel],
+    budget: int,
+    summary: HistorySummaryModel | None = None,
+) -> tuple[int, HistorySummaryModel | None]:
+    """Choose the first message to send and the summary to send instead of
+    the messages before it.
+
+    The history is only cut at the start of a turn, and the last turn is
+    always sent. A summary is used if the history can be cut where it ends.
+    """
+    tokens = [estimate_message_tokens(message) for message in messages]
+    total = sum(tokens)
+    if total <= budget:
+        return 0, None
+
+    # Tokens of the messages from each index on
+    remaining = [total]
+    for count in tokens[:-1]:
+        remaining.append(remaining[-1] - count)
+
+    starts = [
+        index for index in range(1, len(messages)) if _is_turn_start(messages[index])
+    ]
+    if summary is not None:
+        for index in starts:
+            if _message_id(messages[index]) == summary.until_message_id:
+                if remaining[index] + estimate_tokens(summary.body) <= budget:
+                    return index, summary
+                break
+
+    # Drop the tokens in multiples of the room between the budget and the
+    # truncation target. The cut depends only on the messages before it and
+    # moves once the history from it on exceeds the budget, with no need to
+    # remember it between turns.
+    step = max(int(budget * (1 - CONTEXT_TRUNCATE_RATIO)), 1)
+    dropped = math.ceil((total - budget) / step) * step
+    for index in starts:
+        if total - remaining[index] >= dropped:
+            return index, None
+
+    return (starts[-1] if starts else 0), None
+
+
+def _compose_transcript(messages: list[SimpleMessageModel]) -> str:
+    lines: list[str] = []
+    for message in messages:
+        if message.role not in ("user", "assistant"):
+            continue
+
+        text = "\n".join(
+            content.body
+            for content in message.content
+            if isinstance(content, TextContentModel)
+        )
+        if text:
+            role = "User" if message.role == "user" else "Assistant"
+            lines.append(f"{role}: {text}")
+
+    return "\n\n".join(lines)
+
+
+def summarize_history(
+    user_id: str,
+    conversation_id: str,
+    messages: list[SimpleMessageModel],
+    until_message_id: str,
+    previous_summary: HistorySummaryModel | None = None,
+) -> HistorySummaryModel:
+    """Summarize the messages, following the previous summary if any, and
+    store the summary with the conversation.
+    """
+    model = get_title_model()
+    # Keep the latest messages if the transcript is too long for the model
+    max_chars = get_input_token_budget(model) * ESTIMATED_CHARS_PER_TOKEN
+    transcript = _compose_transcript(messages)[-max_chars:]
+
+    args = compose_args_for_converse_api(
+        messages=[
+            SimpleMessageModel(
+                role="user",
+                content=[
+                    TextContentModel(
+                        content_type="text",
+                        body=build_summarize_history_prompt(
+                            transcript=transcript,
+                            previous_summary=(
+                                previous_summary.body if previous_summary else None
+                            ),
+                        ),
+                    )
+                ],
+            )
+        ],
+        model=model,
+        stream=False,
+    )
+    response = call_converse_api(args)
+    body = (
+        response["output"]["message"]["content"][0]["text"]
+        if "message" in response["output"]
+        and len(response["output"]["message"]["content"]) > 0
+        and "text" in response["output"]["message"]["content"][0]
+        else ""
+    )
+    usage = response["usage"]
+    price = calculate_price(
+        model=model,
+        input_tokens=usage["inputTokens"],
+        output_tokens=usage["outputTokens"],
+        cache_read_input_tokens=usage.get("cacheReadInputTokens", 0),
+        cache_write_input_tokens=usage.get("cacheWriteInputTokens", 0),
+    )
+    logger.info(
+        f"Summarized {len(messages)} messages of conversation {conversation_id} "
+        f"(price: {price})"
+    )
+
+    summary = HistorySummaryModel(
+        until_message_id=until_message_id,
+        body=body,
+        create_time=get_current_time(),
+    )
+    store_history_summary(user_id, conversation_id, summary)
+    return summary
+
+
+def fit_context_window(
+    user_id: str,
+    conversation_id: str,
+    messages: list[SimpleMessageModel],
+    model: type_model_name,
+    instructions: list[str],
+    generation_params: GenerationParamsModel | None = None,
+) -> ContextWindow:
+    """Drop the oldest turns that do not fit the input token budget of the
+    model, and summarize them in the background if no summary is stored yet.
+    """
+    budget = get_input_token_budget(model, generation_params) - estimate_tokens(
+        instructions
+    )
+    if sum(estimate_message_tokens(message) for message in messages) <= budget:
+        return ContextWindow(messages=messages, summary=None)
+
+    stored_summary = (
+        find_history_summary(user_id, conversation_id)
+        if ENABLE_HISTORY_SUMMARY
+        else None
+    )
+    start, summary = plan_context_window(messages, budget, stored_summary)
+    logger.info(
+        f"Dropped {start} of {len(messages)} messages to fit {budget} tokens "
+        f"(summary: {summary is not None})"
+    )
+
+    until_message_id = _message_id(messages[start])
+    if (
+        ENABLE_HISTORY_SUMMARY
+        and summary is None
+        and until_message_id is not None
+        # Already summarized, but the summary does not fit with the history
+        and (
+            stored_summary is None
+            or stored_summary.until_message_id != until_message_id
+        )
+    ):
+        # Continue from the stored summary if it ends before the cut
+        previous_start = next(
+            (
+                index
+                for index in range(start)
+                if stored_summary is not None
+                and _message_id(messages[index]) == stored_summary.until_message_id
+            ),
+            None,
+        )
+        dropped = messages[previous_start if previous_start is not None else 0 : start]
+        submit_background_task(
+            "summarize_history",
+            lambda: summarize_history(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                messages=dropped,
+                until_message_id=until_message_id,
+                previous_summary=(
+                    stored_summary if previous_start is not None else None
+                ),
+            ),
+        )
+
+    return ContextWindow(messages=messages[start:], summary=summary)
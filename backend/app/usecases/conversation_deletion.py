@@ -0,0 +1,93 @@
+"""Deletion of all conversations of a user as a resumable job.
+
+Users with tens of thousands of conversations cannot be cleaned up within the
+API Gateway timeout. The job deletes for up to
+`CONVERSATION_DELETION_SLICE_SECONDS` per request and records its progress.
+Each progress request continues the job until nothing is left.
+"""
+
+import logging
+import os
+import time
+
+from app.repositories.bulk_delete import BulkDeleteProgress
+from app.repositories.conversation import (
+    acquire_conversation_deletion_job_lease,
+    delete_conversation_by_user_id,
+    find_conversation_deletion_job_by_id,
+    store_conversation_deletion_job,
+)
+from app.repositories.models.conversation import ConversationDeletionJobModel
+from app.user import User
+from app.utils import get_current_time
+from ulid import ULID
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Kept below the 30 seconds integration timeout of API Gateway
+CONVERSATION_DELETION_SLICE_SECONDS = float(
+    os.environ.get("CONVERSATION_DELETION_SLICE_SECONDS", "20")
+)
+# Covers a slice and the deletions in flight when it ends
+CONVERSATION_DELETION_LEASE_SECONDS = CONVERSATION_DELETION_SLICE_SECONDS + 30
+
+
+def start_conversation_deletion(user: User) -> ConversationDeletionJobModel:
+    """Create a job deleting all conversations of the user and run its first slice."""
+    current_time = get_current_time()
+    job = ConversationDeletionJobModel(
+        id=str(ULID()),
+        status="RUNNING",
+        create_time=current_time,
+        update_time=current_time,
+    )
+    store_conversation_deletion_job(user.id, job)
+    return _run_slice(user, job)
+
+
+def continue_conversation_deletion(
+    user: User, job_id: str
+) -> ConversationDeletionJobModel:
+    """Return the progress of the job, running another slice if it is not done."""
+    job = find_conversation_deletion_job_by_id(user.id, job_id)
+    if job.status != "RUNNING":
+        return job
+
+    return _run_slice(user, job)
+
+
+def _run_slice(
+    user: User, job: ConversationDeletionJobModel
+) -> ConversationDeletionJobModel:
+    if not acquire_conversation_deletion_job_lease(
+        user.id, job.id, CONVERSATION_DELETION_LEASE_SECONDS
+    ):
+        # Another request is working on the job
+        return find_conversation_deletion_job_by_id(user.id, job.id)
+
+    deleted_items, deleted_objects = job.deleted_items, job.deleted_objects
+
+    def on_progress(progress: BulkDeleteProgress):
+        job.deleted_items = deleted_items + progress.deleted_items
+        job.deleted_objects = deleted_objects + progress.deleted_objects
+
+    try:
+        completed = delete_conversation_by_user_id(
+            user.id,
+            deadline=time.monotonic() + CONVERSATION_DELETION_SLICE_SECONDS,
+            on_progress=on_progress,
+        )
+        job.status = "SUCCEEDED" if completed else "RUNNING"
+    except Exception as e:
+        logger.exception(f"Conversation deletion job {job.id} failed: {e}")
+        job.status = "FAILED"
+        job.error = str(e)
+
+    job.update_time = get_current_time()
+    store_conversation_deletion_job(user.id, job)
+    logger.info(
+        f"Conversation deletion job {job.id} is {job.status}: "
+        f"{job.deleted_items} items, {job.deleted_objects} objects deleted"
+    )
+    return job
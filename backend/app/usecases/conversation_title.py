@@ -0,0 +1,202 @@
+"""Generating conversation titles.
+
+The title of a new conversation is generated in the background as soon as the
+first user message is known, while the first answer is streamed. It is stored
+with the conversation if ready by then, otherwise on its own once ready, unless
+the title was changed in the meantime.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Literal
+
+from app.background import submit_background_task
+from app.bedrock import (
+    ESTIMATED_CHARS_PER_TOKEN,
+    call_converse_api,
+    compose_args_for_converse_api,
+)
+from app.cache import TTLCache
+from app.repositories.conversation import (
+    find_conversation_title,
+    replace_conversation_title,
+)
+from app.repositories.models.conversation import (
+    ConversationModel,
+    SimpleMessageModel,
+    TextContentModel,
+)
+from app.usecases.global_config import get_title_model
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_CONVERSATION_TITLE = "New conversation"
+# Titles are generated from the first messages only
+TITLE_MAX_MESSAGES = int(os.environ.get("TITLE_MAX_MESSAGES", "4"))
+TITLE_MAX_INPUT_TOKENS = int(os.environ.get("TITLE_MAX_INPUT_TOKENS", "1000"))
+# Generate titles of new conversations along with the first answer
+ENABLE_BACKGROUND_TITLE = (
+    os.environ.get("ENABLE_BACKGROUND_TITLE", "true").lower() == "true"
+)
+# Time to wait for the background title when it is requested before stored
+TITLE_WAIT_TIMEOUT = float(os.environ.get("TITLE_WAIT_TIMEOUT", "2"))
+TITLE_WAIT_INTERVAL = 0.25
+
+# Status of the background titles generated by this process, keyed by user and
+# conversation id, so that a failed generation is not waited for
+title_generation_status: TTLCache[
+    tuple[str, str], Literal["running", "failed", "done"]
+] = TTLCache(max_size=1024, ttl=5 * 60)
+
+TITLE_PROMPT = """Reading the conversation above, what is the appropriate title for the conversation? When answering the title, please follow the rules below:
+<rules>
+- Title length must be from 15 to 20 characters.
+- Prefer more specific title than general. Your title should always be distinct from others.
+- Return the conversation title only. DO NOT include any strings other than the title.
+- Title must be in the same language as the conversation.
+</rules>
+"""
+
+
+def _compose_title_messages(
+    messages: list[SimpleMessageModel],
+) -> list[SimpleMessageModel]:
+    """First text messages, cut to `TITLE_MAX_INPUT_TOKENS` in total, followed
+    by the prompt.
+    """
+    remaining = TITLE_MAX_INPUT_TOKENS * ESTIMATED_CHARS_PER_TOKEN
+    result: list[SimpleMessageModel] = []
+    for message in messages:
+        if len(result) >= TITLE_MAX_MESSAGES or remaining <= 0:
+            break
+
+        if message.role not in ("user", "assistant"):
+            continue
+
+        # Tool uses, tool results and reasoning are not needed for the title
+        text = "\n".join(
+            content.body
+            for content in message.content
+            if isinstance(content, TextContentModel)
+        )[:remaining]
+        if not text:
+            continue
+
+        remaining -= len(text)
+        result.append(
+            SimpleMessageModel(
+                role=message.role,
+                content=[TextContentModel(content_type="text", body=text)],
+            )
+        )
+
+    prompt = TextContentModel(content_type="text", body=TITLE_PROMPT)
+    if result and result[-1].role == "user":
+        # Before the first answer, roles must still alternate
+        result[-1].content.append(prompt)
+    else:
+        result.append(SimpleMessageModel(role="user", content=[prompt]))
+
+    return result
+
+
+def _call_title_model(title_messages: list[SimpleMessageModel]) -> str:
+    args = compose_args_for_converse_api(
+        messages=title_messages,
+        model=get_title_model(),
+        stream=False,
+    )
+    response = call_converse_api(args)
+    return (
+        response["output"]["message"]["content"][0]["text"]
+        if "message" in response["output"]
+        and len(response["output"]["message"]["content"]) > 0
+        and "text" in response["output"]["message"]["content"][0]
+        else ""
+    )
+
+
+def generate_title(messages: list[SimpleMessageModel]) -> str:
+    """Generate a title from the first messages of the conversation."""
+    return _call_title_model(_compose_title_messages(messages))
+
+
+def needs_title(conversation: ConversationModel) -> bool:
+    return ENABLE_BACKGROUND_TITLE and conversation.title == DEFAULT_CONVERSATION_TITLE
+
+
+def wait_for_title(user_id: str, conversation_id: str) -> str:
+    """Stored title of the conversation, waiting up to `TITLE_WAIT_TIMEOUT` for
+    the background title if the default title is stored.
+
+    Returns at once if the background title was generated by this process and
+    failed. Generations in other processes can only be waited for.
+    """
+    deadline = time.monotonic() + (TITLE_WAIT_TIMEOUT if ENABLE_BACKGROUND_TITLE else 0)
+    while True:
+        title = find_conversation_title(user_id, conversation_id)
+        if (
+            title != DEFAULT_CONVERSATION_TITLE
+            or time.monotonic() >= deadline
+            or title_generation_status.get((user_id, conversation_id))
+            in ("failed", "done")
+        ):
+            return title
+
+        time.sleep(TITLE_WAIT_INTERVAL)
+
+
+class TitleGeneration:
+    """Title of a conversation generated in the background.
+
+    The conversation has to be stored through `store` so that the title ends
+    up stored whichever finishes first.
+    """
+
+    def __init__(self, user_id: str, conversation: ConversationModel) -> None:
+        self.user_id = user_id
+        self.conversation = conversation
+        self._lock = threading.Lock()
+        self._title: str | None = None
+        self._stored = False
+
+    def start(self, messages: list[SimpleMessageModel]) -> None:
+        # Copied now, as the messages may change while the answer is generated
+        title_messages = _compose_title_messages(messages)
+        title_generation_status.put((self.user_id, self.conversation.id), "running")
+        submit_background_task("generate_title", lambda: self._generate(title_messages))
+
+    def _generate(self, title_messages: list[SimpleMessageModel]) -> None:
+        key = (self.user_id, self.conversation.id)
+        try:
+            title = _call_title_model(title_messages)
+        except Exception:
+            title_generation_status.put(key, "failed")
+            raise
+
+        if not title:
+            title_generation_status.put(key, "failed")
+            return
+
+        with self._lock:
+            self._title = title
+            stored = self._stored
+
+        logger.info(f"Generated title of {self.conversation.id}: {title}")
+        if stored and not replace_conversation_title(
+            self.user_id, self.conversation.id, DEFAULT_CONVERSATION_TITLE, title
+        ):
+            # Renamed, or titled by `propose_conversation_title`, in the meantime
+            logger.info(f"Title of {self.conversation.id} already changed, skipping")
+        title_generation_status.put(key, "done")
+
+    def store(self, store: Callable[[], object]) -> None:
+        """Store the conversation with `store`, with the title if it is ready."""
+        with self._lock:
+            if self._title is not None:
+                self.conversation.title = self._title
+            store()
+            self._stored = True
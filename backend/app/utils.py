@@ -1,8 +1,9 @@
 import json
 import logging
 import os
+import threading
 from datetime import datetime
-from typing import Literal
+from typing import Any, Callable, Literal
 
 import boto3
 from botocore.client import Config
@@ -27,6 +28,13 @@ PUBLISH_API_CODEBUILD_PROJECT_NAME = os.environ.get(
 USER_POOL_ID = os.environ.get("USER_POOL_ID", "")
 EMBEDDING_STATE_MACHINE_ARN = os.environ.get("EMBEDDING_STATE_MACHINE_ARN")
 
+# Connection pool size of each shared client. Clients are shared by every
+# thread of the process, e.g. the concurrent retrievals and tool calls.
+AWS_CLIENT_MAX_POOL_CONNECTIONS = int(
+    os.environ.get("AWS_CLIENT_MAX_POOL_CONNECTIONS", "32")
+)
+AWS_CLIENT_MAX_ATTEMPTS = int(os.environ.get("AWS_CLIENT_MAX_ATTEMPTS", "5"))
+
 
 def snake_to_camel(snake_str):
     components = snake_str.split("_")
@@ -37,24 +45,125 @@ def is_running_on_lambda():
     return "AWS_EXECUTION_ENV" in os.environ
 
 
+class AwsClientRegistry:
+    """Process-wide registry of boto3 clients.
+
+    Creating a client loads and parses the service model and every client has
+    its own connection pool, so a client per call pays both costs again.
+    Clients are thread-safe, so one client per service, region and endpoint is
+    created on first use and shared for the lifetime of the process.
+    """
+
+    def __init__(
+        self,
+        max_pool_connections: int = AWS_CLIENT_MAX_POOL_CONNECTIONS,
+        max_attempts: int = AWS_CLIENT_MAX_ATTEMPTS,
+    ) -> None:
+        self.default_config = Config(
+            max_pool_connections=max_pool_connections,
+            retries={"total_max_attempts": max_attempts, "mode": "adaptive"},
+            tcp_keepalive=True,
+        )
+        self._clients: dict[tuple, Any] = {}
+        # `boto3.client` uses the default session, which is not thread-safe.
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        service_name: str,
+        region_name: str | None = None,
+        endpoint_url: str | None = None,
+        **config_options,
+    ):
+        """Return the shared client, creating it on first use.
+
+        `config_options` are merged into the default `Config`, and clients
+        with different options are kept apart.
+        """
+        key = (
+            service_name,
+            region_name,
+            endpoint_url,
+            repr(sorted(config_options.items())),
+        )
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = boto3.client(  # type: ignore[call-overload]
+                    service_name,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=self.default_config.merge(Config(**config_options)),
+                )
+                self._clients[key] = client
+
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+aws_client_registry = AwsClientRegistry()
+
+
+def get_aws_client(
+    service_name: str,
+    region_name: str | None = None,
+    endpoint_url: str | None = None,
+    **config_options,
+):
+    """Return the process-wide client of the service. See `AwsClientRegistry`."""
+    return aws_client_registry.get(
+        service_name,
+        region_name=region_name,
+        endpoint_url=endpoint_url,
+        **config_options,
+    )
+
+
+class LazyClient:
+    """Proxy to a client created by `factory` on first attribute access.
+
+    Lets modules keep their module-level clients without creating them, and
+    loading the service models, at import time.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+
+        return self._client
+
+    def __getattr__(self, name: str):
+        return getattr(self._get_client(), name)
+
+
 def get_bedrock_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock", region_name=region)
-    return client
+    return get_aws_client("bedrock", region_name=region)
 
 
 def get_bedrock_runtime_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock-runtime", region_name=region)
-    return client
+    return get_aws_client("bedrock-runtime", region_name=region)
 
 
 def get_bedrock_agent_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock-agent", region_name=region)
-    return client
+    return get_aws_client("bedrock-agent", region_name=region)
 
 
 def get_bedrock_agent_runtime_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock-agent-runtime", region_name=region)
-    return client
+    return get_aws_client("bedrock-agent-runtime", region_name=region)
 
 
 def get_current_time():
@@ -70,10 +179,11 @@ def generate_presigned_url(
     client_method: Literal["put_object", "get_object"] = "put_object",
 ) -> str:
     # See: https://github.com/boto/boto3/issues/421#issuecomment-1849066655
-    client = boto3.client(
+    client = get_aws_client(
         "s3",
         region_name=BEDROCK_REGION,
-        config=Config(signature_version="v4", s3={"addressing_style": "path"}),
+        signature_version="v4",
+        s3={"addressing_style": "path"},
     )
     params = {"Bucket": bucket, "Key": key}
     if content_type:
@@ -108,7 +218,7 @@ def compose_upload_document_s3_path(user_id: str, bot_id: str, filename: str) ->
 
 
 def delete_file_from_s3(bucket: str, key: str, ignore_not_exist: bool = False):
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_aws_client("s3", region_name=BEDROCK_REGION)
 
     # Check if the file exists
     if not ignore_not_exist:
@@ -126,7 +236,7 @@ def delete_file_from_s3(bucket: str, key: str, ignore_not_exist: bool = False):
 
 def delete_files_with_prefix_from_s3(bucket: str, prefix: str):
     """Delete all objects with the given prefix from the given bucket."""
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_aws_client("s3", region_name=BEDROCK_REGION)
     response = client.list_objects_v2(Bucket=bucket, Prefix=prefix)
 
     if "Contents" not in response:
@@ -137,7 +247,7 @@ def delete_files_with_prefix_from_s3(bucket: str, prefix: str):
 
 
 def check_if_file_exists_in_s3(bucket: str, key: str):
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_aws_client("s3", region_name=BEDROCK_REGION)
 
     # Check if the file exists
     try:
@@ -152,7 +262,7 @@ def check_if_file_exists_in_s3(bucket: str, key: str):
 
 
 def move_file_in_s3(bucket: str, key: str, new_key: str):
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_aws_client("s3", region_name=BEDROCK_REGION)
 
     # Check if the file exists
     try:
@@ -174,7 +284,7 @@ def start_codebuild_project(environment_variables: dict) -> str:
     environment_variables_override = [
         {"name": key, "value": value} for key, value in environment_variables.items()
     ]
-    client = boto3.client("codebuild")
+    client = get_aws_client("codebuild")
     response = client.start_build(
         projectName=PUBLISH_API_CODEBUILD_PROJECT_NAME,
         environmentVariablesOverride=environment_variables_override,
@@ -184,7 +294,7 @@ def start_codebuild_project(environment_variables: dict) -> str:
 
 def get_user_cognito_groups(user: User, user_pool_id: str = USER_POOL_ID) -> list[str]:
     """Retrieve the groups that a Cognito user belongs to."""
-    client = boto3.client("cognito-idp")
+    client = get_aws_client("cognito-idp")
 
     try:
         response = client.admin_list_groups_for_user(
@@ -221,7 +331,7 @@ def store_api_key_to_secret_manager(
     secret_value = json.dumps({"api_key": api_key})
 
     try:
-        secrets_client = boto3.client("secretsmanager")
+        secrets_client = get_aws_client("secretsmanager")
         logger.info(f"Attempting to store API key for {secret_name}")
 
         try:
@@ -269,7 +379,7 @@ def get_api_key_from_secret_manager(secret_arn: str) -> str:
         ClientError: If there is an error with Secrets Manager
     """
     try:
-        secrets_client = boto3.client("secretsmanager")
+        secrets_client = get_aws_client("secretsmanager")
         response = secrets_client.get_secret_value(SecretId=secret_arn)
         secret = json.loads(response["SecretString"])
         return secret["api_key"]
@@ -291,7 +401,7 @@ def delete_api_key_from_secret_manager(user_id: str, bot_id: str, prefix: str) -
     secret_name = f"{prefix}/{user_id}/{bot_id}"
 
     try:
-        secrets_client = boto3.client("secretsmanager")
+        secrets_client = get_aws_client("secretsmanager")
         logger.info(f"Attempting to delete API key for {secret_name}")
 
         try:
@@ -333,7 +443,7 @@ def start_embedding_state_machine(
         deleted_filenames (list[str]): Files deleted from the bot.
         sync_shared_knowledge_bases_required (bool): Whether there have been any changes to the shared Knowledge Bases.
     """
-    client = boto3.client("stepfunctions")
+    client = get_aws_client("stepfunctions")
     client.start_execution(
         stateMachineArn=EMBEDDING_STATE_MACHINE_ARN,
         input=json.dumps(
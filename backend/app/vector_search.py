@@ -2,13 +2,17 @@ import logging
 from typing import Any, TypedDict
 from urllib.parse import urlparse
 
-from app.repositories.knowledge_base import get_knowledge_base_info
+from app.repositories.knowledge_base import (
+    get_knowledge_base_info,
+    prefetch_knowledge_base_info,
+)
 from app.repositories.models.conversation import (
     RelatedDocumentModel,
     TextToolResultModel,
 )
 from app.repositories.models.custom_bot import BotModel
-from app.utils import get_bedrock_agent_runtime_client
+from app.retrieval_cache import RetrievalCacheKey, normalize_query, retrieval_cache
+from app.utils import LazyClient, get_bedrock_agent_runtime_client
 from botocore.exceptions import ClientError
 from mypy_boto3_bedrock_agent_runtime.literals import SearchTypeType
 from mypy_boto3_bedrock_agent_runtime.type_defs import (
@@ -19,7 +23,7 @@ from mypy_boto3_bedrock_agent_runtime.type_defs import (
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-agent_client = get_bedrock_agent_runtime_client()
+agent_client = LazyClient(get_bedrock_agent_runtime_client)
 
 
 class SearchResult(TypedDict):
@@ -47,7 +51,52 @@ def search_result_to_related_document(
     )
 
 
+def _get_knowledge_base_id(bot: BotModel) -> str | None:
+    if bot.bedrock_knowledge_base is None:
+        return None
+
+    # Use exist_knowledge_base_id if available, otherwise use knowledge_base_id
+    return (
+        bot.bedrock_knowledge_base.exist_knowledge_base_id
+        if bot.bedrock_knowledge_base.exist_knowledge_base_id is not None
+        else bot.bedrock_knowledge_base.knowledge_base_id
+    )
+
+
+def warm_knowledge_base_cache(bot: BotModel):
+    """Start loading the knowledge base info of the bot, so that retrievals of
+    the turn do not wait for it."""
+    knowledge_base_id = _get_knowledge_base_id(bot)
+    if knowledge_base_id is not None:
+        prefetch_knowledge_base_info(knowledge_base_id, bot.sync_last_exec_id)
+
+
 def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResult]:
+    assert bot.bedrock_knowledge_base is not None
+    knowledge_base_id = _get_knowledge_base_id(bot)
+    assert knowledge_base_id is not None, "knowledge_base_id must be set"
+
+    key = RetrievalCacheKey(
+        knowledge_base_id=knowledge_base_id,
+        version=bot.sync_last_exec_id,
+        bot_filter=(
+            f"BOT#{bot.id}" if bot.bedrock_knowledge_base.type == "shared" else None
+        ),
+        search_type=bot.bedrock_knowledge_base.search_params.search_type,
+        max_results=bot.bedrock_knowledge_base.search_params.max_results,
+        query=normalize_query(query),
+    )
+    search_results = retrieval_cache.get_or_retrieve(
+        key, lambda: _bedrock_knowledge_base_retrieve(bot, query)
+    )
+    # Results may have been retrieved for another bot using the same knowledge base
+    for search_result in search_results:
+        search_result["bot_id"] = bot.id
+
+    return search_results
+
+
+def _bedrock_knowledge_base_retrieve(bot: BotModel, query: str) -> list[SearchResult]:
     assert bot.bedrock_knowledge_base is not None
     assert (
         bot.bedrock_knowledge_base.knowledge_base_id is not None
@@ -63,12 +112,7 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
         raise ValueError("Invalid search type")
 
     limit = bot.bedrock_knowledge_base.search_params.max_results
-    # Use exist_knowledge_base_id if available, otherwise use knowledge_base_id
-    knowledge_base_id = (
-        bot.bedrock_knowledge_base.exist_knowledge_base_id
-        if bot.bedrock_knowledge_base.exist_knowledge_base_id is not None
-        else bot.bedrock_knowledge_base.knowledge_base_id
-    )
+    knowledge_base_id = _get_knowledge_base_id(bot)
     assert knowledge_base_id is not None, "knowledge_base_id must be set"
 
     try:
@@ -107,8 +151,10 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
                 del target_parameter["overrideSearchType"]
 
         # Get Knowledge Base from Bedrock Agent API :: get_knowledge_base
+        # Cached until the bot's knowledge base is synchronized again
         knowledge_base_info = get_knowledge_base_info(
-            knowledge_base_id=knowledge_base_id
+            knowledge_base_id=knowledge_base_id,
+            version=bot.sync_last_exec_id,
         )
         # Check the knowledge base resource type
         if (
@@ -1,100 +1,343 @@
 import json
 import logging
 import os
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import Decimal as decimal
-from queue import SimpleQueue
-from threading import Thread
-from typing import BinaryIO, Literal, TypedDict
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Semaphore, Thread
+from typing import TYPE_CHECKING, Literal, TypedDict
 
 import boto3
-from app.agents.tools.agent_tool import ToolRunResult
 from app.auth import verify_token
-from app.repositories.conversation import RecordNotFoundError
+from app.background import drain_background_tasks
+from app.repositories.common import RecordNotFoundError
 from app.routes.schemas.conversation import ChatInput
-from app.stream import OnStopInput, OnThinking
-from app.usecases.chat import chat
 from app.user import User
-from boto3.dynamodb.conditions import Attr, Key
+from app.utils import LazyClient, get_aws_client
+
+if TYPE_CHECKING:
+    # The chat use case and its model, tool and search dependencies are only
+    # imported once a full message arrives, so that connection and message
+    # part events do not pay for them on a cold start.
+    from app.agents.tools.agent_tool import ToolRunResult
+    from app.stream import OnStopInput, OnThinking
 
 WEBSOCKET_SESSION_TABLE_NAME = os.environ["WEBSOCKET_SESSION_TABLE_NAME"]
 
-dynamodb_client = boto3.resource("dynamodb")
-table = dynamodb_client.Table(WEBSOCKET_SESSION_TABLE_NAME)
+table = LazyClient(
+    lambda: boto3.resource("dynamodb").Table(WEBSOCKET_SESSION_TABLE_NAME)
+)
+# Low-level client returning attribute values as is, used to read message parts
+# without deserializing them.
+dynamodb_raw_client = LazyClient(lambda: get_aws_client("dynamodb"))
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Consecutive streamed tokens are merged into one frame, which is sent once it
+# has been pending for this long or reaches the size limit. With 0, only tokens
+# already waiting in the queue are merged.
+STREAM_FLUSH_INTERVAL_MS = int(os.environ.get("STREAM_FLUSH_INTERVAL_MS", "40"))
+# API Gateway (websocket) has hard limit of 32KB per frame. Keep headroom for
+# the rest of the payload.
+STREAM_FRAME_MAX_BYTES = 30 * 1024
+# Frames posted concurrently to a connection. The client restores the order
+# from the `seq` attribute of each frame.
+WEBSOCKET_MAX_IN_FLIGHT = int(os.environ.get("WEBSOCKET_MAX_IN_FLIGHT", "4"))
+# The model stream is blocked while this many notifications wait to be sent.
+WEBSOCKET_MAX_QUEUED = int(os.environ.get("WEBSOCKET_MAX_QUEUED", "1024"))
+# Maximum time to wait for queued notifications once the handler is done.
+WEBSOCKET_DRAIN_TIMEOUT = 10
+# Attempts to post a frame before it is dropped. The client skips a missing
+# frame after a while, but retrying keeps the answer complete.
+WEBSOCKET_SEND_ATTEMPTS = int(os.environ.get("WEBSOCKET_SEND_ATTEMPTS", "3"))
+WEBSOCKET_SEND_BACKOFF = 0.1
+
+
+def get_gatewayapi_client(endpoint_url: str):
+    # Shared per endpoint so that connections are kept alive across invocations.
+    return get_aws_client(
+        "apigatewaymanagementapi",
+        endpoint_url=endpoint_url,
+        max_pool_connections=WEBSOCKET_MAX_IN_FLIGHT,
+        # Failed frames are retried by `NotificationSender._post` alone, so the
+        # frames behind one wait for at most `WEBSOCKET_SEND_ATTEMPTS` attempts
+        retries={"mode": "standard", "total_max_attempts": 1},
+    )
+
 
 class _NotifyCommand(TypedDict):
     type: Literal["notify"]
-    payload: bytes | BinaryIO
+    payload: dict
+
+
+class _StreamCommand(TypedDict):
+    type: Literal["stream"]
+    status: Literal["STREAMING", "REASONING"]
+    token: str
 
 
 class _FinishCommand(TypedDict):
     type: Literal["finish"]
 
 
-_Command = _NotifyCommand | _FinishCommand
+_Command = _NotifyCommand | _StreamCommand | _FinishCommand
 
 
-class NotificationSender:
-    def __init__(self, endpoint_url: str, connection_id: str) -> None:
-        self.commands = SimpleQueue[_Command]()
-        self.endpoint_url = endpoint_url
-        self.connection_id = connection_id
+@dataclass
+class _PendingFrame:
+    status: Literal["STREAMING", "REASONING"]
+    deadline: float
+    tokens: list[str] = field(default_factory=list)
+    # Size of the tokens once JSON-encoded
+    size: int = 0
 
-    def run(self):
-        import boto3
-
-        gatewayapi = boto3.client(
-            "apigatewaymanagementapi",
-            endpoint_url=self.endpoint_url,
+    def to_payload(self) -> dict:
+        return dict(
+            status=self.status,
+            completion="".join(self.tokens),
         )
 
-        while True:
-            command = self.commands.get()
-            if command["type"] == "notify":
+
+@dataclass
+class DeliveryStats:
+    frame_count: int = 0
+    byte_count: int = 0
+    token_count: int = 0
+    max_queue_depth: int = 0
+    send_latency_total: float = 0.0
+    send_latency_max: float = 0.0
+
+    @property
+    def send_latency_mean(self) -> float:
+        return self.send_latency_total / self.frame_count if self.frame_count else 0.0
+
+
+class NotificationSender:
+    """Delivers notifications to a WebSocket connection from a background thread.
+
+    The thread is started by the first notification. Frames are numbered with
+    `seq` and up to `max_in_flight` of them are posted concurrently.
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        connection_id: str,
+        flush_interval_ms: int = STREAM_FLUSH_INTERVAL_MS,
+        max_in_flight: int = WEBSOCKET_MAX_IN_FLIGHT,
+        max_queued: int = WEBSOCKET_MAX_QUEUED,
+    ) -> None:
+        self.commands = Queue[_Command](maxsize=max_queued)
+        self.endpoint_url = endpoint_url
+        self.connection_id = connection_id
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.stats = DeliveryStats()
+        # Set once the chat input is known, for reporting
+        self.conversation_id: str | None = None
+
+        self._seq = 0
+        self._in_flight = Semaphore(max_in_flight)
+        self._stats_lock = Lock()
+        # Set when the connection is no longer usable
+        self._closed = Event()
+        self._thread: Thread | None = None
+        self._thread_lock = Lock()
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = Thread(target=self.run, daemon=True)
+                self._thread.start()
+
+    def wait(self, timeout: float = WEBSOCKET_DRAIN_TIMEOUT):
+        """Wait for the queued notifications to be delivered after `finish`."""
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _post(self, gatewayapi, payload: bytes):
+        started = time.monotonic()
+        try:
+            for attempt in range(WEBSOCKET_SEND_ATTEMPTS):
                 try:
                     logger.debug(
-                        f"[WEBSOCKET_SEND] Sending to connection {self.connection_id}: {command['payload'][:200]}..."
+                        f"[WEBSOCKET_SEND] Sending to connection {self.connection_id}: {payload[:200]!r}..."
                     )
                     gatewayapi.post_to_connection(
                         ConnectionId=self.connection_id,
-                        Data=command["payload"],
+                        Data=payload,
                     )
                     logger.debug(
                         f"[WEBSOCKET_SEND] Successfully sent to connection {self.connection_id}"
                     )
+                    break
 
                 except (
                     gatewayapi.exceptions.GoneException,
                     gatewayapi.exceptions.ForbiddenException,
-                ) as e:
-                    logger.exception(
-                        f"Shutdown the notification sender due to an exception: {e}"
+                ):
+                    raise
+
+                except Exception as e:
+                    if attempt + 1 >= WEBSOCKET_SEND_ATTEMPTS or self._closed.is_set():
+                        raise
+
+                    logger.warning(
+                        f"Failed to send notification (attempt {attempt + 1}), retrying: {e}"
+                    )
+                    # Bounded backoff; the frames behind wait for this one
+                    time.sleep(WEBSOCKET_SEND_BACKOFF * 2**attempt)
+
+            latency = time.monotonic() - started
+            with self._stats_lock:
+                self.stats.frame_count += 1
+                self.stats.byte_count += len(payload)
+                self.stats.send_latency_total += latency
+                self.stats.send_latency_max = max(self.stats.send_latency_max, latency)
+
+        except (
+            gatewayapi.exceptions.GoneException,
+            gatewayapi.exceptions.ForbiddenException,
+        ) as e:
+            logger.exception(
+                f"Shutdown the notification sender due to an exception: {e}"
+            )
+            self._closed.set()
+
+        except Exception as e:
+            # The client skips the missing `seq` after a while
+            logger.exception(f"Failed to send notification: {e}")
+
+        finally:
+            self._in_flight.release()
+
+    def _send(self, gatewayapi, executor: ThreadPoolExecutor, payload: dict) -> bool:
+        """Post a frame in the background. Returns False if the connection is closed."""
+        # Bound the frames in flight. Waiting here lets the queue grow, which
+        # in turn blocks the producers.
+        self._in_flight.acquire()
+        if self._closed.is_set():
+            self._in_flight.release()
+            return False
+
+        data = json.dumps({**payload, "seq": self._seq}).encode("utf-8")
+        self._seq += 1
+        executor.submit(self._post, gatewayapi, data)
+        return True
+
+    def run(self):
+        gatewayapi = get_gatewayapi_client(self.endpoint_url)
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight,
+            thread_name_prefix="websocket-send",
+        )
+
+        pending: _PendingFrame | None = None
+        while not self._closed.is_set():
+            try:
+                command = self.commands.get(
+                    timeout=(
+                        max(pending.deadline - time.monotonic(), 0)
+                        if pending is not None
+                        else None
                     )
+                )
+            except Empty:
+                # Time budget of the pending frame is exhausted
+                assert pending is not None
+                if not self._send(gatewayapi, executor, pending.to_payload()):
                     break
+                pending = None
+                continue
 
-                except Exception as e:
-                    logger.exception(f"Failed to send notification: {e}")
+            self.stats.max_queue_depth = max(
+                self.stats.max_queue_depth, self.commands.qsize() + 1
+            )
+
+            if command["type"] == "stream":
+                self.stats.token_count += 1
+                size = len(json.dumps(command["token"])) - 2
+                if (
+                    pending is not None
+                    and pending.status == command["status"]
+                    and pending.size + size <= STREAM_FRAME_MAX_BYTES
+                ):
+                    pending.tokens.append(command["token"])
+                    pending.size += size
+                    continue
+
+                # Status changed or frame is full
+                if pending is not None and not self._send(
+                    gatewayapi, executor, pending.to_payload()
+                ):
+                    break
+                pending = _PendingFrame(
+                    status=command["status"],
+                    deadline=time.monotonic() + self.flush_interval,
+                    tokens=[command["token"]],
+                    size=size,
+                )
+                continue
+
+            # Keep the order of messages: flush streamed tokens first
+            if pending is not None:
+                if not self._send(gatewayapi, executor, pending.to_payload()):
+                    break
+                pending = None
+
+            if command["type"] == "notify":
+                if not self._send(gatewayapi, executor, command["payload"]):
+                    break
 
             elif command["type"] == "finish":
                 break
 
-    def finish(self):
-        self.commands.put(
-            {
-                "type": "finish",
-            }
+        executor.shutdown(wait=True)
+        logger.info(
+            f"Delivered conversation {self.conversation_id} to connection {self.connection_id}: "
+            f"{self.stats.frame_count} frames, {self.stats.byte_count} bytes, "
+            f"{self.stats.token_count} streamed tokens, "
+            f"max queue depth {self.stats.max_queue_depth}, "
+            f"send latency mean {self.stats.send_latency_mean * 1000:.1f}ms "
+            f"/ max {self.stats.send_latency_max * 1000:.1f}ms"
         )
 
-    def notify(self, payload: bytes | BinaryIO):
-        logger.debug(
-            f"[WEBSOCKET_NOTIFY] Adding payload to queue: {len(str(payload))} chars"
-        )
-        self.commands.put(
+    def _put(self, command: _Command):
+        self.start()
+        # Block the producer while the queue is full, unless nothing will drain it
+        while not self._closed.is_set():
+            try:
+                self.commands.put(command, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def finish(self):
+        if self._thread is None:
+            # Nothing was notified
+            return
+
+        try:
+            # Queued even if the connection is closed, to wake up the sender
+            self.commands.put(
+                {
+                    "type": "finish",
+                },
+                block=not self._closed.is_set(),
+                timeout=WEBSOCKET_DRAIN_TIMEOUT,
+            )
+        except Full:
+            # The sender is still busy or stopped; `wait` bounds the rest
+            pass
+
+    def notify(self, payload: dict):
+        logger.debug(f"[WEBSOCKET_NOTIFY] Adding payload to queue: {payload['status']}")
+        self._put(
             {
                 "type": "notify",
                 "payload": payload,
@@ -102,91 +345,107 @@ class NotificationSender:
         )
         logger.debug(f"[WEBSOCKET_NOTIFY] Payload added to queue successfully")
 
+    def stream(self, status: Literal["STREAMING", "REASONING"], token: str):
+        """Queue a streamed token, to be merged with consecutive tokens of the same status."""
+        self._put(
+            {
+                "type": "stream",
+                "status": status,
+                "token": token,
+            }
+        )
+
     def on_stream(self, token: str):
         # Send completion
-        payload = json.dumps(
-            dict(
-                status="STREAMING",
-                completion=token,
-            )
-        ).encode("utf-8")
-
-        self.notify(payload=payload)
+        self.stream(status="STREAMING", token=token)
 
-    def on_stop(self, arg: OnStopInput):
+    def on_stop(self, arg: "OnStopInput"):
         logger.debug(f"[WEBSOCKET_ON_STOP] WebSocket on_stop called with: {arg}")
-        payload = json.dumps(
-            dict(
-                status="STREAMING_END",
-                completion="",
-                stop_reason=arg["stop_reason"],
-                token_count=dict(
-                    input=arg["input_token_count"],
-                    output=arg["output_token_count"],
-                    cache_read_input=arg["cache_read_input_count"],
-                    cache_write_input=arg["cache_write_input_count"],
-                ),
-                price=arg["price"],
-            )
-        ).encode("utf-8")
-
-        logger.debug(
-            f"[WEBSOCKET_ON_STOP] Sending STREAMING_END payload: {payload.decode('utf-8')}"
+        payload = dict(
+            status="STREAMING_END",
+            completion="",
+            stop_reason=arg["stop_reason"],
+            token_count=dict(
+                input=arg["input_token_count"],
+                output=arg["output_token_count"],
+                cache_read_input=arg["cache_read_input_count"],
+                cache_write_input=arg["cache_write_input_count"],
+            ),
+            price=arg["price"],
         )
+
+        logger.debug(f"[WEBSOCKET_ON_STOP] Sending STREAMING_END payload: {payload}")
         self.notify(payload=payload)
         logger.debug(f"[WEBSOCKET_ON_STOP] STREAMING_END payload sent successfully")
 
-    def on_agent_thinking(self, tool_use: OnThinking):
-        payload = json.dumps(
-            dict(
-                status="AGENT_THINKING",
-                log={
-                    tool_use["tool_use_id"]: {
-                        "name": tool_use["name"],
-                        "input": tool_use["input"],
-                    },
+    def on_agent_thinking(self, tool_use: "OnThinking"):
+        payload = dict(
+            status="AGENT_THINKING",
+            log={
+                tool_use["tool_use_id"]: {
+                    "name": tool_use["name"],
+                    "input": tool_use["input"],
                 },
-            )
-        ).encode("utf-8")
+            },
+        )
 
         self.notify(payload=payload)
 
-    def on_agent_tool_result(self, run_result: ToolRunResult):
+    def on_agent_tool_result(self, run_result: "ToolRunResult"):
         self.notify(
-            payload=json.dumps(
-                dict(
-                    status="AGENT_TOOL_RESULT",
-                    result={
-                        "toolUseId": run_result["tool_use_id"],
-                        "status": run_result["status"],
-                    },
-                )
-            ).encode("utf-8")
+            payload=dict(
+                status="AGENT_TOOL_RESULT",
+                result={
+                    "toolUseId": run_result["tool_use_id"],
+                    "status": run_result["status"],
+                },
+            )
         )
 
         for related_document in run_result["related_documents"]:
             self.notify(
-                payload=json.dumps(
-                    dict(
-                        status="AGENT_RELATED_DOCUMENT",
-                        result={
-                            "toolUseId": run_result["tool_use_id"],
-                            "relatedDocument": related_document.to_schema().model_dump(
-                                by_alias=True
-                            ),
-                        },
-                    )
-                ).encode("utf-8")
+                payload=dict(
+                    status="AGENT_RELATED_DOCUMENT",
+                    result={
+                        "toolUseId": run_result["tool_use_id"],
+                        "relatedDocument": related_document.to_schema().model_dump(
+                            by_alias=True
+                        ),
+                    },
+                )
             )
 
     def on_reasoning(self, token: str):
-        payload = json.dumps(
-            dict(
-                status="REASONING",
-                completion=token,
-            )
-        ).encode("utf-8")
-        self.notify(payload=payload)
+        self.stream(status="REASONING", token=token)
+
+
+def concatenate_message_parts(connection_id: str) -> str:
+    """Concatenate the message parts stored for the connection.
+
+    The session item (`MessagePartId` 0) and all parts are read in a single
+    paginated query, already in part order. Part strings are taken from the
+    raw response instead of deserializing every item.
+    """
+    paginator = dynamodb_raw_client.get_paginator("query")
+    session_started = False
+    message_parts: list[str] = []
+    for page in paginator.paginate(
+        TableName=WEBSOCKET_SESSION_TABLE_NAME,
+        KeyConditionExpression="ConnectionId = :connection_id",
+        ExpressionAttributeValues={":connection_id": {"S": connection_id}},
+        ProjectionExpression="MessagePart, UserId",
+    ):
+        for item in page["Items"]:
+            if "MessagePart" in item:
+                message_parts.append(item["MessagePart"]["S"])
+            elif "UserId" in item:
+                session_started = True
+
+    if not session_started:
+        raise ValueError(f"No session found for connection: {connection_id}")
+
+    logger.info(f"Number of message chunks: {len(message_parts)}")
+    return "".join(message_parts)
 
 
 def process_chat_input(
@@ -195,7 +454,10 @@ def process_chat_input(
     notificator: NotificationSender,
 ) -> dict:
     """Process chat input and send the message to the client."""
+    from app.usecases.chat import chat
+
     logger.info(f"Received chat input: {chat_input}")
+    notificator.conversation_id = chat_input.conversation_id
 
     try:
         chat(
@@ -214,6 +476,7 @@ def process_chat_input(
             on_reasoning=lambda token: notificator.on_reasoning(
                 token=token,
             ),
+            generate_conversation_title=True,
         )
 
         return {"statusCode": 200, "body": "Message sent."}
@@ -277,11 +540,6 @@ def handler(event, context):
     step = body.get("step")
     token = body.get("token")
 
-    notification_thread = Thread(
-        target=lambda: notificator.run(),
-        daemon=True,
-    )
-    notification_thread.start()
     try:
         # API Gateway (websocket) has hard limit of 32KB per message, so if the message is larger than that,
         # need to concatenate chunks and send as a single full message.
@@ -326,41 +584,7 @@ def handler(event, context):
             decoded = verify_token(token)
             user = User.from_decoded_token(decoded)
 
-            # Retrieve user id
-            response = table.query(
-                KeyConditionExpression=Key("ConnectionId").eq(connection_id),
-                FilterExpression=Attr("UserId").exists(),
-            )
-            user_id = response["Items"][0]["UserId"]
-
-            # Concatenate the message parts
-            message_parts = []
-            last_evaluated_key = None
-
-            while True:
-                if last_evaluated_key:
-                    response = table.query(
-                        KeyConditionExpression=Key("ConnectionId").eq(connection_id)
-                        # Zero is reserved for user id, so start from 1
-                        & Key("MessagePartId").gte(1),
-                        ExclusiveStartKey=last_evaluated_key,
-                    )
-                else:
-                    response = table.query(
-                        KeyConditionExpression=Key("ConnectionId").eq(connection_id)
-                        & Key("MessagePartId").gte(1),
-                    )
-
-                message_parts.extend(response["Items"])
-
-                if "LastEvaluatedKey" in response:
-                    last_evaluated_key = response["LastEvaluatedKey"]
-                else:
-                    break
-
-            logger.info(f"Number of message chunks: {len(message_parts)}")
-            message_parts.sort(key=lambda x: x["MessagePartId"])
-            full_message = "".join(item["MessagePart"] for item in message_parts)
+            full_message = concatenate_message_parts(connection_id)
 
             # Process the concatenated full message
             chat_input = ChatInput(**json.loads(full_message))
@@ -400,5 +624,9 @@ def handler(event, context):
         }
 
     finally:
+        # Only waits if something was notified, and no longer than the
+        # remaining frames take to deliver.
         notificator.finish()
-        notification_thread.join(timeout=60)
+        notificator.wait()
+        # Post-turn bookkeeping must finish before Lambda freezes the environment
+        drain_background_tasks()
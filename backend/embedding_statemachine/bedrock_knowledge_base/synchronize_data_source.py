@@ -2,6 +2,7 @@ import os
 from itertools import islice
 from typing import TypedDict
 
+from app.retrieval_cache import invalidate_retrieval_cache
 from app.utils import (
     compose_upload_document_s3_path,
     get_bedrock_agent_client,
@@ -250,6 +251,7 @@ def handle_check(event):
                     case _:
                         raise Exception(f"File '{uri}': Bad status '{status}'.")
 
+        invalidate_retrieval_cache(knowledge_base_id)
         return
 
     else:
@@ -264,7 +266,9 @@ def handle_check(event):
             status = get_job_response["ingestionJob"]["status"]
             match status:
                 case "COMPLETE":
-                    pass
+                    # Takes effect in chat handlers when RETRIEVAL_CACHE_BACKEND
+                    # is shared; otherwise the bot's LastExecId changes anyway.
+                    invalidate_retrieval_cache(knowledge_base_id)
 
                 case "STARTING" | "IN_PROGRESS":
                     raise RetryException()
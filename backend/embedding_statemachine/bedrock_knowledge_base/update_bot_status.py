@@ -3,6 +3,7 @@ from typing import TypedDict
 
 from app.repositories.common import compose_sk, get_bot_table_client
 from app.routes.schemas.bot import type_sync_status
+from app.utils import get_current_time
 from reretry import retry
 
 RETRIES_TO_UPDATE_SYNC_STATUS = 4
@@ -25,11 +26,13 @@ def update_sync_status(sync_status: SyncStatus):
             "PK": sync_status["user_id"],
             "SK": compose_sk(sync_status["bot_id"], "bot"),
         },
-        UpdateExpression="SET SyncStatus = :sync_status, SyncStatusReason = :sync_status_reason, LastExecId = :last_exec_id",
+        # `LastModified` tells the chat handlers to reload their cached bot.
+        UpdateExpression="SET SyncStatus = :sync_status, SyncStatusReason = :sync_status_reason, LastExecId = :last_exec_id, LastModified = :last_modified",
         ExpressionAttributeValues={
             ":sync_status": sync_status["status"],
             ":sync_status_reason": sync_status["reason"],
             ":last_exec_id": sync_status["last_exec_id"],
+            ":last_modified": get_current_time(),
         },
     )
 
@@ -0,0 +1,117 @@
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app import auth
+from app.auth import JwksCache, verify_token
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from jose.exceptions import ExpiredSignatureError
+
+
+def _generate_key(kid: str) -> tuple[str, dict]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, algorithm="RS256").to_dict()
+    public_jwk["kid"] = kid
+    return private_pem, public_jwk
+
+
+def _jwks_response(keys: list[dict]) -> MagicMock:
+    response = MagicMock()
+    response.json.return_value = {"keys": keys}
+    return response
+
+
+class TestVerifyToken(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.private_key1, cls.public_key1 = _generate_key("kid1")
+        cls.private_key2, cls.public_key2 = _generate_key("kid2")
+
+    def setUp(self):
+        self.patcher_get = patch("app.auth.requests.get")
+        self.mock_get = self.patcher_get.start()
+        self.mock_get.return_value = _jwks_response([self.public_key1])
+        self.patcher_cache = patch.object(auth, "jwks_cache", JwksCache("https://jwks"))
+        self.patcher_cache.start()
+        auth.decoded_token_cache.clear()
+
+    def tearDown(self):
+        self.patcher_get.stop()
+        self.patcher_cache.stop()
+
+    def _token(self, private_key: str, kid: str, expires_in: int = 3600, sub="user1"):
+        return jwt.encode(
+            {"sub": sub, "aud": auth.CLIENT_ID, "exp": int(time.time()) + expires_in},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+
+    def test_keys_and_claims_are_cached(self):
+        token1 = self._token(self.private_key1, "kid1", sub="user1")
+        token2 = self._token(self.private_key1, "kid1", sub="user2")
+
+        self.assertEqual(verify_token(token1)["sub"], "user1")
+        self.assertEqual(verify_token(token1)["sub"], "user1")
+        self.assertEqual(verify_token(token2)["sub"], "user2")
+
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertEqual(auth.decoded_token_cache.stats.hits, 1)
+
+    def test_unknown_kid_triggers_refetch(self):
+        verify_token(self._token(self.private_key1, "kid1"))
+        # Simulate key rotation
+        self.mock_get.return_value = _jwks_response(
+            [self.public_key1, self.public_key2]
+        )
+        auth.jwks_cache._fetched_at -= auth.JWKS_MIN_REFETCH_INTERVAL + 1
+
+        decoded = verify_token(self._token(self.private_key2, "kid2"))
+        self.assertEqual(decoded["sub"], "user1")
+        self.assertEqual(self.mock_get.call_count, 2)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        verify_token(self._token(self.private_key1, "kid1"))
+        with self.assertRaises(IndexError):
+            verify_token(self._token(self.private_key2, "kid2"))
+
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_concurrent_first_fetch_is_single_flight(self):
+        def slow_get(*args, **kwargs):
+            time.sleep(0.05)
+            return _jwks_response([self.public_key1])
+
+        self.mock_get.side_effect = slow_get
+        tokens = [self._token(self.private_key1, "kid1", sub=f"u{i}") for i in range(5)]
+        threads = [threading.Thread(target=verify_token, args=(t,)) for t in tokens]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_expired_token_is_rejected(self):
+        with self.assertRaises(ExpiredSignatureError):
+            verify_token(self._token(self.private_key1, "kid1", expires_in=-10))
+
+        self.assertEqual(len(auth.decoded_token_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, ".")
+from app.background import BackgroundTasks
+
+
+class TestBackgroundTasks(unittest.TestCase):
+    def test_submit_and_drain(self):
+        tasks = BackgroundTasks(max_workers=2)
+        results = []
+        for i in range(5):
+            tasks.submit(f"task{i}", lambda i=i: results.append(i))
+
+        self.assertTrue(tasks.drain(timeout=5))
+        self.assertEqual(sorted(results), list(range(5)))
+
+    def test_drain_without_tasks(self):
+        tasks = BackgroundTasks()
+        self.assertTrue(tasks.drain(timeout=0))
+
+    def test_drain_hook(self):
+        tasks = BackgroundTasks()
+        calls = []
+        tasks.on_drain("hook", lambda: calls.append(1))
+
+        self.assertTrue(tasks.drain(timeout=5))
+        self.assertTrue(tasks.drain(timeout=5))
+        self.assertEqual(calls, [1, 1])
+
+    def test_exception_is_logged(self):
+        tasks = BackgroundTasks()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with self.assertLogs("app.background", level="ERROR") as logs:
+            tasks.submit("fail", fail)
+            self.assertTrue(tasks.drain(timeout=5))
+        self.assertIn("Background task fail failed: boom", logs.output[0])
+
+    def test_run_inline_when_saturated(self):
+        tasks = BackgroundTasks(max_workers=1, max_pending=1)
+        release = threading.Event()
+        caller = threading.current_thread()
+        ran_in = []
+
+        tasks.submit("blocking", lambda: release.wait(timeout=5))
+        tasks.submit("inline", lambda: ran_in.append(threading.current_thread()))
+
+        self.assertEqual(ran_in, [caller])
+        release.set()
+        self.assertTrue(tasks.drain(timeout=5))
+
+    def test_drain_timeout(self):
+        tasks = BackgroundTasks(max_workers=1)
+        release = threading.Event()
+        tasks.submit("blocking", lambda: release.wait(timeout=5))
+
+        self.assertFalse(tasks.drain(timeout=0.05))
+        release.set()
+        self.assertTrue(tasks.drain(timeout=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
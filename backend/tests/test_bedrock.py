@@ -15,11 +15,27 @@ import unittest
 from pprint import pprint
 from unittest.mock import patch
 
-from app.bedrock import call_converse_api, compose_args_for_converse_api, get_model_id
-from app.repositories.models.conversation import SimpleMessageModel, TextContentModel
+from app.bedrock import (
+    PROMPT_CACHE_MAX_POINTS,
+    call_converse_api,
+    calculate_price,
+    compose_args_for_converse_api,
+    get_model_id,
+)
+from app.repositories.models.conversation import (
+    SimpleMessageModel,
+    TextContentModel,
+    TextToolResultModel,
+    TokenUsageModel,
+    ToolResultContentModel,
+    ToolResultContentModelBody,
+)
 from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
 from app.routes.schemas.conversation import type_model_name
 
+sys.path.append("tests")
+from test_repositories.utils.conversation_factory import create_test_text_message
+
 # MODEL: type_model_name = "claude-v3-haiku"
 MODEL: type_model_name = "claude-v3.7-sonnet"
 
@@ -285,5 +301,95 @@ class TestCallConverseApiWithGuardrails(unittest.TestCase):
         pprint(response)
 
 
+def _cache_points(blocks: list) -> int:
+    return sum(1 for block in blocks if "cachePoint" in block)
+
+
+class TestPromptCachePoints(unittest.TestCase):
+    def _compose(self, messages: list[SimpleMessageModel], **kwargs):
+        return compose_args_for_converse_api(
+            messages, MODEL, stream=False, prompt_caching_enabled=True, **kwargs
+        )
+
+    def test_consecutive_turns_reuse_history(self):
+        messages = [create_test_text_message("user", "question " * 1000)]
+        args = self._compose(messages)
+        self.assertEqual(_cache_points(args["messages"][0]["content"]), 1)
+
+        # The next turn reads the history up to the previous question
+        messages += [
+            create_test_text_message("assistant", "answer " * 1000),
+            create_test_text_message("user", "next question"),
+        ]
+        args = self._compose(messages)
+        self.assertEqual(
+            [_cache_points(message["content"]) for message in args["messages"]],
+            [1, 0, 1],
+        )
+
+    def test_short_prefix_is_not_cached(self):
+        args = self._compose(
+            [create_test_text_message("user", "Hello, World!")],
+            instructions=["Answer briefly."],
+        )
+        self.assertEqual(_cache_points(args["system"]), 0)
+        self.assertEqual(_cache_points(args["messages"][0]["content"]), 0)
+
+    def test_tool_results_are_not_turns(self):
+        tool_result = SimpleMessageModel(
+            role="user",
+            content=[
+                ToolResultContentModel(
+                    content_type="toolResult",
+                    body=ToolResultContentModelBody(
+                        tool_use_id="tool-1",
+                        content=[TextToolResultModel(text="result " * 1000)],
+                        status="success",
+                    ),
+                )
+            ],
+        )
+        args = self._compose(
+            [
+                create_test_text_message("user", "question " * 1000),
+                tool_result,
+                create_test_text_message("assistant", "answer"),
+                create_test_text_message("user", "next question"),
+            ]
+        )
+        self.assertEqual(
+            [_cache_points(message["content"]) for message in args["messages"]],
+            [1, 0, 0, 1],
+        )
+
+    def test_points_within_limit(self):
+        messages = []
+        for turn in range(10):
+            messages += [
+                create_test_text_message("user", f"question {turn} " * 500),
+                create_test_text_message("assistant", f"answer {turn} " * 500),
+            ]
+        messages.append(create_test_text_message("user", "last question"))
+
+        args = self._compose(messages, instructions=["instruction " * 1000])
+        points = [_cache_points(message["content"]) for message in args["messages"]]
+        self.assertEqual(_cache_points(args["system"]), 1)
+        self.assertEqual(sum(points) + 1, PROMPT_CACHE_MAX_POINTS)
+        # The latest turns get the points
+        self.assertEqual(points[-5:], [1, 0, 1, 0, 1])
+
+    def test_cache_hit_rate(self):
+        usage = TokenUsageModel(
+            input_tokens=100,
+            output_tokens=200,
+            cache_read_input_tokens=3000,
+            cache_write_input_tokens=900,
+            price=calculate_price(MODEL, 100, 200, 3000, 900),
+        )
+        self.assertAlmostEqual(usage.cache_hit_rate, 0.75)
+        # Reading from the cache is cheaper than sending the tokens as input
+        self.assertLess(usage.price, calculate_price(MODEL, 3100, 200, 0, 900))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, ".")
+from app.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 1)
+
+    def test_lru_eviction(self):
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        # Touch "a" so that "b" becomes the least recently used entry
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.peek("b"))
+        self.assertEqual(cache.peek("a"), 1)
+        self.assertEqual(cache.peek("c"), 3)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_expiry(self):
+        cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=0.05)
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_get_or_load_single_flight(self):
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        calls = []
+        started = threading.Event()
+
+        def loader():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return 42
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_load("k", loader))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_get_or_load_value_dependent_ttl(self):
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        self.assertEqual(cache.get_or_load("a", lambda: 1, ttl=lambda v: -1), 1)
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.get_or_load("b", lambda: 2, ttl=lambda v: 60), 2)
+        self.assertIn("b", cache)
+
+    def test_invalidate_where(self):
+        cache: TTLCache[tuple[str, str], int] = TTLCache(max_size=4)
+        cache.put(("kb1", "x"), 1)
+        cache.put(("kb1", "y"), 2)
+        cache.put(("kb2", "x"), 3)
+        self.assertEqual(cache.invalidate_where(lambda key: key[0] == "kb1"), 2)
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, ".")
+
+# Cumulative import time budget of each Lambda entry point, in milliseconds.
+# Set well above the measured time so that only a regression in the import
+# graph, not a slow machine, fails the test. Scale them on slow runners with
+# `IMPORT_TIME_BUDGET_SCALE`.
+IMPORT_TIME_BUDGETS_MS = {
+    "app.main": 2000,
+    "app.websocket": 1000,
+    "app.sqs_consumer": 1500,
+}
+IMPORT_TIME_BUDGET_SCALE = float(os.environ.get("IMPORT_TIME_BUDGET_SCALE", "1"))
+
+# Modules only loaded once they are actually used.
+LAZY_MODULES = ["aiohttp", "duckduckgo_search", "firecrawl", "opensearchpy", "strands"]
+
+
+def _import(module: str, env: dict[str, str] | None = None) -> tuple[float, list[str]]:
+    """Import `module` in a fresh interpreter.
+
+    Returns the cumulative import time in milliseconds reported by
+    `-X importtime` and the names of all loaded modules.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        env={
+            **os.environ,
+            "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+            "WEBSOCKET_SESSION_TABLE_NAME": "test-websocket-session-table",
+            **(env or {}),
+        },
+    )
+    if result.returncode != 0:
+        raise AssertionError(f"Failed to import {module}:\n{result.stderr}")
+
+    # import time: self [us] | cumulative | imported package
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000, json.loads(result.stdout)
+
+    raise AssertionError(f"No import time reported for {module}")
+
+
+class TestImportTime(unittest.TestCase):
+    def assert_within_budget(self, module: str, elapsed_ms: float):
+        budget_ms = IMPORT_TIME_BUDGETS_MS[module] * IMPORT_TIME_BUDGET_SCALE
+        self.assertLessEqual(
+            elapsed_ms,
+            budget_ms,
+            f"Importing {module} took {elapsed_ms:.0f}ms (budget {budget_ms:.0f}ms)",
+        )
+
+    def test_main(self):
+        elapsed_ms, modules = _import("app.main")
+        self.assert_within_budget("app.main", elapsed_ms)
+        self.assertNotIn("app.routes.published_api", modules)
+        for lazy_module in LAZY_MODULES:
+            self.assertNotIn(lazy_module, modules)
+
+    def test_main_published_api(self):
+        elapsed_ms, modules = _import("app.main", env={"PUBLISHED_API_ID": "api"})
+        self.assert_within_budget("app.main", elapsed_ms)
+        # Routers of the main API are not loaded
+        self.assertNotIn("app.routes.bot", modules)
+        self.assertNotIn("app.routes.admin", modules)
+
+    def test_websocket(self):
+        elapsed_ms, modules = _import("app.websocket")
+        self.assert_within_budget("app.websocket", elapsed_ms)
+        # Only needed once a full message arrives
+        self.assertNotIn("app.usecases.chat", modules)
+        for lazy_module in LAZY_MODULES:
+            self.assertNotIn(lazy_module, modules)
+
+    def test_sqs_consumer(self):
+        elapsed_ms, modules = _import("app.sqs_consumer")
+        self.assert_within_budget("app.sqs_consumer", elapsed_ms)
+        for lazy_module in LAZY_MODULES:
+            self.assertNotIn(lazy_module, modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import logging
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.message_cache import message_cache
+from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
+from app.strands_integration.converters.content_converter import (
+    content_model_to_strands_content_blocks,
+)
+from app.strands_integration.converters.message_converter import (
+    simple_message_models_to_strands_messages,
+)
+from app.usecases.chat import trace_to_root
+from app.vector_search import SearchResult
+
+sys.path.append("tests")
+from test_repositories.utils.conversation_factory import (
+    TEST_MODEL,
+    create_test_message,
+    create_test_message_map,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class TestMessageCache(unittest.TestCase):
+    def setUp(self):
+        message_cache.clear()
+        self.addCleanup(message_cache.clear)
+
+        patcher = patch(
+            "app.strands_integration.converters.message_converter"
+            ".content_model_to_strands_content_blocks",
+            wraps=content_model_to_strands_content_blocks,
+        )
+        self.mock_convert = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _convert(
+        self, message_map: dict, node_id: str, user_id: str = "user", **kwargs
+    ):
+        messages = trace_to_root(
+            node_id, message_map, conversation_id="conv", user_id=user_id
+        )
+        return simple_message_models_to_strands_messages(messages, TEST_MODEL, **kwargs)
+
+    def test_only_new_messages_are_converted(self):
+        message_map, last_id = create_test_message_map(3, attachment_interval=10)
+        first = self._convert(message_map, last_id, prompt_caching_enabled=False)
+        converted = self.mock_convert.call_count
+
+        # Next turn: one question and answer more
+        message_map["user-3"] = create_test_message("user", "next", last_id)
+        message_map["bot-3"] = create_test_message("assistant", "ok", "user-3")
+        self.mock_convert.reset_mock()
+        second = self._convert(message_map, "bot-3", prompt_caching_enabled=False)
+
+        # The new messages and the first question, whose attachment is not cached
+        self.assertEqual(self.mock_convert.call_count, 2 + 2)
+        self.assertEqual(second[: len(first)], first)
+        self.assertGreater(converted, 2)
+
+    def test_scoped_to_user(self):
+        message_map, last_id = create_test_message_map(1, attachment_interval=10)
+        self._convert(message_map, last_id, user_id="user1")
+
+        # Another user sending the same conversation id converts its own messages
+        self.mock_convert.reset_mock()
+        self._convert(message_map, last_id, user_id="user2")
+        self.assertGreater(self.mock_convert.call_count, 0)
+
+    def test_blocks_are_copies(self):
+        message_map, last_id = create_test_message_map(1, attachment_interval=10)
+        first = self._convert(message_map, last_id)
+        first[-1]["content"][0]["text"] = "[blank text]"
+
+        second = self._convert(message_map, last_id)
+        self.assertNotEqual(second[-1]["content"][0]["text"], "[blank text]")
+
+    def test_message_changed_in_place(self):
+        message_map, last_id = create_test_message_map(1, attachment_interval=10)
+        self._convert(message_map, last_id)
+
+        # Continuing a generation appends to the text of the message
+        message_map[last_id].content[0].body += "continued"  # type: ignore
+        messages = self._convert(message_map, last_id)
+        self.assertTrue(messages[-1]["content"][0]["text"].endswith("continued"))
+
+    def test_only_latest_blocks_are_kept(self):
+        message_map, last_id = create_test_message_map(1, attachment_interval=10)
+        self._convert(message_map, last_id)
+        cached = len(message_cache.get(("user", "conv")) or {})
+
+        for turn in range(3):
+            message_map[last_id].content[0].body += f"continued {turn}"  # type: ignore
+            self._convert(message_map, last_id)
+
+        self.assertEqual(len(message_cache.get(("user", "conv")) or {}), cached)
+
+    def test_attachments_are_not_cached(self):
+        message_map, last_id = create_test_message_map(1, attachment_interval=10)
+        self._convert(message_map, last_id)
+
+        # The first question carries an attachment
+        self.assertNotIn("user-0", message_cache.get(("user", "conv")) or {})
+        self.mock_convert.reset_mock()
+        self._convert(message_map, last_id)
+        self.assertEqual(self.mock_convert.call_count, 2)
+
+    def test_grounded_user_messages_are_not_cached(self):
+        message_map, last_id = create_test_message_map(1, attachment_interval=10)
+        guardrail = BedrockGuardrailsModel(
+            is_guardrail_enabled=True,
+            hate_threshold=0,
+            insults_threshold=0,
+            sexual_threshold=0,
+            violence_threshold=0,
+            misconduct_threshold=0,
+            grounding_threshold=0.5,
+            relevance_threshold=0,
+            guardrail_arn="",
+            guardrail_version="",
+        )
+        search_results: list[SearchResult] = [
+            {
+                "bot_id": "bot1",
+                "content": "grounding",
+                "source_name": "",
+                "source_link": "",
+                "rank": 0,
+                "metadata": {},
+                "page_number": None,
+            }
+        ]
+        messages = self._convert(
+            message_map,
+            last_id,
+            guardrail=guardrail,
+            search_results=search_results,
+            prompt_caching_enabled=False,
+        )
+        self.assertIn("guardContent", messages[0]["content"][0])
+
+        messages = self._convert(message_map, last_id, prompt_caching_enabled=False)
+        self.assertIn("text", messages[0]["content"][0])
+
+
+class TestMessageCacheBenchmark(unittest.TestCase):
+    def setUp(self):
+        message_cache.clear()
+        self.addCleanup(message_cache.clear)
+
+    def test_benchmark(self):
+        """Convert the history of every turn of a 100-turn conversation."""
+        message_map, _ = create_test_message_map(100, attachment_interval=10)
+
+        def run(conversation_id: str | None) -> float:
+            started = time.perf_counter()
+            for turn in range(100):
+                messages = trace_to_root(
+                    f"bot-{turn}",
+                    message_map,
+                    conversation_id=conversation_id,
+                    user_id="user",
+                )
+                simple_message_models_to_strands_messages(messages, TEST_MODEL)
+            return time.perf_counter() - started
+
+        uncached_time = run(None)
+        cached_time = run("conv")
+
+        # Question, answer, tool use and result of each turn are cached, except
+        # for the questions with an attachment
+        self.assertEqual(
+            len(message_cache.get(("user", "conv")) or {}), 100 * 4 - 100 // 10
+        )
+        logger.info(
+            f"100 turns: {uncached_time * 1000:.1f}ms converting the whole history "
+            f"every turn, {cached_time * 1000:.1f}ms with the cache"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories.blob_store import (
+    blob_cache,
+    compose_blob_key,
+    resolve_blobs,
+    store_blobs,
+)
+from app.repositories.common import compose_blob_reference_id, compose_message_item_id
+from app.repositories.conversation import (
+    _add_blob_references,
+    _compose_message_item,
+    _load_message_map,
+    delete_conversation_by_id,
+)
+from app.repositories.models.conversation import (
+    AttachmentContentModel,
+    ImageContentModel,
+    MessageModel,
+    TextContentModel,
+)
+from botocore.exceptions import ClientError
+
+IMAGE_BODY = b"\x89PNG" + bytes(range(256)) * 32
+ATTACHMENT_BODY = b"%PDF" + bytes(reversed(range(256))) * 32
+
+
+def _create_image(body: bytes = IMAGE_BODY) -> ImageContentModel:
+    return ImageContentModel(content_type="image", media_type="image/png", body=body)
+
+
+def _create_attachment(body: bytes = ATTACHMENT_BODY) -> AttachmentContentModel:
+    return AttachmentContentModel(
+        content_type="attachment", file_name="report.pdf", body=body
+    )
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        blob_cache.clear()
+        self.addCleanup(blob_cache.clear)
+
+        patcher = patch("app.repositories.blob_store.BLOB_BUCKET", "bucket")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.repositories.blob_store.s3_client")
+        self.mock_s3_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.objects: dict[str, bytes] = {}
+
+        def head_object(Bucket, Key):
+            if Key not in self.objects:
+                raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+            return {}
+
+        def put_object(Bucket, Key, Body):
+            self.objects[Key] = Body
+
+        self.mock_s3_client.head_object.side_effect = head_object
+        self.mock_s3_client.put_object.side_effect = put_object
+
+    def test_store_once_per_body(self):
+        contents = [_create_image(), _create_attachment()]
+        store_blobs("user1", contents)
+
+        self.assertEqual(contents[0].blob_key, compose_blob_key("user1", IMAGE_BODY))
+        self.assertEqual(
+            contents[1].blob_key, compose_blob_key("user1", ATTACHMENT_BODY)
+        )
+        self.assertEqual(self.mock_s3_client.put_object.call_count, 2)
+
+        # The same image attached again, e.g. in a later turn
+        image = _create_image()
+        store_blobs("user1", [image])
+        self.assertEqual(image.blob_key, contents[0].blob_key)
+        self.assertEqual(self.mock_s3_client.put_object.call_count, 2)
+
+    def test_existing_blob_is_not_uploaded(self):
+        key = compose_blob_key("user1", IMAGE_BODY)
+        self.objects[key] = IMAGE_BODY
+
+        image = _create_image()
+        store_blobs("user1", [image])
+
+        self.assertEqual(image.blob_key, key)
+        self.mock_s3_client.head_object.assert_called_once()
+        self.mock_s3_client.put_object.assert_not_called()
+
+    def test_small_body_stays_inline(self):
+        image = _create_image(b"\x89PNG")
+        text = TextContentModel(content_type="text", body="Describe the image")
+        store_blobs("user1", [image, text])
+
+        self.assertIsNone(image.blob_key)
+        self.mock_s3_client.put_object.assert_not_called()
+
+    def test_resolve_concurrently(self):
+        bodies = {f"user1/blobs/{i}": bytes([i]) * 8192 for i in range(4)}
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def get_object(Bucket, Key):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight -= 1
+            body = MagicMock()
+            body.read.return_value = bodies[Key]
+            return {"Body": body}
+
+        self.mock_s3_client.get_object.side_effect = get_object
+        contents = [_create_image(b"") for _ in bodies]
+        for content, key in zip(contents, bodies):
+            content.blob_key = key
+
+        resolve_blobs(contents)
+
+        self.assertEqual([c.body for c in contents], list(bodies.values()))
+        self.assertGreater(max_in_flight, 1)
+
+    def test_message_item_keeps_only_key(self):
+        message = MessageModel(
+            role="user",
+            content=[
+                _create_image(),
+                TextContentModel(content_type="text", body="Describe the image"),
+            ],
+            model="claude-v3.7-sonnet",
+            children=[],
+            parent="system",
+            create_time=1627984879.9,
+            feedback=None,
+            used_chunks=None,
+            thinking_log=None,
+        )
+        item = _compose_message_item("user1", "conv1", "a", message, 300 * 1024)
+        self.assertIn("MessageMap", item)
+        self.assertEqual(item["BlobKeys"], {compose_blob_key("user1", IMAGE_BODY)})
+
+        loaded = MessageModel.model_validate(_load_message_map(item)["a"])
+        image = loaded.content[0]
+        assert isinstance(image, ImageContentModel)
+        self.assertEqual(image.body, b"")
+        self.assertEqual(image.blob_key, compose_blob_key("user1", IMAGE_BODY))
+
+        # Resolved from the cache filled on upload
+        resolve_blobs(loaded.content)
+        self.assertEqual(image.body, IMAGE_BODY)
+        self.mock_s3_client.get_object.assert_not_called()
+
+
+def _conditional_check_failed(operation_name: str) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException"}}, operation_name
+    )
+
+
+class _ConversationTable:
+    """Conversation table holding message and blob reference items."""
+
+    def __init__(self):
+        self.table_name = "conversation-table"
+        self.meta = MagicMock()
+        self.meta.client.batch_write_item.return_value = {}
+        self.message_items: list[dict] = []
+        # Conversations by SK of the reference item
+        self.references: dict[str, set[str]] = {}
+
+    def get_item(self, **kwargs):
+        return {"Item": {"MessageStorage": "ITEMS"}}
+
+    def query(self, **kwargs):
+        _, sk_condition = kwargs["KeyConditionExpression"].get_expression()["values"]
+        prefix = sk_condition.get_expression()["values"][1]
+        return {
+            "Items": [
+                item for item in self.message_items if item["SK"].startswith(prefix)
+            ]
+        }
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        conversations = ExpressionAttributeValues[":conversation"]
+        if UpdateExpression.startswith("ADD"):
+            self.references.setdefault(Key["SK"], set()).update(conversations)
+            return {}
+
+        if not self.references.get(Key["SK"]):
+            raise _conditional_check_failed("UpdateItem")
+        # An empty set is removed, the item is left
+        self.references[Key["SK"]] -= conversations
+        remaining = self.references[Key["SK"]]
+        return {"Attributes": {"Conversations": set(remaining)} if remaining else {}}
+
+    def delete_item(self, Key, **kwargs):
+        if Key["SK"] in self.references:
+            if self.references[Key["SK"]]:
+                raise _conditional_check_failed("DeleteItem")
+            del self.references[Key["SK"]]
+        return {}
+
+
+class TestBlobReferences(unittest.TestCase):
+    def setUp(self):
+        self.table = _ConversationTable()
+        patcher = patch(
+            "app.repositories.conversation.get_conversation_table_client",
+            return_value=self.table,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.repositories.conversation.s3_client")
+        self.mock_s3_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_s3_client.delete_objects.return_value = {}
+
+        self.blob_key = compose_blob_key("user1", IMAGE_BODY)
+
+    def _deleted_objects(self) -> list[str]:
+        return [
+            obj["Key"]
+            for call in self.mock_s3_client.delete_objects.call_args_list
+            for obj in call.kwargs["Delete"]["Objects"]
+        ]
+
+    def _store_message(self, conversation_id: str) -> None:
+        _add_blob_references(self.table, "user1", conversation_id, {self.blob_key})
+        self.table.message_items.append(
+            {
+                "SK": compose_message_item_id("user1", conversation_id, "a"),
+                "BlobKeys": {self.blob_key},
+            }
+        )
+
+    def test_blob_deleted_with_last_conversation(self):
+        # The same image attached in two conversations
+        self._store_message("conv1")
+        self._store_message("conv2")
+
+        delete_conversation_by_id("user1", "conv1")
+        self.assertNotIn(self.blob_key, self._deleted_objects())
+        self.assertEqual(
+            self.table.references[compose_blob_reference_id("user1", self.blob_key)],
+            {"conv2"},
+        )
+
+        delete_conversation_by_id("user1", "conv2")
+        self.assertIn(self.blob_key, self._deleted_objects())
+        self.assertEqual(self.table.references, {})
+
+    def test_blob_without_reference_is_kept(self):
+        self.table.message_items.append(
+            {
+                "SK": compose_message_item_id("user1", "conv1", "a"),
+                "BlobKeys": {self.blob_key},
+            }
+        )
+
+        delete_conversation_by_id("user1", "conv1")
+        self.assertNotIn(self.blob_key, self._deleted_objects())
+
+
+if __name__ == "__main__":
+    unittest.main()
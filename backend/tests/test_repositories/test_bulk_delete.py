@@ -0,0 +1,119 @@
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories import bulk_delete
+from app.repositories.bulk_delete import BulkDeleteError, BulkDeleter
+
+
+def _key(i: int) -> dict:
+    return {"PK": "user", "SK": f"user#MESSAGE#conv#{i}"}
+
+
+class TestBulkDeleter(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.table.table_name = "table"
+        self.client = self.table.meta.client
+        self.client.batch_write_item.return_value = {"UnprocessedItems": {}}
+        self.s3_client = MagicMock()
+        self.s3_client.delete_objects.return_value = {}
+
+        patcher = patch("app.repositories.bulk_delete.time.sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _deleted_keys(self) -> list[dict]:
+        return [
+            request["DeleteRequest"]["Key"]
+            for call in self.client.batch_write_item.call_args_list
+            for request in call.kwargs["RequestItems"]["table"]
+        ]
+
+    def test_delete_items_in_batches(self):
+        progress = []
+        with BulkDeleter(
+            self.table, on_progress=lambda p: progress.append(p.deleted_items)
+        ) as deleter:
+            for i in range(60):
+                deleter.delete(_key(i))
+
+        self.assertEqual(self.client.batch_write_item.call_count, 3)
+        self.assertCountEqual(self._deleted_keys(), [_key(i) for i in range(60)])
+        self.assertEqual(deleter.progress.deleted_items, 60)
+        self.assertEqual(progress[-1], 60)
+
+    def test_retry_unprocessed_items(self):
+        unprocessed = [{"DeleteRequest": {"Key": _key(0)}}]
+        self.client.batch_write_item.side_effect = [
+            {"UnprocessedItems": {"table": unprocessed}},
+            {"UnprocessedItems": {"table": unprocessed}},
+            {"UnprocessedItems": {}},
+        ]
+        with BulkDeleter(self.table) as deleter:
+            deleter.delete(_key(0))
+            deleter.delete(_key(1))
+
+        self.assertEqual(self.client.batch_write_item.call_count, 3)
+        self.assertEqual(deleter.progress.deleted_items, 2)
+
+    def test_give_up_on_unprocessed_items(self):
+        self.client.batch_write_item.side_effect = lambda RequestItems: {
+            "UnprocessedItems": RequestItems
+        }
+        deleter = BulkDeleter(self.table)
+        deleter.delete(_key(0))
+        with self.assertRaises(BulkDeleteError):
+            deleter.close()
+        self.assertEqual(
+            self.client.batch_write_item.call_count,
+            bulk_delete.BULK_DELETE_MAX_ATTEMPTS,
+        )
+
+    def test_delete_objects_before_items(self):
+        deleted_objects = set()
+        lock = threading.Lock()
+
+        def delete_objects(Bucket, Delete):
+            with lock:
+                deleted_objects.update(o["Key"] for o in Delete["Objects"])
+            return {}
+
+        def batch_write_item(RequestItems):
+            with lock:
+                for request in RequestItems["table"]:
+                    sk = request["DeleteRequest"]["Key"]["SK"]
+                    self.assertIn(sk, deleted_objects)
+            return {"UnprocessedItems": {}}
+
+        self.s3_client.delete_objects.side_effect = delete_objects
+        self.client.batch_write_item.side_effect = batch_write_item
+
+        with BulkDeleter(self.table, s3_client=self.s3_client, bucket="b") as deleter:
+            for i in range(2500):
+                key = _key(i)
+                deleter.delete(key, object_key=key["SK"])
+
+        # 1000 keys per request
+        self.assertEqual(self.s3_client.delete_objects.call_count, 3)
+        self.assertEqual(deleter.progress.deleted_objects, 2500)
+        self.assertEqual(deleter.progress.deleted_items, 2500)
+
+    def test_keep_items_of_failed_objects(self):
+        self.s3_client.delete_objects.return_value = {
+            "Errors": [{"Key": "object1", "Message": "Access Denied"}]
+        }
+        deleter = BulkDeleter(self.table, s3_client=self.s3_client, bucket="b")
+        deleter.delete(_key(0), object_key="object0")
+        deleter.delete(_key(1), object_key="object1")
+        with self.assertRaises(BulkDeleteError):
+            deleter.close()
+
+        self.assertNotIn(_key(1), self._deleted_keys())
+        self.assertEqual(deleter.progress.deleted_objects, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
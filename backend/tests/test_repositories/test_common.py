@@ -0,0 +1,123 @@
+import json
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories.common import ScopedResourcePool
+
+
+def _assume_role_response(expires_in: timedelta) -> dict:
+    return {
+        "Credentials": {
+            "AccessKeyId": "key",
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": datetime.now(timezone.utc) + expires_in,
+        }
+    }
+
+
+class TestScopedResourcePool(unittest.TestCase):
+    def setUp(self):
+        self.patcher_client = patch("boto3.client")
+        self.patcher_session = patch("boto3.Session")
+        self.mock_client = self.patcher_client.start()
+        self.mock_session = self.patcher_session.start()
+        self.sts = self.mock_client.return_value
+        self.sts.assume_role.return_value = _assume_role_response(timedelta(hours=1))
+        # Return a distinct resource for every session
+        self.mock_session.side_effect = lambda **kwargs: MagicMock()
+
+    def tearDown(self):
+        self.patcher_client.stop()
+        self.patcher_session.stop()
+
+    def test_reuses_credentials_per_user(self):
+        pool = ScopedResourcePool(max_size=8)
+        first = pool.get("dynamodb", "table", "user1")
+        second = pool.get("dynamodb", "table", "user1")
+
+        self.assertIs(first, second)
+        self.assertEqual(self.sts.assume_role.call_count, 1)
+        self.assertEqual(pool.stats.hits, 1)
+        self.assertEqual(pool.stats.misses, 1)
+
+    def test_resource_per_thread(self):
+        pool = ScopedResourcePool(max_size=8)
+        main = pool.get("dynamodb", "table", "user1")
+        resources = []
+        thread = threading.Thread(
+            target=lambda: resources.append(pool.get("dynamodb", "table", "user1"))
+        )
+        thread.start()
+        thread.join()
+
+        # boto3 resources are not thread-safe, but the credentials are shared
+        self.assertIsNot(resources[0], main)
+        self.assertEqual(self.sts.assume_role.call_count, 1)
+
+    def test_scopes_are_isolated(self):
+        pool = ScopedResourcePool(max_size=8)
+        user1 = pool.get("dynamodb", "table", "user1")
+        user2 = pool.get("dynamodb", "table", "user2")
+        public = pool.get("dynamodb", "table")
+
+        self.assertIsNot(user1, user2)
+        self.assertIsNot(user1, public)
+        policies = [
+            json.loads(call.kwargs["Policy"])
+            for call in self.sts.assume_role.call_args_list
+        ]
+        self.assertEqual(
+            policies[0]["Statement"][0]["Condition"],
+            {"ForAllValues:StringLike": {"dynamodb:LeadingKeys": ["user1*"]}},
+        )
+        self.assertEqual(
+            policies[1]["Statement"][0]["Condition"],
+            {"ForAllValues:StringLike": {"dynamodb:LeadingKeys": ["user2*"]}},
+        )
+        self.assertNotIn("Condition", policies[2]["Statement"][0])
+
+    def test_expired_credentials_are_not_reused(self):
+        pool = ScopedResourcePool(max_size=8, expiry_margin=120)
+        # Credentials expiring within the margin must never be cached
+        self.sts.assume_role.return_value = _assume_role_response(timedelta(seconds=60))
+        pool.get("dynamodb", "table", "user1")
+        pool.get("dynamodb", "table", "user1")
+
+        self.assertEqual(self.sts.assume_role.call_count, 2)
+
+    def test_refresh_ahead(self):
+        pool = ScopedResourcePool(max_size=8, expiry_margin=0, refresh_ahead=600)
+        self.sts.assume_role.return_value = _assume_role_response(
+            timedelta(seconds=300)
+        )
+        first = pool.get("dynamodb", "table", "user1")
+
+        # Within the refresh window the cached resource is returned immediately
+        # and replaced in the background.
+        self.assertIs(pool.get("dynamodb", "table", "user1"), first)
+        for _ in range(100):
+            if self.sts.assume_role.call_count == 2 and not pool._refreshing:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.sts.assume_role.call_count, 2)
+        self.assertIsNot(pool.get("dynamodb", "table", "user1"), first)
+
+    def test_lru_bound(self):
+        pool = ScopedResourcePool(max_size=2)
+        for user_id in ["user1", "user2", "user3"]:
+            pool.get("dynamodb", "table", user_id)
+
+        pool.get("dynamodb", "table", "user1")
+        self.assertEqual(self.sts.assume_role.call_count, 4)
+        self.assertEqual(pool.stats.evictions, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,8 +13,10 @@ from app.repositories.conversation import (
     change_conversation_title,
     delete_conversation_by_id,
     delete_conversation_by_user_id,
+    find_conversation_branch,
     find_conversation_by_id,
     find_conversation_by_user_id,
+    find_conversation_page_by_user_id,
     store_conversation,
     update_feedback,
 )
@@ -29,6 +31,12 @@ from app.repositories.models.conversation import (
 )
 
 
+def _sk_prefix(query_kwargs: dict) -> str:
+    """Prefix of the `begins_with` condition on SK of a query."""
+    _, sk_condition = query_kwargs["KeyConditionExpression"].get_expression()["values"]
+    return sk_condition.get_expression()["values"][1]
+
+
 class TestConversationRepository(unittest.TestCase):
     def setUp(self):
         self.patcher1 = patch("boto3.resource")
@@ -129,12 +137,6 @@ class TestConversationRepository(unittest.TestCase):
 
             if "IndexName" in kwargs and kwargs["IndexName"] == "SKIndex":
                 message_map = conversation.model_dump()["message_map"]
-                if self.feedback_updated:
-                    message_map["a"]["feedback"] = {
-                        "thumbs_up": True,
-                        "category": "Good",
-                        "comment": "The response is pretty good.",
-                    }
                 return {
                     "Items": [
                         {
@@ -154,6 +156,24 @@ class TestConversationRepository(unittest.TestCase):
                         }
                     ]
                 }
+            if "#FEEDBACK#" in _sk_prefix(kwargs):
+                return {
+                    "Items": (
+                        [
+                            {
+                                "PK": "user",
+                                "SK": "user#FEEDBACK#1#a",
+                                "Feedback": {
+                                    "thumbs_up": True,
+                                    "category": "Good",
+                                    "comment": "The response is pretty good.",
+                                },
+                            }
+                        ]
+                        if self.feedback_updated
+                        else []
+                    )
+                }
             return {
                 "Items": (
                     []
@@ -182,9 +202,25 @@ class TestConversationRepository(unittest.TestCase):
         response = store_conversation("user", conversation)
         self.assertIsNotNone(response)
 
+        # Items without `Model` are listed with the model of their message map
+        self.mock_table.meta.client.batch_get_item.return_value = {
+            "Responses": {
+                self.mock_table.table_name: [
+                    {
+                        "SK": "user#CONV#1",
+                        "MessageMap": json.dumps(
+                            {"system": {"model": "claude-v3-haiku"}}
+                        ),
+                    }
+                ]
+            },
+            "UnprocessedKeys": {},
+        }
+
         # Test finding conversation by user_id
         conversations = find_conversation_by_user_id(user_id="user")
         self.assertEqual(len(conversations), 1)
+        self.assertEqual(conversations[0].model, "claude-v3-haiku")
 
         # Test finding conversation by id
         found_conversation = find_conversation_by_id(
@@ -248,7 +284,8 @@ class TestConversationRepository(unittest.TestCase):
 
         # Test give a feedback
         self.assertIsNone(found_conversation.message_map["a"].feedback)
-        self.feedback_updated = True
+        writer = self.mock_table.batch_writer.return_value.__enter__.return_value
+        writer.put_item.reset_mock()
         response = update_feedback(
             user_id="user",
             conversation_id="1",
@@ -257,6 +294,25 @@ class TestConversationRepository(unittest.TestCase):
                 thumbs_up=True, category="Good", comment="The response is pretty good."
             ),
         )
+        # Only the feedback item is written
+        writer.put_item.assert_not_called()
+        feedback_item = self.mock_table.put_item.call_args.kwargs["Item"]
+        self.assertEqual(feedback_item["SK"], "user#FEEDBACK#1#a")
+        self.assertEqual(feedback_item["Feedback"]["thumbs_up"], True)
+
+        # Legacy layout: the message map is not loaded to check the message
+        self.assertEqual(
+            self.mock_table.query.call_args.kwargs["ProjectionExpression"],
+            "SK, MessageStorage",
+        )
+        update_feedback(
+            user_id="user",
+            conversation_id="1",
+            message_id="unknown",
+            feedback=FeedbackModel(thumbs_up=False, category="", comment=""),
+        )
+
+        self.feedback_updated = True
         found_conversation = find_conversation_by_id(
             user_id="user", conversation_id="1"
         )
@@ -425,6 +481,220 @@ class TestConversationRepository(unittest.TestCase):
         conversations = find_conversation_by_user_id(user_id="user")
         self.assertEqual(len(conversations), 0)
 
+    def test_store_conversation_writes_only_changed_messages(self):
+        def message(children: list[str], parent: str | None) -> MessageModel:
+            return MessageModel(
+                role="user",
+                content=[TextContentModel(content_type="text", body="Hello")],
+                model="claude-v3-haiku",
+                children=children,
+                parent=parent,
+                create_time=1627984879.9,
+                feedback=None,
+                used_chunks=None,
+                thinking_log=None,
+            )
+
+        conversation = ConversationModel(
+            id="3",
+            create_time=1627984879.9,
+            title="Incremental Conversation",
+            total_price=0,
+            message_map={
+                "system": message(children=["a"], parent=None),
+                "a": message(children=[], parent="system"),
+            },
+            last_message_id="a",
+            bot_id=None,
+            should_continue=False,
+        )
+        writer = self.mock_table.batch_writer.return_value.__enter__.return_value
+
+        store_conversation("user", conversation)
+        self.assertEqual(writer.put_item.call_count, 2)
+
+        # Append a reply: only the new message and its parent are rewritten
+        writer.put_item.reset_mock()
+        conversation.message_map["a"].children.append("b")
+        conversation.message_map["b"] = message(children=[], parent="a")
+        conversation.last_message_id = "b"
+        store_conversation("user", conversation)
+
+        written = sorted(
+            call.kwargs["Item"]["SK"] for call in writer.put_item.call_args_list
+        )
+        self.assertEqual(written, ["user#MESSAGE#3#a", "user#MESSAGE#3#b"])
+        head = self.mock_table.put_item.call_args.kwargs["Item"]
+        self.assertEqual(head["MessageStorage"], "ITEMS")
+        self.assertEqual(list(json.loads(head["MessageMap"])), ["system"])
+
+        # Nothing changed: only the conversation item is written
+        writer.put_item.reset_mock()
+        store_conversation("user", conversation)
+        writer.put_item.assert_not_called()
+
+    def test_find_conversation_branch(self):
+        # system -> a -> b (edited into c) -> d
+        parents = {"system": None, "a": "system", "b": "a", "c": "a", "d": "c"}
+        children = {"system": ["a"], "a": ["b", "c"], "b": [], "c": ["d"], "d": []}
+
+        def message_item(message_id: str) -> dict:
+            message = MessageModel(
+                role="user",
+                content=[TextContentModel(content_type="text", body=message_id)],
+                model="claude-v3-haiku",
+                children=children[message_id],
+                parent=parents[message_id],
+                create_time=1627984879.9,
+                feedback=None,
+                used_chunks=None,
+                thinking_log=None,
+            )
+            return {
+                "PK": "user",
+                "SK": f"user#MESSAGE#4#{message_id}",
+                "Parent": parents[message_id],
+                "MessageMap": json.dumps(
+                    {message_id: message.model_dump(by_alias=True)}
+                ),
+            }
+
+        def mock_query_side_effect(**kwargs):
+            if kwargs.get("IndexName") == "SKIndex":
+                return {
+                    "Items": [
+                        {
+                            "PK": "user",
+                            "SK": "user#CONV#4",
+                            "Title": "Branched Conversation",
+                            "CreateTime": 1627984879.9,
+                            "TotalPrice": 0,
+                            "LastMessageId": "d",
+                            "MessageStorage": "ITEMS",
+                            "ShouldContinue": False,
+                        }
+                    ]
+                }
+            if "#FEEDBACK#" in _sk_prefix(kwargs):
+                return {
+                    "Items": [
+                        {
+                            "SK": "user#FEEDBACK#4#b",
+                            "Feedback": {
+                                "thumbs_up": False,
+                                "category": "Incorrect",
+                                "comment": "",
+                            },
+                        }
+                    ]
+                }
+            return {
+                "Items": [
+                    {"SK": f"user#MESSAGE#4#{message_id}", "Parent": parent}
+                    for message_id, parent in parents.items()
+                ]
+            }
+
+        def mock_batch_get_item_side_effect(RequestItems):
+            keys = RequestItems[self.mock_table.table_name]["Keys"]
+            return {
+                "Responses": {
+                    self.mock_table.table_name: [
+                        message_item(key["SK"].split("#")[-1]) for key in keys
+                    ]
+                }
+            }
+
+        self.mock_table.query.side_effect = mock_query_side_effect
+        batch_get_item = self.mock_table.meta.client.batch_get_item
+        batch_get_item.side_effect = mock_batch_get_item_side_effect
+
+        conversation = find_conversation_branch("user", "4")
+        self.assertEqual(sorted(conversation.message_map), ["a", "c", "d", "system"])
+        self.assertEqual(batch_get_item.call_count, 1)
+
+        # The other branch is loaded on access
+        self.assertIn("b", conversation.message_map)
+        self.assertEqual(conversation.message_map["b"].content[0].body, "b")
+        self.assertEqual(conversation.message_map["b"].feedback.category, "Incorrect")  # type: ignore
+        self.assertEqual(batch_get_item.call_count, 2)
+        self.assertIsNone(conversation.message_map.get("unknown"))
+
+        # Nothing is written back for the messages only loaded
+        self.assertEqual(conversation.changed_message_ids(), ([], []))
+
+        conversation = find_conversation_branch("user", "4", message_id="b")
+        self.assertEqual(sorted(conversation.message_map), ["a", "b", "system"])
+
+
+class TestFindConversationPage(unittest.TestCase):
+    def setUp(self):
+        self.mock_table = MagicMock()
+        patcher = patch(
+            "app.repositories.conversation.get_conversation_table_client",
+            return_value=self.mock_table,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _item(self, conversation_id: str) -> dict:
+        return {
+            "SK": f"user#CONV#{conversation_id}",
+            "Title": f"Conversation {conversation_id}",
+            "CreateTime": 1627984879.9,
+            "Model": "claude-v3-haiku",
+            "LastUpdated": 1627984890.0,
+        }
+
+    def test_paginate(self):
+        last_key = {"PK": "user", "SK": "user#CONV#2"}
+        self.mock_table.query.side_effect = [
+            {"Items": [self._item("3"), self._item("2")], "LastEvaluatedKey": last_key},
+            {"Items": [self._item("1")]},
+        ]
+
+        page, next_token = find_conversation_page_by_user_id("user", limit=2)
+        self.assertEqual([c.id for c in page], ["3", "2"])
+        self.assertEqual(page[0].model, "claude-v3-haiku")
+        self.assertEqual(page[0].last_updated_time, 1627984890.0)
+        self.assertIsNotNone(next_token)
+
+        page, next_token = find_conversation_page_by_user_id(
+            "user", limit=2, next_token=next_token
+        )
+        self.assertEqual([c.id for c in page], ["1"])
+        self.assertIsNone(next_token)
+
+        first_query, second_query = self.mock_table.query.call_args_list
+        self.assertEqual(first_query.kwargs["Limit"], 2)
+        # The message map is not read
+        self.assertNotIn(
+            "MessageMap", first_query.kwargs["ExpressionAttributeNames"].values()
+        )
+        self.assertEqual(second_query.kwargs["ExclusiveStartKey"], last_key)
+        self.mock_table.meta.client.batch_get_item.assert_not_called()
+
+    def test_find_all_pages(self):
+        self.mock_table.query.side_effect = [
+            {
+                "Items": [self._item(str(i))],
+                "LastEvaluatedKey": {"PK": "user", "SK": f"user#CONV#{i}"},
+            }
+            for i in range(10, 0, -1)
+        ] + [{"Items": []}]
+
+        conversations = find_conversation_by_user_id("user")
+        self.assertEqual(len(conversations), 10)
+
+    def test_invalid_next_token(self):
+        other_user_key = base64.urlsafe_b64encode(
+            json.dumps({"PK": "other", "SK": "other#CONV#1"}).encode("utf-8")
+        ).decode("utf-8")
+        for next_token in ["not a token", other_user_key]:
+            with self.assertRaises(ValueError):
+                find_conversation_page_by_user_id("user", next_token=next_token)
+        self.mock_table.query.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,7 @@
 import sys
+import threading
 import unittest
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, ".")
 
@@ -12,6 +14,7 @@ from app.repositories.custom_bot import (
     find_alias_by_bot_id,
     find_all_published_bots,
     find_bot_by_id,
+    find_bot_by_id_with_cache,
     find_owned_bots_by_user_id,
     find_pinned_public_bots,
     find_recently_used_bots_by_user_id,
@@ -31,6 +34,7 @@ from app.repositories.custom_bot import (
     update_bot_stats,
     update_knowledge_base_id,
 )
+from app.repositories.custom_bot import bot_cache
 from app.repositories.models.custom_bot import (
     ActiveModelsModel,
     AgentModel,
@@ -676,5 +680,66 @@ class TestRemoveFromRecentlyUsed(unittest.TestCase):
         self.assertNotIn("shared_bot", bot_ids_after)
 
 
+class TestFindBotByIdWithCache(unittest.TestCase):
+    def setUp(self):
+        bot_cache.clear()
+        self.table = MagicMock()
+        self.patcher = patch(
+            "app.repositories.custom_bot.get_bot_table_client",
+            return_value=self.table,
+        )
+        self.patcher.start()
+
+        # Capture the item written for the bot
+        store_bot(create_test_private_bot("1", False, "user1"))
+        self.item = self.table.put_item.call_args.kwargs["Item"]
+        self.full_queries = 0
+
+        def query(**kwargs):
+            if kwargs.get("ProjectionExpression") == "LastModified":
+                return {"Items": [{"LastModified": self.item["LastModified"]}]}
+
+            self.full_queries += 1
+            return {"Items": [self.item]}
+
+        self.table.query.side_effect = query
+
+    def tearDown(self):
+        self.patcher.stop()
+        bot_cache.clear()
+
+    def test_reuse_until_modified(self):
+        bot1 = find_bot_by_id_with_cache("1")
+        bot2 = find_bot_by_id_with_cache("1")
+        self.assertEqual(self.full_queries, 1)
+        self.assertEqual(bot1, bot2)
+        # Callers get their own copy
+        self.assertIsNot(bot1, bot2)
+
+        self.item = {**self.item, "Title": "Updated", "LastModified": 1}
+        self.assertEqual(find_bot_by_id_with_cache("1").title, "Updated")
+        self.assertEqual(self.full_queries, 2)
+
+    def test_invalidate_on_update(self):
+        find_bot_by_id_with_cache("1")
+        update_bot_shared_status("user1", "1", "all", "shared", [], [])
+        self.assertEqual(len(bot_cache), 0)
+
+    def test_single_flight(self):
+        barrier = threading.Barrier(4)
+
+        def find():
+            barrier.wait()
+            find_bot_by_id_with_cache("1")
+
+        threads = [threading.Thread(target=find) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.full_queries, 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,56 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories.knowledge_base import (
+    get_knowledge_base_info,
+    knowledge_base_info_cache,
+)
+
+
+class TestKnowledgeBaseInfoCache(unittest.TestCase):
+    def setUp(self):
+        knowledge_base_info_cache.clear()
+        self.client = MagicMock()
+        self.client.get_knowledge_base.return_value = {
+            "knowledgeBase": {"knowledgeBaseConfiguration": {"type": "KENDRA"}}
+        }
+        self.patcher = patch(
+            "app.repositories.knowledge_base.get_bedrock_agent_client",
+            return_value=self.client,
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        knowledge_base_info_cache.clear()
+
+    def test_reuse_until_synchronized(self):
+        for _ in range(3):
+            info = get_knowledge_base_info("kb1", version="exec1")
+            self.assertEqual(
+                info.knowledge_base.knowledge_base_configuration.type, "KENDRA"
+            )
+        self.assertEqual(self.client.get_knowledge_base.call_count, 1)
+
+        # A new synchronization of the knowledge base
+        get_knowledge_base_info("kb1", version="exec2")
+        self.assertEqual(self.client.get_knowledge_base.call_count, 2)
+
+    def test_failure_is_not_cached(self):
+        self.client.get_knowledge_base.side_effect = Exception("throttled")
+        info = get_knowledge_base_info("kb1")
+        self.assertEqual(
+            info.knowledge_base.knowledge_base_configuration.type, "VECTOR"
+        )
+
+        self.client.get_knowledge_base.side_effect = None
+        info = get_knowledge_base_info("kb1")
+        self.assertEqual(
+            info.knowledge_base.knowledge_base_configuration.type, "KENDRA"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import json
+import logging
+import random
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories.conversation import _compose_message_item, _load_message_map
+from app.repositories.message_codec import (
+    ENCODING_ZLIB_JSON,
+    decode_message_map,
+    encode_message_map,
+)
+from app.repositories.models.conversation import (
+    ChunkModel,
+    JsonToolResultModel,
+    MessageModel,
+    SimpleMessageModel,
+    TextContentModel,
+    ToolResultContentModel,
+    ToolResultContentModelBody,
+    ToolUseContentModel,
+    ToolUseContentModelBody,
+)
+from boto3.dynamodb.types import Binary
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+WORDS = (
+    "the bedrock model returns a response with citations from the knowledge base "
+    "documents retrieved for each query include source links page numbers and "
+    "excerpts describing pricing quotas regions latency throughput and errors"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _create_agent_message(seed: int = 0, results: int = 20) -> MessageModel:
+    """Assistant message shaped like an agent turn with an internet search."""
+    rng = random.Random(seed)
+    search_results = [
+        {
+            "content": _text(rng, 150),
+            "source_name": f"Result {i}",
+            "source_link": f"https://example.com/articles/{rng.randrange(10**8)}",
+        }
+        for i in range(results)
+    ]
+    return MessageModel(
+        role="assistant",
+        content=[TextContentModel(content_type="text", body=_text(rng, 400))],
+        model="claude-v3.7-sonnet",
+        children=[],
+        parent="user-message",
+        create_time=1627984879.9,
+        used_chunks=[
+            ChunkModel(
+                content=result["content"],
+                source=result["source_link"],
+                rank=i,
+                content_type="url",
+            )
+            for i, result in enumerate(search_results)
+        ],
+        thinking_log=[
+            SimpleMessageModel(
+                role="assistant",
+                content=[
+                    ToolUseContentModel(
+                        content_type="toolUse",
+                        body=ToolUseContentModelBody(
+                            tool_use_id="tool-use",
+                            name="internet_search",
+                            input={"query": _text(rng, 6), "country": "us-en"},
+                        ),
+                    )
+                ],
+            ),
+            SimpleMessageModel(
+                role="user",
+                content=[
+                    ToolResultContentModel(
+                        content_type="toolResult",
+                        body=ToolResultContentModelBody(
+                            tool_use_id="tool-use",
+                            content=[
+                                JsonToolResultModel(json=result)  # type: ignore
+                                for result in search_results
+                            ],
+                            status="success",
+                        ),
+                    )
+                ],
+            ),
+        ],
+    )
+
+
+class TestMessageCodec(unittest.TestCase):
+    def test_round_trip(self):
+        message_map = {"a": _create_agent_message().model_dump(by_alias=True)}
+        encoded = encode_message_map(message_map)
+
+        self.assertEqual(encoded[0], ENCODING_ZLIB_JSON)
+        self.assertEqual(decode_message_map(encoded), message_map)
+        self.assertEqual(decode_message_map(Binary(encoded)), message_map)
+
+    def test_decode_plain_json(self):
+        message_map = {"a": {"role": "user"}}
+        self.assertEqual(decode_message_map(json.dumps(message_map)), message_map)
+        self.assertEqual(
+            decode_message_map(json.dumps(message_map).encode("utf-8")), message_map
+        )
+
+    def test_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            decode_message_map(b"\xff\x00")
+
+    def test_benchmark(self):
+        message_map = {"a": _create_agent_message().model_dump(by_alias=True)}
+        plain = json.dumps(message_map)
+        runs = 20
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            encoded = encode_message_map(message_map)
+        encode_time = (time.perf_counter() - started) / runs
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            decode_message_map(encoded)
+        decode_time = (time.perf_counter() - started) / runs
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            json.loads(plain)
+        plain_decode_time = (time.perf_counter() - started) / runs
+
+        ratio = len(plain.encode("utf-8")) / len(encoded)
+        logger.info(
+            f"Message map: {len(plain) / 1024:.1f}KB plain, "
+            f"{len(encoded) / 1024:.1f}KB encoded ({ratio:.1f}x). "
+            f"Encode: {encode_time * 1000:.2f}ms, decode: {decode_time * 1000:.2f}ms "
+            f"(plain JSON decode: {plain_decode_time * 1000:.2f}ms)"
+        )
+        self.assertGreater(ratio, 3)
+
+
+class TestMessageItemEncoding(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("app.repositories.conversation.s3_client")
+        self.mock_s3_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.message = _create_agent_message()
+        self.size = len(
+            json.dumps({"a": self.message.model_dump(by_alias=True)}).encode("utf-8")
+        )
+
+    def _compose(self, threshold: int) -> dict:
+        return _compose_message_item("user", "conv", "a", self.message, threshold)
+
+    def _load(self, item: dict) -> MessageModel:
+        return MessageModel.model_validate(_load_message_map(item)["a"])
+
+    def test_small_message_stays_plain(self):
+        item = self._compose(threshold=self.size)
+        self.assertIn("MessageMap", item)
+        self.assertNotIn("EncodedMessageMap", item)
+        self.assertEqual(self._load(item), self.message)
+
+    def test_large_message_is_encoded_in_item(self):
+        item = self._compose(threshold=self.size - 1)
+        self.assertNotIn("MessageMap", item)
+        self.assertNotIn("IsLargeMessage", item)
+        self.mock_s3_client.put_object.assert_not_called()
+
+        # As read back from DynamoDB
+        item["EncodedMessageMap"] = Binary(item["EncodedMessageMap"])
+        self.assertEqual(self._load(item), self.message)
+
+    def test_message_too_large_when_encoded(self):
+        item = self._compose(threshold=100)
+        self.assertTrue(item["IsLargeMessage"])
+        body = self.mock_s3_client.put_object.call_args.kwargs["Body"]
+        self.assertEqual(body[0], ENCODING_ZLIB_JSON)
+
+        self.mock_s3_client.get_object.return_value = {"Body": MagicMock()}
+        self.mock_s3_client.get_object.return_value["Body"].read.return_value = body
+        self.assertEqual(self._load(item), self.message)
+
+    def test_read_legacy_large_message(self):
+        self.mock_s3_client.get_object.return_value = {"Body": MagicMock()}
+        self.mock_s3_client.get_object.return_value["Body"].read.return_value = (
+            json.dumps({"a": self.message.model_dump(by_alias=True)}).encode("utf-8")
+        )
+        item = {"IsLargeMessage": True, "LargeMessagePath": "user/conv/a.json"}
+        self.assertEqual(self._load(item), self.message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import sys
+
+sys.path.append(".")
+from app.repositories.models.conversation import (
+    AttachmentContentModel,
+    ContentModel,
+    ConversationModel,
+    JsonToolResultModel,
+    MessageModel,
+    SimpleMessageModel,
+    TextContentModel,
+    ToolResultContentModel,
+    ToolResultContentModelBody,
+    ToolUseContentModel,
+    ToolUseContentModelBody,
+)
+from app.usecases.conversation_title import DEFAULT_CONVERSATION_TITLE
+
+TEST_MODEL = "claude-v3.7-sonnet"
+
+
+def create_test_text_message(role: str, body: str) -> SimpleMessageModel:
+    return SimpleMessageModel(
+        role=role, content=[TextContentModel(content_type="text", body=body)]
+    )
+
+
+def create_test_message(
+    role: str,
+    content: str | list[ContentModel],
+    parent: str | None,
+    thinking_log: list[SimpleMessageModel] | None = None,
+) -> MessageModel:
+    """Message of the message map. A string `content` is a single text."""
+    if isinstance(content, str):
+        content = [TextContentModel(content_type="text", body=content)]
+
+    return MessageModel(
+        role=role,
+        content=content,
+        model=TEST_MODEL,
+        children=[],
+        parent=parent,
+        create_time=1627984879.9,
+        thinking_log=thinking_log,
+    )
+
+
+def create_test_tool_log(turn: int) -> list[SimpleMessageModel]:
+    """Internet search tool use and its result, as in the thinking log of an
+    answer."""
+    return [
+        SimpleMessageModel(
+            role="assistant",
+            content=[
+                ToolUseContentModel(
+                    content_type="toolUse",
+                    body=ToolUseContentModelBody(
+                        tool_use_id=f"tool-{turn}",
+                        name="internet_search",
+                        input={"query": f"query {turn}"},
+                    ),
+                )
+            ],
+        ),
+        SimpleMessageModel(
+            role="user",
+            content=[
+                ToolResultContentModel(
+                    content_type="toolResult",
+                    body=ToolResultContentModelBody(
+                        tool_use_id=f"tool-{turn}",
+                        content=[
+                            JsonToolResultModel(
+                                json={
+                                    "content": "result " * 100,
+                                    "source_link": f"https://example.com/{i}",
+                                }
+                            )
+                            for i in range(5)
+                        ],
+                        status="success",
+                    ),
+                )
+            ],
+        ),
+    ]
+
+
+def create_test_message_map(
+    turns: int, attachment_interval: int | None = None
+) -> tuple[dict[str, MessageModel], str]:
+    """Message map of `turns` questions (`user-<turn>`) and answers
+    (`bot-<turn>`), with a tool use in every answer and, if given, an attachment
+    in every `attachment_interval`-th question. Returns the map and the id of
+    the last answer.
+    """
+    message_map = {"system": create_test_message("system", "", None)}
+    parent = "system"
+    for turn in range(turns):
+        content: list[ContentModel] = [
+            TextContentModel(content_type="text", body=f"question {turn} " * 50)
+        ]
+        if attachment_interval is not None and turn % attachment_interval == 0:
+            content.append(
+                AttachmentContentModel(
+                    content_type="attachment",
+                    file_name="quarterly%20report.pdf",
+                    body=b"%PDF" + bytes(20000),
+                )
+            )
+        message_map[f"user-{turn}"] = create_test_message("user", content, parent)
+        message_map[f"bot-{turn}"] = create_test_message(
+            "assistant",
+            f"answer {turn} " * 50,
+            f"user-{turn}",
+            thinking_log=create_test_tool_log(turn),
+        )
+        parent = f"bot-{turn}"
+
+    return message_map, parent
+
+
+def create_test_conversation() -> ConversationModel:
+    """Untitled conversation `conv` holding only the system message."""
+    return ConversationModel(
+        id="conv",
+        create_time=1627984879.9,
+        title=DEFAULT_CONVERSATION_TITLE,
+        total_price=0,
+        message_map={"system": create_test_message("system", "", None)},
+        last_message_id="",
+        bot_id=None,
+        should_continue=False,
+    )
@@ -0,0 +1,87 @@
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, ".")
+from app.retrieval_cache import (
+    InMemoryRetrievalCacheBackend,
+    RetrievalCache,
+    RetrievalCacheKey,
+    normalize_query,
+)
+
+
+def _key(
+    knowledge_base_id: str = "kb1", query: str = "what is bedrock"
+) -> RetrievalCacheKey:
+    return RetrievalCacheKey(
+        knowledge_base_id=knowledge_base_id,
+        version="exec1",
+        bot_filter=None,
+        search_type="hybrid",
+        max_results=5,
+        query=normalize_query(query),
+    )
+
+
+class TestNormalizeQuery(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  What is\tBedrock?  "), "what is bedrock")
+        self.assertEqual(normalize_query("ＢＥＤＲＯＣＫとは？"), "bedrockとは")
+        self.assertNotEqual(
+            normalize_query("bedrock"), normalize_query("bedrock agent")
+        )
+
+
+class TestRetrievalCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = RetrievalCache(InMemoryRetrievalCacheBackend(max_size=10, ttl=60))
+        self.retrieve = MagicMock(return_value=[{"content": "Bedrock is ..."}])
+
+    def test_hit(self):
+        first = self.cache.get_or_retrieve(
+            _key(query="What is Bedrock?"), self.retrieve
+        )
+        second = self.cache.get_or_retrieve(
+            _key(query="what is bedrock"), self.retrieve
+        )
+        self.assertEqual(first, second)
+        self.retrieve.assert_called_once()
+        self.assertEqual(self.cache.stats.hits, 1)
+        self.assertEqual(self.cache.stats.misses, 1)
+
+        # Cached results are not affected by callers
+        second[0]["content"] = "modified"
+        third = self.cache.get_or_retrieve(_key(), self.retrieve)
+        self.assertEqual(third[0]["content"], "Bedrock is ...")
+
+    def test_invalidate_knowledge_base(self):
+        self.cache.get_or_retrieve(_key("kb1"), self.retrieve)
+        self.cache.get_or_retrieve(_key("kb2"), self.retrieve)
+        self.cache.backend.invalidate_knowledge_base("kb1")
+
+        self.cache.get_or_retrieve(_key("kb1"), self.retrieve)
+        self.cache.get_or_retrieve(_key("kb2"), self.retrieve)
+        self.assertEqual(self.retrieve.call_count, 3)
+
+    def test_errors_are_not_cached(self):
+        self.retrieve.side_effect = [Exception("throttled"), [{"content": "ok"}]]
+        with self.assertRaises(Exception):
+            self.cache.get_or_retrieve(_key(), self.retrieve)
+
+        self.assertEqual(
+            self.cache.get_or_retrieve(_key(), self.retrieve), [{"content": "ok"}]
+        )
+
+    def test_backend_failure(self):
+        backend = MagicMock()
+        backend.get.side_effect = ConnectionError()
+        backend.put.side_effect = ConnectionError()
+        cache = RetrievalCache(backend)
+        self.assertEqual(
+            cache.get_or_retrieve(_key(), self.retrieve), self.retrieve.return_value
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.strands_integration.agent import factory
+from app.strands_integration.agent.factory import (
+    agent_template_cache,
+    create_strands_agent,
+    invalidate_agent_templates,
+)
+
+sys.path.append("tests")
+from test_repositories.utils.bot_factory import create_test_private_bot
+
+
+class TestAgentTemplateCache(unittest.TestCase):
+    def setUp(self):
+        agent_template_cache.clear()
+        self.bot = create_test_private_bot(
+            "bot1", False, "user1", include_internet_tool=True
+        )
+
+    def tearDown(self):
+        agent_template_cache.clear()
+
+    def _create_agent(self, bot, **kwargs):
+        return create_strands_agent(
+            bot=bot,
+            instructions=[bot.instruction],
+            model_name="claude-v3.7-sonnet",
+            generation_params=bot.generation_params,
+            has_tools=True,
+            **kwargs,
+        )
+
+    def test_reuse_template(self):
+        with patch.object(
+            factory, "BedrockModel", wraps=factory.BedrockModel
+        ) as bedrock_model:
+            agent1 = self._create_agent(self.bot)
+            agent2 = self._create_agent(self.bot)
+
+        bedrock_model.assert_called_once()
+        self.assertIsNot(agent1, agent2)
+        self.assertIs(agent1.model, agent2.model)
+        self.assertEqual(agent1.system_prompt, self.bot.instruction)
+        self.assertEqual(agent1.tool_names, ["internet_search"])
+        self.assertEqual(agent2.tool_names, ["internet_search"])
+
+    def test_rebuild_on_bot_change(self):
+        agent1 = self._create_agent(self.bot)
+        modified_bot = self.bot.model_copy(update={"instruction": "Be brief."})
+        agent2 = self._create_agent(modified_bot)
+
+        self.assertIsNot(agent1.model, agent2.model)
+        self.assertEqual(agent2.system_prompt, "Be brief.")
+
+    def test_rebuild_on_flags(self):
+        agent1 = self._create_agent(self.bot)
+        agent2 = self._create_agent(self.bot, enable_reasoning=True)
+
+        self.assertIsNot(agent1.model, agent2.model)
+
+    def test_invalidate(self):
+        self._create_agent(self.bot)
+        self.assertEqual(invalidate_agent_templates("other"), 0)
+        self.assertEqual(invalidate_agent_templates(self.bot.id), 1)
+        self.assertEqual(len(agent_template_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,6 +14,7 @@ class _FakeAgent:
         self.callback_handler = None
         self.messages = []
         self.event_loop_metrics = SimpleNamespace(accumulated_usage={})
+        self.tool_registry = SimpleNamespace(get_all_tool_specs=lambda: [])
 
     def __call__(self, messages):
         self.messages = [
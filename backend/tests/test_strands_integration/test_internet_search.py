@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.strands_integration.tools import internet_search
+from app.strands_integration.tools.internet_search import (
+    SUMMARY_MIN_CONTENT_LENGTH,
+    _summarize_results,
+    summary_cache,
+)
+
+
+def _result(i: int, length: int = SUMMARY_MIN_CONTENT_LENGTH) -> dict[str, str]:
+    return {
+        "content": "x" * length,
+        "source_name": f"Page {i}",
+        "source_link": f"https://example.com/{i}",
+    }
+
+
+class TestSummarizeResults(unittest.TestCase):
+    def setUp(self):
+        summary_cache.clear()
+
+    def tearDown(self):
+        summary_cache.clear()
+
+    def test_summarize_concurrently(self):
+        barrier = threading.Barrier(4, timeout=5)
+
+        def summarize(content, title, url, query):
+            # Fails unless the summaries run concurrently
+            barrier.wait()
+            return f"Summary of {title}"
+
+        with patch.object(internet_search, "_invoke_summary_model", summarize):
+            results = _summarize_results([_result(i) for i in range(4)], "query")
+
+        self.assertEqual(
+            [result["content"] for result in results],
+            [f"Summary of Page {i}" for i in range(4)],
+        )
+
+    def test_skip_short_content(self):
+        with patch.object(internet_search, "_invoke_summary_model") as summarize:
+            results = _summarize_results([_result(0, length=10)], "query")
+
+        summarize.assert_not_called()
+        self.assertEqual(results[0]["content"], "x" * 10)
+
+    def test_partial_results_on_deadline(self):
+        release = threading.Event()
+
+        def summarize(content, title, url, query):
+            if title == "Page 1":
+                release.wait(timeout=5)
+            return f"Summary of {title}"
+
+        with patch.object(
+            internet_search, "_invoke_summary_model", summarize
+        ), patch.object(internet_search, "SUMMARY_DEADLINE", 0.2):
+            started = time.monotonic()
+            results = _summarize_results([_result(0), _result(1)], "query")
+            release.set()
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(results[0]["content"], "Summary of Page 0")
+        self.assertTrue(results[1]["content"].startswith("xxx"))
+
+    def test_cache_by_url_and_query(self):
+        with patch.object(
+            internet_search, "_invoke_summary_model", return_value="Summary"
+        ) as summarize:
+            _summarize_results([_result(0)], "query")
+            _summarize_results([_result(0)], "query")
+            self.assertEqual(summarize.call_count, 1)
+
+            _summarize_results([_result(0)], "another query")
+            self.assertEqual(summarize.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.repositories.common import RecordNotFoundError
+from app.usecases.bot_usage import BotUsageAggregator
+
+sys.path.append("tests")
+from test_repositories.utils.bot_factory import create_test_public_bot
+from test_usecases.utils.user_factory import create_test_user
+
+
+class TestBotUsageAggregator(unittest.TestCase):
+    def setUp(self):
+        self.owner = create_test_user("owner")
+        self.bot = create_test_public_bot("bot1", False, "owner")
+
+        patchers = {
+            name: patch(f"app.usecases.bot_usage.{name}")
+            for name in [
+                "update_bot_stats",
+                "update_bot_last_used_time",
+                "update_alias_last_used_time",
+            ]
+        }
+        self.mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+
+    def test_buffer_increments(self):
+        aggregator = BotUsageAggregator(flush_interval=60, last_used_granularity=60)
+        for i in range(10):
+            aggregator.record(create_test_user(f"user{i}"), self.bot)
+
+        # Only the first use is written, the rest is buffered
+        self.mocks["update_bot_stats"].assert_called_once_with("owner", "bot1", 1)
+        self.assertEqual(aggregator.pending_count, 9)
+
+        aggregator.flush()
+        self.mocks["update_bot_stats"].assert_called_with("owner", "bot1", 9)
+        self.assertEqual(aggregator.pending_count, 0)
+
+    def test_write_after_interval(self):
+        aggregator = BotUsageAggregator(flush_interval=0.05, last_used_granularity=60)
+        for _ in range(3):
+            aggregator.record(self.owner, self.bot)
+        time.sleep(0.1)
+        aggregator.record(self.owner, self.bot)
+
+        self.assertEqual(
+            [call.args for call in self.mocks["update_bot_stats"].call_args_list],
+            [("owner", "bot1", 1), ("owner", "bot1", 3)],
+        )
+
+    def test_flush_burst_without_later_use(self):
+        aggregator = BotUsageAggregator(flush_interval=0.05, last_used_granularity=60)
+        for i in range(10):
+            aggregator.record(create_test_user(f"user{i}"), self.bot)
+
+        # Not due yet: the burst is still within the flush interval
+        aggregator.flush_due()
+        self.mocks["update_bot_stats"].assert_called_once_with("owner", "bot1", 1)
+
+        # Any later invocation writes the rest, without another use of the bot
+        time.sleep(0.1)
+        aggregator.flush_due()
+        self.mocks["update_bot_stats"].assert_called_with("owner", "bot1", 9)
+        self.assertEqual(aggregator.pending_count, 0)
+
+    def test_last_used_granularity(self):
+        aggregator = BotUsageAggregator(flush_interval=60, last_used_granularity=60)
+        user = create_test_user("user1")
+        for _ in range(3):
+            aggregator.record(self.owner, self.bot)
+            aggregator.record(user, self.bot)
+
+        self.mocks["update_bot_last_used_time"].assert_called_once_with("owner", "bot1")
+        self.mocks["update_alias_last_used_time"].assert_called_once_with(
+            "user1", "bot1"
+        )
+
+    def test_no_alias(self):
+        aggregator = BotUsageAggregator()
+        self.mocks["update_alias_last_used_time"].side_effect = RecordNotFoundError()
+
+        with self.assertRaises(RecordNotFoundError):
+            aggregator.record(create_test_user("user1"), self.bot)
+        self.mocks["update_bot_stats"].assert_not_called()
+        self.assertEqual(aggregator.pending_count, 0)
+
+    def test_retry_failed_write(self):
+        aggregator = BotUsageAggregator(flush_interval=60, last_used_granularity=60)
+        self.mocks["update_bot_stats"].side_effect = [Exception("throttled"), None]
+
+        with self.assertRaises(Exception):
+            aggregator.record(self.owner, self.bot)
+        self.assertEqual(aggregator.pending_count, 1)
+
+        # The failed increment is written with the next use
+        aggregator.record(self.owner, self.bot)
+        self.mocks["update_bot_stats"].assert_called_with("owner", "bot1", 2)
+        self.assertEqual(aggregator.pending_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
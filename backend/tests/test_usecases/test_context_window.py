@@ -0,0 +1,186 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.repositories.models.conversation import (
+    HistorySummaryModel,
+    SimpleMessageModel,
+    TextContentModel,
+)
+from app.usecases.chat import trace_to_root
+from app.usecases.context_window import (
+    CONTEXT_TRUNCATE_RATIO,
+    estimate_message_tokens,
+    fit_context_window,
+    get_input_token_budget,
+    plan_context_window,
+    summarize_history,
+)
+
+sys.path.append("tests")
+from test_repositories.utils.conversation_factory import (
+    TEST_MODEL,
+    create_test_message_map,
+)
+
+
+def _create_messages(turns: int) -> list[SimpleMessageModel]:
+    """Branch of `turns` questions and answers, with a tool use in every
+    answer."""
+    message_map, last_id = create_test_message_map(turns)
+    return trace_to_root(last_id, message_map, conversation_id="conv", user_id="user")
+
+
+def _tokens(messages: list[SimpleMessageModel]) -> int:
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+class TestContextWindow(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("app.usecases.context_window.find_history_summary")
+        self.mock_find_history_summary = patcher.start()
+        self.mock_find_history_summary.return_value = None
+        self.addCleanup(patcher.stop)
+
+        patcher = patch("app.usecases.context_window.submit_background_task")
+        self.mock_submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fit(self, messages: list[SimpleMessageModel], budget: int):
+        with patch(
+            "app.usecases.context_window.get_input_token_budget",
+            return_value=budget,
+        ):
+            return fit_context_window(
+                user_id="user",
+                conversation_id="conv",
+                messages=messages,
+                model=TEST_MODEL,
+                instructions=[],
+            )
+
+    def test_budget_of_model(self):
+        self.assertGreater(get_input_token_budget(TEST_MODEL), 100000)
+        self.assertLess(get_input_token_budget(TEST_MODEL), 200000)
+        self.assertLess(
+            get_input_token_budget("mistral-7b-instruct"),
+            get_input_token_budget(TEST_MODEL),
+        )
+
+    def test_history_within_budget(self):
+        messages = _create_messages(10)
+        window = self._fit(messages, _tokens(messages))
+
+        self.assertEqual(window.messages, messages)
+        self.assertIsNone(window.summary)
+        self.mock_find_history_summary.assert_not_called()
+        self.mock_submit.assert_not_called()
+
+    def test_old_turns_are_dropped(self):
+        messages = _create_messages(10)
+        budget = _tokens(messages) // 2
+        window = self._fit(messages, budget)
+
+        self.assertLessEqual(_tokens(window.messages), budget)
+        # Cut at the start of a turn
+        first = window.messages[0]
+        self.assertEqual(first.role, "user")
+        self.assertIsInstance(first.content[0], TextContentModel)
+        self.assertIsNone(window.summary)
+        self.mock_submit.assert_called_once()
+
+    def test_cut_stays_while_history_fits(self):
+        messages = _create_messages(30)
+        # Room for about five turns
+        budget = _tokens(messages[:21])
+
+        # Each turn adds a question, tool use, tool result and answer
+        ends = range(25, len(messages) + 1, 4)
+        previous = None
+        moves = 0
+        for end in ends:
+            start, _ = plan_context_window(messages[:end], budget)
+            self.assertLessEqual(_tokens(messages[start:end]), budget)
+            if previous is not None and start != previous:
+                # Only once the history from the cut exceeds the budget
+                self.assertGreater(_tokens(messages[previous:end]), budget)
+                moves += 1
+            previous = start
+
+        self.assertLessEqual(moves, len(ends) // 2)
+
+    def test_last_turn_is_kept(self):
+        messages = _create_messages(3)
+        window = self._fit(messages, 10)
+        self.assertEqual(window.messages, messages[-4:])
+
+    def test_stored_summary_is_used(self):
+        messages = _create_messages(10)
+        budget = _tokens(messages) * 2 // 3
+        start, _ = plan_context_window(messages, budget)
+        summary = HistorySummaryModel(
+            until_message_id=messages[start]._cache_key[1],  # type: ignore[index]
+            body="The user asked questions.",
+            create_time=1627984879.9,
+        )
+        self.mock_find_history_summary.return_value = summary
+
+        # The window stays while the history grows
+        messages += _create_messages(11)[-4:]
+        window = self._fit(messages, budget)
+
+        self.assertEqual(window.summary, summary)
+        self.assertEqual(window.messages, messages[start:])
+        self.mock_submit.assert_not_called()
+
+    def test_summary_not_repeated(self):
+        messages = _create_messages(10)
+        budget = _tokens(messages) // 2
+        start, _ = plan_context_window(messages, budget)
+        # Too long to be sent with the history
+        self.mock_find_history_summary.return_value = HistorySummaryModel(
+            until_message_id=messages[start]._cache_key[1],  # type: ignore[index]
+            body="summary " * budget,
+            create_time=1627984879.9,
+        )
+
+        window = self._fit(messages, budget)
+
+        self.assertEqual(window.messages, messages[start:])
+        self.assertIsNone(window.summary)
+        self.mock_submit.assert_not_called()
+
+    @patch("app.usecases.context_window.store_history_summary")
+    @patch("app.usecases.context_window.call_converse_api")
+    def test_summarize_history(self, mock_call_converse_api, mock_store):
+        mock_call_converse_api.return_value = {
+            "output": {"message": {"content": [{"text": "New summary."}]}},
+            "usage": {"inputTokens": 1000, "outputTokens": 100},
+        }
+        messages = _create_messages(2)
+        previous = HistorySummaryModel(
+            until_message_id="user-0", body="Old summary.", create_time=0
+        )
+
+        summary = summarize_history(
+            user_id="user",
+            conversation_id="conv",
+            messages=messages,
+            until_message_id="user-2",
+            previous_summary=previous,
+        )
+
+        self.assertEqual(summary.body, "New summary.")
+        self.assertEqual(summary.until_message_id, "user-2")
+        mock_store.assert_called_once_with("user", "conv", summary)
+
+        prompt = mock_call_converse_api.call_args.args[0]["messages"][0]["content"][0]
+        self.assertIn("Old summary.", prompt["text"])
+        self.assertIn("User: question", prompt["text"])
+        # Tool uses and results are left out
+        self.assertNotIn("result", prompt["text"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.repositories.bulk_delete import BulkDeleteProgress
+from app.repositories.models.conversation import ConversationDeletionJobModel
+from app.usecases.conversation_deletion import (
+    continue_conversation_deletion,
+    start_conversation_deletion,
+)
+
+sys.path.append("tests")
+from test_usecases.utils.user_factory import create_test_user
+
+
+class TestConversationDeletion(unittest.TestCase):
+    def setUp(self):
+        self.user = create_test_user("user1")
+        self.jobs: dict[str, ConversationDeletionJobModel] = {}
+
+        def store(user_id, job):
+            self.jobs[job.id] = job.model_copy()
+
+        def find(user_id, job_id):
+            return self.jobs[job_id].model_copy()
+
+        patchers = [
+            patch(
+                "app.usecases.conversation_deletion.store_conversation_deletion_job",
+                side_effect=store,
+            ),
+            patch(
+                "app.usecases.conversation_deletion.find_conversation_deletion_job_by_id",
+                side_effect=find,
+            ),
+            patch(
+                "app.usecases.conversation_deletion.acquire_conversation_deletion_job_lease",
+                return_value=True,
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _delete_slices(self, mock_delete, slices: list[tuple[int, bool]]):
+        def delete(user_id, deadline, on_progress):
+            deleted_items, completed = slices.pop(0)
+            on_progress(BulkDeleteProgress(deleted_items=deleted_items))
+            return completed
+
+        mock_delete.side_effect = delete
+
+    def test_run_until_completed(self):
+        with patch(
+            "app.usecases.conversation_deletion.delete_conversation_by_user_id"
+        ) as mock_delete:
+            self._delete_slices(mock_delete, [(100, False), (50, True)])
+
+            job = start_conversation_deletion(self.user)
+            self.assertEqual(job.status, "RUNNING")
+            self.assertEqual(self.jobs[job.id].deleted_items, 100)
+
+            job = continue_conversation_deletion(self.user, job.id)
+            self.assertEqual(job.status, "SUCCEEDED")
+            self.assertEqual(job.deleted_items, 150)
+
+            # A completed job is only reported
+            job = continue_conversation_deletion(self.user, job.id)
+            self.assertEqual(mock_delete.call_count, 2)
+
+    def test_failure(self):
+        with patch(
+            "app.usecases.conversation_deletion.delete_conversation_by_user_id",
+            side_effect=Exception("throttled"),
+        ):
+            job = start_conversation_deletion(self.user)
+
+        self.assertEqual(job.status, "FAILED")
+        self.assertEqual(self.jobs[job.id].error, "throttled")
+
+    def test_leased_job(self):
+        with patch(
+            "app.usecases.conversation_deletion.delete_conversation_by_user_id"
+        ) as mock_delete:
+            self._delete_slices(mock_delete, [(100, False)])
+            job = start_conversation_deletion(self.user)
+
+            with patch(
+                "app.usecases.conversation_deletion.acquire_conversation_deletion_job_lease",
+                return_value=False,
+            ):
+                job = continue_conversation_deletion(self.user, job.id)
+
+        # Another request is working on the job
+        self.assertEqual(mock_delete.call_count, 1)
+        self.assertEqual(job.status, "RUNNING")
+        self.assertEqual(job.deleted_items, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
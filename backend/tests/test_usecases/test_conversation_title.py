@@ -0,0 +1,239 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.bedrock import ESTIMATED_CHARS_PER_TOKEN
+from app.routes.schemas.conversation import ChatInput, MessageInput, TextContent
+from app.usecases.chat import chat, propose_conversation_title
+from app.usecases.conversation_title import (
+    DEFAULT_CONVERSATION_TITLE,
+    TITLE_MAX_INPUT_TOKENS,
+    TITLE_PROMPT,
+    TitleGeneration,
+    _compose_title_messages,
+    title_generation_status,
+)
+
+sys.path.append("tests")
+from test_repositories.utils.conversation_factory import (
+    TEST_MODEL,
+    create_test_conversation,
+    create_test_message,
+    create_test_text_message,
+)
+from test_usecases.utils.user_factory import create_test_user
+
+
+class TestComposeTitleMessages(unittest.TestCase):
+    def test_prompt_follows_first_message(self):
+        messages = _compose_title_messages([create_test_text_message("user", "Hello")])
+
+        # Roles alternate even before the first answer
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(
+            [content.body for content in messages[0].content],  # type: ignore
+            ["Hello", TITLE_PROMPT],
+        )
+
+    def test_first_messages_only(self):
+        messages = []
+        for turn in range(10):
+            messages += [
+                create_test_text_message("user", f"question {turn} " * 1000),
+                create_test_text_message("assistant", f"answer {turn} " * 1000),
+            ]
+
+        title_messages = _compose_title_messages(messages)
+        text = "".join(
+            content.body  # type: ignore
+            for message in title_messages
+            for content in message.content
+            if content.body != TITLE_PROMPT  # type: ignore
+        )
+        self.assertLessEqual(
+            len(text), TITLE_MAX_INPUT_TOKENS * ESTIMATED_CHARS_PER_TOKEN
+        )
+        self.assertNotIn("question 1 ", text)
+        self.assertEqual(title_messages[-1].content[-1].body, TITLE_PROMPT)  # type: ignore
+
+
+@patch("app.usecases.conversation_title.replace_conversation_title")
+@patch("app.usecases.conversation_title._call_title_model", return_value="Title")
+@patch("app.usecases.conversation_title.submit_background_task")
+class TestTitleGeneration(unittest.TestCase):
+    def setUp(self):
+        title_generation_status.clear()
+        self.addCleanup(title_generation_status.clear)
+
+    def _start(self, mock_submit: MagicMock) -> tuple[TitleGeneration, MagicMock]:
+        conversation = create_test_conversation()
+        title_generation = TitleGeneration("user", conversation)
+        title_generation.start([create_test_text_message("user", "Hello")])
+        mock_submit.assert_called_once()
+        return title_generation, mock_submit.call_args.args[1]
+
+    def test_title_ready_before_store(
+        self, mock_submit, mock_call_title_model, mock_replace_conversation_title
+    ):
+        title_generation, task = self._start(mock_submit)
+        task()
+
+        stored_titles = []
+        title_generation.store(
+            lambda: stored_titles.append(title_generation.conversation.title)
+        )
+
+        self.assertEqual(stored_titles, ["Title"])
+        mock_replace_conversation_title.assert_not_called()
+
+    def test_title_ready_after_store(
+        self, mock_submit, mock_call_title_model, mock_replace_conversation_title
+    ):
+        title_generation, task = self._start(mock_submit)
+
+        stored_titles = []
+        title_generation.store(
+            lambda: stored_titles.append(title_generation.conversation.title)
+        )
+        task()
+
+        self.assertEqual(stored_titles, [DEFAULT_CONVERSATION_TITLE])
+        mock_replace_conversation_title.assert_called_once_with(
+            "user", "conv", DEFAULT_CONVERSATION_TITLE, "Title"
+        )
+
+    def test_title_changed_after_store(
+        self, mock_submit, mock_call_title_model, mock_replace_conversation_title
+    ):
+        title_generation, task = self._start(mock_submit)
+        title_generation.store(lambda: None)
+        # Renamed by the user before the title was ready
+        mock_replace_conversation_title.return_value = False
+
+        with self.assertLogs("app.usecases.conversation_title", level="INFO") as logs:
+            task()
+        self.assertIn("already changed", logs.output[-1])
+
+    def test_empty_title_is_failed(
+        self, mock_submit, mock_call_title_model, mock_replace_conversation_title
+    ):
+        title_generation, task = self._start(mock_submit)
+        self.assertEqual(title_generation_status.get(("user", "conv")), "running")
+
+        mock_call_title_model.return_value = ""
+        task()
+        self.assertEqual(title_generation_status.get(("user", "conv")), "failed")
+        mock_replace_conversation_title.assert_not_called()
+
+
+class TestProposeTitle(unittest.TestCase):
+    def setUp(self):
+        title_generation_status.clear()
+        self.addCleanup(title_generation_status.clear)
+
+    @patch("app.usecases.chat.generate_title")
+    @patch("app.usecases.chat.find_conversation_branch")
+    @patch(
+        "app.usecases.conversation_title.find_conversation_title",
+        return_value="Title",
+    )
+    def test_generated_title_is_read(
+        self, mock_find_title, mock_find_branch, mock_generate_title
+    ):
+        self.assertEqual(propose_conversation_title("user", "conv"), "Title")
+        mock_find_branch.assert_not_called()
+        mock_generate_title.assert_not_called()
+
+    @patch("app.usecases.conversation_title.TITLE_WAIT_INTERVAL", 0.01)
+    @patch("app.usecases.chat.generate_title")
+    @patch("app.usecases.chat.find_conversation_branch")
+    @patch("app.usecases.conversation_title.find_conversation_title")
+    def test_wait_for_background_title(
+        self, mock_find_title, mock_find_branch, mock_generate_title
+    ):
+        mock_find_title.side_effect = [DEFAULT_CONVERSATION_TITLE] * 3 + ["Title"]
+
+        self.assertEqual(propose_conversation_title("user", "conv"), "Title")
+        self.assertEqual(mock_find_title.call_count, 4)
+        mock_generate_title.assert_not_called()
+
+    @patch("app.usecases.conversation_title.TITLE_WAIT_TIMEOUT", 0.05)
+    @patch("app.usecases.conversation_title.TITLE_WAIT_INTERVAL", 0.01)
+    @patch("app.usecases.chat.generate_title", return_value="Title")
+    @patch("app.usecases.chat.find_conversation_branch")
+    @patch(
+        "app.usecases.conversation_title.find_conversation_title",
+        return_value=DEFAULT_CONVERSATION_TITLE,
+    )
+    def test_title_not_generated_yet(
+        self, mock_find_title, mock_find_branch, mock_generate_title
+    ):
+        mock_find_branch.return_value = create_test_conversation()
+
+        self.assertEqual(propose_conversation_title("user", "conv"), "Title")
+        mock_generate_title.assert_called_once()
+
+    @patch("app.usecases.chat.generate_title", return_value="Title")
+    @patch("app.usecases.chat.find_conversation_branch")
+    @patch(
+        "app.usecases.conversation_title.find_conversation_title",
+        return_value=DEFAULT_CONVERSATION_TITLE,
+    )
+    def test_failed_title_is_not_waited_for(
+        self, mock_find_title, mock_find_branch, mock_generate_title
+    ):
+        mock_find_branch.return_value = create_test_conversation()
+        title_generation_status.put(("user", "conv"), "failed")
+
+        self.assertEqual(propose_conversation_title("user", "conv"), "Title")
+        mock_find_title.assert_called_once()
+        mock_generate_title.assert_called_once()
+
+
+class _Stop(Exception):
+    pass
+
+
+@patch("app.usecases.chat.trace_to_root", side_effect=_Stop())
+@patch("app.usecases.chat.TitleGeneration")
+@patch("app.usecases.chat.prepare_conversation")
+class TestChatTitle(unittest.TestCase):
+    def _chat(self, mock_prepare_conversation, **kwargs):
+        conversation = create_test_conversation()
+        conversation.message_map["user-msg"] = create_test_message(
+            "user", "Hello", "system"
+        )
+        mock_prepare_conversation.return_value = ("user-msg", conversation, None)
+        chat_input = ChatInput(
+            conversation_id="conv",
+            message=MessageInput(
+                role="user",
+                content=[TextContent(content_type="text", body="Hello")],
+                model=TEST_MODEL,
+                parent_message_id=None,
+                message_id=None,
+            ),
+            bot_id=None,
+            continue_generate=False,
+            enable_reasoning=False,
+        )
+        # Stops the turn once the history is traced
+        with self.assertRaises(_Stop):
+            chat(create_test_user("user"), chat_input=chat_input, **kwargs)
+
+    def test_interactive_chat_is_titled(
+        self, mock_prepare_conversation, mock_title_generation, mock_trace_to_root
+    ):
+        self._chat(mock_prepare_conversation, generate_conversation_title=True)
+        mock_title_generation.assert_called_once()
+
+    def test_published_api_chat_is_not_titled(
+        self, mock_prepare_conversation, mock_title_generation, mock_trace_to_root
+    ):
+        self._chat(mock_prepare_conversation)
+        mock_title_generation.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
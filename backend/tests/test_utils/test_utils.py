@@ -1,7 +1,11 @@
 import logging
 import sys
+import threading
+import time
 import unittest
 
+import boto3
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -40,5 +44,94 @@ class TestUtils(unittest.TestCase):
         assert reg == "us-west-2"
 
 
+class TestAwsClientRegistry(unittest.TestCase):
+    def setUp(self):
+        from app.utils import AwsClientRegistry
+
+        self.registry = AwsClientRegistry(max_pool_connections=16, max_attempts=3)
+
+    def test_reuse_client(self):
+        client = self.registry.get("s3", region_name="us-east-1")
+        self.assertIs(client, self.registry.get("s3", region_name="us-east-1"))
+        self.assertIsNot(client, self.registry.get("s3", region_name="us-west-2"))
+        self.assertIsNot(
+            client,
+            self.registry.get(
+                "s3", region_name="us-east-1", endpoint_url="http://localhost:4566"
+            ),
+        )
+
+    def test_config(self):
+        client = self.registry.get("s3", region_name="us-east-1")
+        config = client.meta.config
+        self.assertEqual(config.max_pool_connections, 16)
+        self.assertEqual(config.retries["mode"], "adaptive")
+        self.assertEqual(config.retries["total_max_attempts"], 3)
+        self.assertTrue(config.tcp_keepalive)
+
+        presign_client = self.registry.get(
+            "s3", region_name="us-east-1", signature_version="v4"
+        )
+        self.assertIsNot(client, presign_client)
+        self.assertEqual(presign_client.meta.config.signature_version, "v4")
+        # Defaults are kept for the other options
+        self.assertEqual(presign_client.meta.config.max_pool_connections, 16)
+
+    def test_concurrent_get(self):
+        clients = []
+        barrier = threading.Barrier(8)
+
+        def get():
+            barrier.wait()
+            clients.append(self.registry.get("dynamodb", region_name="us-east-1"))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(clients), 8)
+        self.assertTrue(all(client is clients[0] for client in clients))
+
+    def test_benchmark(self):
+        # Per-call overhead of a new client for every call vs. the registry.
+        calls = 20
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            boto3.client("bedrock-runtime", region_name="us-east-1")
+        uncached = (time.perf_counter() - started) / calls
+
+        self.registry.get("bedrock-runtime", region_name="us-east-1")
+        started = time.perf_counter()
+        for _ in range(calls):
+            self.registry.get("bedrock-runtime", region_name="us-east-1")
+        cached = (time.perf_counter() - started) / calls
+
+        logger.info(
+            f"Client per call: {uncached * 1000:.3f}ms, "
+            f"registry: {cached * 1000:.3f}ms"
+        )
+        self.assertLess(cached * 10, uncached)
+
+
+class TestLazyClient(unittest.TestCase):
+    def test_create_on_first_use(self):
+        from app.utils import LazyClient
+
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return boto3.client("s3", region_name="us-east-1")
+
+        client = LazyClient(factory)
+        self.assertEqual(calls, [])
+        self.assertEqual(client.meta.region_name, "us-east-1")
+        client.meta
+        self.assertEqual(calls, [1])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,269 @@
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+os.environ.setdefault("WEBSOCKET_SESSION_TABLE_NAME", "test-websocket-session-table")
+from app.websocket import (
+    STREAM_FRAME_MAX_BYTES,
+    WEBSOCKET_SEND_ATTEMPTS,
+    NotificationSender,
+    concatenate_message_parts,
+    get_gatewayapi_client,
+)
+
+
+class TestNotificationSender(unittest.TestCase):
+    def setUp(self):
+        self.gatewayapi = MagicMock()
+        self.patcher = patch(
+            "app.websocket.get_gatewayapi_client", return_value=self.gatewayapi
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _finish(self, sender: NotificationSender) -> list[dict]:
+        sender.finish()
+        sender.wait()
+        frames = [
+            json.loads(call.kwargs["Data"])
+            for call in self.gatewayapi.post_to_connection.call_args_list
+        ]
+        # Frames are posted concurrently, so restore the order like the client
+        frames.sort(key=lambda frame: frame.pop("seq"))
+        return frames
+
+    def test_merge_consecutive_tokens(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev", connection_id="connection"
+        )
+        sender.on_reasoning("Let me ")
+        sender.on_reasoning("think.")
+        sender.on_stream("Hello")
+        sender.on_stream(", world")
+        sender.notify(payload=dict(status="STREAMING_END"))
+
+        frames = self._finish(sender)
+        self.assertEqual(
+            frames,
+            [
+                {"status": "REASONING", "completion": "Let me think."},
+                {"status": "STREAMING", "completion": "Hello, world"},
+                {"status": "STREAMING_END"},
+            ],
+        )
+        self.assertEqual(sender.stats.frame_count, 3)
+        self.assertEqual(sender.stats.token_count, 4)
+
+    def test_split_frames_on_size(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev", connection_id="connection"
+        )
+        token = "a" * 1024
+        for _ in range(64):
+            sender.on_stream(token)
+
+        frames = self._finish(sender)
+        self.assertGreater(len(frames), 1)
+        self.assertEqual("".join(f["completion"] for f in frames), token * 64)
+        for frame in frames:
+            self.assertLessEqual(
+                len(json.dumps(frame).encode("utf-8")), STREAM_FRAME_MAX_BYTES + 64
+            )
+
+    def test_flush_on_time_budget(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            flush_interval_ms=10,
+        )
+        sent = threading.Event()
+        self.gatewayapi.post_to_connection.side_effect = lambda **kwargs: sent.set()
+
+        sender.on_stream("Hello")
+        # Sent without waiting for more tokens or `finish`
+        self.assertTrue(sent.wait(timeout=5))
+        sender.finish()
+        sender.wait()
+
+    def test_bounded_in_flight_and_backpressure(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            flush_interval_ms=0,
+            max_in_flight=2,
+            max_queued=2,
+        )
+        release = threading.Event()
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def slow_post(**kwargs):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            release.wait(timeout=5)
+            with lock:
+                in_flight -= 1
+
+        self.gatewayapi.post_to_connection.side_effect = slow_post
+
+        def produce():
+            for i in range(10):
+                sender.notify(payload=dict(status="AGENT_THINKING", log={str(i): {}}))
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        # The producer is blocked while the sends are stalled
+        producer.join(timeout=0.5)
+        self.assertTrue(producer.is_alive())
+
+        release.set()
+        producer.join(timeout=5)
+        frames = self._finish(sender)
+        self.assertEqual(
+            [frame["log"] for frame in frames], [{str(i): {}} for i in range(10)]
+        )
+        self.assertLessEqual(max_in_flight, 2)
+
+    def test_no_thread_without_notification(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev", connection_id="connection"
+        )
+        started = time.monotonic()
+        sender.finish()
+        sender.wait()
+        self.assertLess(time.monotonic() - started, 1)
+        self.gatewayapi.post_to_connection.assert_not_called()
+
+    def test_stop_on_gone_connection(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            max_in_flight=1,
+            max_queued=1,
+        )
+
+        class GoneException(Exception):
+            pass
+
+        self.gatewayapi.exceptions.GoneException = GoneException
+        self.gatewayapi.exceptions.ForbiddenException = GoneException
+        self.gatewayapi.post_to_connection.side_effect = GoneException()
+
+        # Producers are not blocked once the connection is gone
+        for i in range(10):
+            sender.notify(payload=dict(status="AGENT_THINKING", log={}))
+        sender.finish()
+        sender.wait(timeout=5)
+        self.assertEqual(self.gatewayapi.post_to_connection.call_count, 1)
+
+    def _raise_on(self, failing: dict[int, int]):
+        """Fail to post the frames with the given `seq` the given number of times."""
+
+        class GoneException(Exception):
+            pass
+
+        self.gatewayapi.exceptions.GoneException = GoneException
+        self.gatewayapi.exceptions.ForbiddenException = GoneException
+
+        def post(**kwargs):
+            seq = json.loads(kwargs["Data"])["seq"]
+            if failing.get(seq, 0) > 0:
+                failing[seq] -= 1
+                raise ConnectionError("Connection reset")
+
+        self.gatewayapi.post_to_connection.side_effect = post
+
+    @patch("app.websocket.WEBSOCKET_SEND_BACKOFF", 0)
+    def test_retry_failed_send(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev", connection_id="connection"
+        )
+        self._raise_on({0: 2})
+
+        sender.notify(payload=dict(status="AGENT_THINKING", log={}))
+        sender.notify(payload=dict(status="STREAMING_END"))
+
+        frames = self._finish(sender)
+        self.assertEqual(
+            [frame["status"] for frame in frames[-2:]],
+            ["AGENT_THINKING", "STREAMING_END"],
+        )
+        self.assertEqual(sender.stats.frame_count, 2)
+
+    @patch("app.websocket.WEBSOCKET_SEND_BACKOFF", 0)
+    def test_drop_frame_after_attempts(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev", connection_id="connection"
+        )
+        self._raise_on({1: 100})
+
+        for i in range(3):
+            sender.notify(payload=dict(status="AGENT_THINKING", log={str(i): {}}))
+        sender.notify(payload=dict(status="STREAMING_END"))
+
+        sender.finish()
+        sender.wait()
+        delivered = [
+            json.loads(call.kwargs["Data"])
+            for call in self.gatewayapi.post_to_connection.call_args_list
+        ]
+        # The dropped frame does not stop the frames behind it
+        self.assertEqual(sorted({frame["seq"] for frame in delivered}), [0, 1, 2, 3])
+        self.assertEqual(sender.stats.frame_count, 3)
+        self.assertEqual(
+            sum(frame["seq"] == 1 for frame in delivered), WEBSOCKET_SEND_ATTEMPTS
+        )
+
+
+class TestGatewayApiClient(unittest.TestCase):
+    def test_no_client_retries(self):
+        # Retried by the sender only, so that one frame cannot hold up the rest
+        client = get_gatewayapi_client("https://example.com/dev")
+        self.assertEqual(client.meta.config.retries["total_max_attempts"], 1)
+
+
+class TestConcatenateMessageParts(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("app.websocket.dynamodb_raw_client")
+        self.mock_client = self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_concatenate_message_parts(self):
+        self.mock_client.get_paginator.return_value.paginate.return_value = [
+            {
+                "Items": [
+                    {"UserId": {"S": "user"}},
+                    {"MessagePart": {"S": '{"message": '}},
+                ]
+            },
+            {"Items": [{"MessagePart": {"S": '"Hello"}'}}]},
+        ]
+
+        self.assertEqual(
+            concatenate_message_parts("connection"), '{"message": "Hello"}'
+        )
+        self.mock_client.get_paginator.assert_called_once_with("query")
+
+    def test_no_session(self):
+        self.mock_client.get_paginator.return_value.paginate.return_value = [
+            {"Items": [{"MessagePart": {"S": "{}"}}]},
+        ]
+
+        with self.assertRaises(ValueError):
+            concatenate_message_parts("connection")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -804,6 +804,7 @@ export class BotStore extends Construct {
                 "ShouldContinue",
                 "LastMessageId",
                 "MessageMap",
+                "EncodedMessageMap",
                 "parsed_message_map",
               ]
             }
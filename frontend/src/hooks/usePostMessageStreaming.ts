@@ -4,6 +4,7 @@ import { create } from 'zustand';
 import i18next from 'i18next';
 import { StreamingEvent } from './xstates/streaming';
 import { PostStreamingStatus } from '../constants';
+import { createFrameSequencer } from '../utils/FrameUtils';
 
 const WS_ENDPOINT: string = import.meta.env.VITE_APP_WS_ENDPOINT;
 const CHUNK_SIZE = 32 * 1024; //32KB
@@ -50,6 +51,116 @@ const usePostMessageStreaming = create<{
           );
         };
 
+        // eslint-disable-next-line @typescript-eslint/no-explicit-any
+        const processData = (data: any) => {
+          if (data.status) {
+            console.log('[FRONTEND_WS] Processing status:', data.status);
+            switch (data.status) {
+              case PostStreamingStatus.AGENT_THINKING: {
+                Object.entries(data.log).forEach(([toolUseId, toolInfo]) => {
+                  const typedToolInfo = toolInfo as {
+                    name: string;
+                    input: { [key: string]: any }; // eslint-disable-line @typescript-eslint/no-explicit-any
+                  };
+                  handleStreamingEvent({
+                    type: 'tool-use',
+                    toolUseId: toolUseId,
+                    name: typedToolInfo.name,
+                    input: typedToolInfo.input,
+                  });
+                });
+                break;
+              }
+              case PostStreamingStatus.AGENT_TOOL_RESULT:
+                handleStreamingEvent({
+                  type: 'tool-result',
+                  toolUseId: data.result.toolUseId,
+                  status: data.result.status,
+                });
+                break;
+              case PostStreamingStatus.AGENT_RELATED_DOCUMENT:
+                handleStreamingEvent({
+                  type: 'related-document',
+                  toolUseId: data.result.toolUseId,
+                  relatedDocument: data.result.relatedDocument,
+                });
+                break;
+              case PostStreamingStatus.REASONING:
+                handleStreamingEvent({
+                  type: 'reasoning',
+                  reasoning: data.completion,
+                });
+                break;
+              case PostStreamingStatus.STREAMING:
+                handleStreamingEvent({
+                  type: 'text',
+                  text: data.completion,
+                });
+                break;
+              case PostStreamingStatus.STREAMING_END:
+                console.log(
+                  '[FRONTEND_WS] Received STREAMING_END, ending thinking state'
+                );
+                try {
+                  console.log(
+                    '[FRONTEND_WS] Calling handleStreamingEvent goodbye'
+                  );
+                  handleStreamingEvent({
+                    type: 'goodbye',
+                  });
+                  console.log(
+                    '[FRONTEND_WS] handleStreamingEvent goodbye completed'
+                  );
+
+                  console.log('[FRONTEND_WS] Closing WebSocket');
+                  ws.close();
+                  console.log('[FRONTEND_WS] WebSocket closed successfully');
+                } catch (error) {
+                  console.error(
+                    '[FRONTEND_WS] Error in STREAMING_END handling:',
+                    error
+                  );
+                  ws.close();
+                }
+                break;
+              case PostStreamingStatus.ERROR:
+                ws.close();
+                console.error(data);
+                set({
+                  errorDetail:
+                    data.reason || i18next.t('error.predict.invalidResponse'),
+                });
+                throw new Error(
+                  data.reason || i18next.t('error.predict.invalidResponse')
+                );
+              default:
+                handleStreamingEvent({
+                  type: 'reset',
+                });
+                break;
+            }
+          } else {
+            ws.close();
+            console.error(data);
+            throw new Error(i18next.t('error.predict.invalidResponse'));
+          }
+        };
+
+        const frameSequencer = createFrameSequencer({
+          // eslint-disable-next-line @typescript-eslint/no-explicit-any
+          process: (frame: any) => {
+            try {
+              processData(frame);
+            } catch (e) {
+              console.error('[FRONTEND_WS] Error in frame handler:', e);
+              reject(i18next.t('error.predict.general'));
+            }
+          },
+          isTerminal: (frame) =>
+            frame.status === PostStreamingStatus.STREAMING_END ||
+            frame.status === PostStreamingStatus.ERROR,
+        });
+
         ws.onmessage = (message) => {
           try {
             console.log('[FRONTEND_WS] Received message:', message.data);
@@ -89,97 +200,8 @@ const usePostMessageStreaming = create<{
             const data = JSON.parse(message.data);
             console.log('[FRONTEND_WS] Parsed data:', data);
 
-            if (data.status) {
-              console.log('[FRONTEND_WS] Processing status:', data.status);
-              switch (data.status) {
-                case PostStreamingStatus.AGENT_THINKING: {
-                  Object.entries(data.log).forEach(([toolUseId, toolInfo]) => {
-                    const typedToolInfo = toolInfo as {
-                      name: string;
-                      input: { [key: string]: any }; // eslint-disable-line @typescript-eslint/no-explicit-any
-                    };
-                    handleStreamingEvent({
-                      type: 'tool-use',
-                      toolUseId: toolUseId,
-                      name: typedToolInfo.name,
-                      input: typedToolInfo.input,
-                    });
-                  });
-                  break;
-                }
-                case PostStreamingStatus.AGENT_TOOL_RESULT:
-                  handleStreamingEvent({
-                    type: 'tool-result',
-                    toolUseId: data.result.toolUseId,
-                    status: data.result.status,
-                  });
-                  break;
-                case PostStreamingStatus.AGENT_RELATED_DOCUMENT:
-                  handleStreamingEvent({
-                    type: 'related-document',
-                    toolUseId: data.result.toolUseId,
-                    relatedDocument: data.result.relatedDocument,
-                  });
-                  break;
-                case PostStreamingStatus.REASONING:
-                  handleStreamingEvent({
-                    type: 'reasoning',
-                    reasoning: data.completion,
-                  });
-                  break;
-                case PostStreamingStatus.STREAMING:
-                  handleStreamingEvent({
-                    type: 'text',
-                    text: data.completion,
-                  });
-                  break;
-                case PostStreamingStatus.STREAMING_END:
-                  console.log(
-                    '[FRONTEND_WS] Received STREAMING_END, ending thinking state'
-                  );
-                  try {
-                    console.log(
-                      '[FRONTEND_WS] Calling handleStreamingEvent goodbye'
-                    );
-                    handleStreamingEvent({
-                      type: 'goodbye',
-                    });
-                    console.log(
-                      '[FRONTEND_WS] handleStreamingEvent goodbye completed'
-                    );
-
-                    console.log('[FRONTEND_WS] Closing WebSocket');
-                    ws.close();
-                    console.log('[FRONTEND_WS] WebSocket closed successfully');
-                  } catch (error) {
-                    console.error(
-                      '[FRONTEND_WS] Error in STREAMING_END handling:',
-                      error
-                    );
-                    ws.close();
-                  }
-                  break;
-                case PostStreamingStatus.ERROR:
-                  ws.close();
-                  console.error(data);
-                  set({
-                    errorDetail:
-                      data.reason || i18next.t('error.predict.invalidResponse'),
-                  });
-                  throw new Error(
-                    data.reason || i18next.t('error.predict.invalidResponse')
-                  );
-                default:
-                  handleStreamingEvent({
-                    type: 'reset',
-                  });
-                  break;
-              }
-            } else {
-              ws.close();
-              console.error(data);
-              throw new Error(i18next.t('error.predict.invalidResponse'));
-            }
+            // Frames may be delivered out of order, `seq` restores the order
+            frameSequencer.push(data);
           } catch (e) {
             console.error('[FRONTEND_WS] Error in onmessage handler:', e);
             console.error(
@@ -196,6 +218,7 @@ const usePostMessageStreaming = create<{
           reject(i18next.t('error.predict.general'));
         };
         ws.onclose = (event) => {
+          frameSequencer.clear();
           console.log(
             '[FRONTEND_WS] WebSocket closed:',
             event.code,
@@ -0,0 +1,99 @@
+// Time to wait for a missing frame before the frames behind it are handled
+export const FRAME_GAP_TIMEOUT_MS = 1000;
+// Once the last frame of a response has arrived, missing frames are only
+// waited for briefly, as they were posted before it
+export const TERMINAL_FRAME_GAP_TIMEOUT_MS = 100;
+
+export type SequencedFrame = {
+  seq?: number;
+};
+
+/**
+ * Handles frames in the order of their `seq`, which may arrive out of order.
+ * A frame that never arrives (e.g. failed to be sent) is skipped after a
+ * timeout, so that the frames behind it are not held back.
+ */
+export const createFrameSequencer = <T extends SequencedFrame>(params: {
+  process: (frame: T) => void;
+  isTerminal: (frame: T) => boolean;
+  gapTimeoutMs?: number;
+  terminalGapTimeoutMs?: number;
+}) => {
+  const gapTimeoutMs = params.gapTimeoutMs ?? FRAME_GAP_TIMEOUT_MS;
+  const terminalGapTimeoutMs =
+    params.terminalGapTimeoutMs ?? TERMINAL_FRAME_GAP_TIMEOUT_MS;
+
+  const pendingFrames = new Map<number, T>();
+  let nextSeq = 0;
+  let terminalPending = false;
+  let timer: ReturnType<typeof setTimeout> | null = null;
+
+  const clear = () => {
+    if (timer !== null) {
+      clearTimeout(timer);
+      timer = null;
+    }
+  };
+
+  const drain = () => {
+    while (pendingFrames.has(nextSeq)) {
+      const frame = pendingFrames.get(nextSeq)!;
+      pendingFrames.delete(nextSeq);
+      nextSeq++;
+      params.process(frame);
+    }
+  };
+
+  const waitForGap = () => {
+    clear();
+    if (pendingFrames.size === 0) {
+      return;
+    }
+    timer = setTimeout(
+      skipGap,
+      terminalPending ? terminalGapTimeoutMs : gapTimeoutMs
+    );
+  };
+
+  const skipGap = () => {
+    timer = null;
+    if (pendingFrames.size === 0) {
+      return;
+    }
+    const lowestSeq = Math.min(...pendingFrames.keys());
+    console.warn(
+      `[FRONTEND_WS] Skipping missing frames ${nextSeq}-${lowestSeq - 1}`
+    );
+    nextSeq = lowestSeq;
+    drain();
+    waitForGap();
+  };
+
+  const push = (frame: T) => {
+    if (typeof frame.seq !== 'number') {
+      params.process(frame);
+      return;
+    }
+    if (frame.seq < nextSeq) {
+      // Already skipped, handling it now would break the order
+      return;
+    }
+
+    pendingFrames.set(frame.seq, frame);
+    const previousSeq = nextSeq;
+    drain();
+
+    if (pendingFrames.size === 0) {
+      clear();
+      terminalPending = false;
+    } else if (params.isTerminal(frame)) {
+      terminalPending = true;
+      waitForGap();
+    } else if (timer === null || nextSeq !== previousSeq) {
+      // Measure the timeout from the moment the current gap appeared
+      waitForGap();
+    }
+  };
+
+  return { push, clear };
+};
@@ -0,0 +1,78 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest';
+import {
+  FRAME_GAP_TIMEOUT_MS,
+  TERMINAL_FRAME_GAP_TIMEOUT_MS,
+  createFrameSequencer,
+} from '../FrameUtils';
+
+type Frame = {
+  seq?: number;
+  status: string;
+};
+
+const setup = () => {
+  const processed: Frame[] = [];
+  const sequencer = createFrameSequencer<Frame>({
+    process: (frame) => processed.push(frame),
+    isTerminal: (frame) => frame.status === 'STREAMING_END',
+  });
+  return { processed, sequencer };
+};
+
+describe('createFrameSequencer', () => {
+  beforeEach(() => {
+    vi.useFakeTimers();
+  });
+
+  afterEach(() => {
+    vi.useRealTimers();
+  });
+
+  it('順序を復元する', () => {
+    const { processed, sequencer } = setup();
+    sequencer.push({ seq: 1, status: 'STREAMING' });
+    sequencer.push({ seq: 0, status: 'STREAMING' });
+    sequencer.push({ status: 'AGENT_THINKING' });
+
+    expect(processed.map((frame) => frame.seq)).toEqual([0, 1, undefined]);
+  });
+
+  it('欠落したフレームをタイムアウト後にスキップする', () => {
+    const { processed, sequencer } = setup();
+    sequencer.push({ seq: 0, status: 'STREAMING' });
+    // seq 1 is dropped
+    sequencer.push({ seq: 2, status: 'STREAMING' });
+    sequencer.push({ seq: 3, status: 'STREAMING' });
+    expect(processed.map((frame) => frame.seq)).toEqual([0]);
+
+    vi.advanceTimersByTime(FRAME_GAP_TIMEOUT_MS);
+    expect(processed.map((frame) => frame.seq)).toEqual([0, 2, 3]);
+
+    // Arriving late, it is not handled out of order
+    sequencer.push({ seq: 1, status: 'STREAMING' });
+    sequencer.push({ seq: 4, status: 'STREAMING' });
+    expect(processed.map((frame) => frame.seq)).toEqual([0, 2, 3, 4]);
+  });
+
+  it('終端フレームの到着後は短時間でスキップする', () => {
+    const { processed, sequencer } = setup();
+    sequencer.push({ seq: 0, status: 'STREAMING' });
+    sequencer.push({ seq: 2, status: 'STREAMING_END' });
+
+    vi.advanceTimersByTime(TERMINAL_FRAME_GAP_TIMEOUT_MS);
+    expect(processed.map((frame) => frame.status)).toEqual([
+      'STREAMING',
+      'STREAMING_END',
+    ]);
+  });
+
+  it('遅れて届いたフレームを待つ', () => {
+    const { processed, sequencer } = setup();
+    sequencer.push({ seq: 1, status: 'STREAMING_END' });
+    sequencer.push({ seq: 0, status: 'STREAMING' });
+
+    expect(processed.map((frame) => frame.seq)).toEqual([0, 1]);
+    vi.advanceTimersByTime(FRAME_GAP_TIMEOUT_MS);
+    expect(processed).toHaveLength(2);
+  });
+});